@@ -0,0 +1,201 @@
+-- Convert FinOtchet from all-TEXT columns to typed storage.
+-- Empty strings and 'None' become NULL, numeric columns are cast to
+-- INTEGER/REAL (boolean flags stored as 'True'/'False' become 1/0),
+-- dates stay ISO-8601 TEXT.
+BEGIN;
+
+CREATE TABLE FinOtchet_new (
+    org_id INTEGER,
+    Организация TEXT,
+    realizationreport_id INTEGER,
+    date_from TEXT,
+    date_to TEXT,
+    create_dt TEXT,
+    currency_name TEXT,
+    suppliercontract_code TEXT,
+    rrd_id INTEGER,
+    gi_id INTEGER,
+    dlv_prc REAL,
+    fix_tariff_date_from TEXT,
+    fix_tariff_date_to TEXT,
+    subject_name TEXT,
+    nm_id INTEGER,
+    brand_name TEXT,
+    sa_name TEXT,
+    ts_name TEXT,
+    barcode TEXT,
+    doc_type_name TEXT,
+    quantity INTEGER,
+    retail_price REAL,
+    retail_amount REAL,
+    sale_percent REAL,
+    commission_percent REAL,
+    office_name TEXT,
+    supplier_oper_name TEXT,
+    order_dt TEXT,
+    sale_dt TEXT,
+    rr_dt TEXT,
+    shk_id INTEGER,
+    retail_price_withdisc_rub REAL,
+    delivery_amount INTEGER,
+    return_amount INTEGER,
+    delivery_rub REAL,
+    gi_box_type_name TEXT,
+    product_discount_for_report REAL,
+    supplier_promo REAL,
+    ppvz_spp_prc REAL,
+    ppvz_kvw_prc_base REAL,
+    ppvz_kvw_prc REAL,
+    sup_rating_prc_up REAL,
+    is_kgvp_v2 REAL,
+    ppvz_sales_commission REAL,
+    ppvz_for_pay REAL,
+    ppvz_reward REAL,
+    acquiring_fee REAL,
+    acquiring_percent REAL,
+    payment_processing TEXT,
+    acquiring_bank TEXT,
+    ppvz_vw REAL,
+    ppvz_vw_nds REAL,
+    ppvz_office_name TEXT,
+    ppvz_office_id INTEGER,
+    ppvz_supplier_id INTEGER,
+    ppvz_supplier_name TEXT,
+    ppvz_inn TEXT,
+    declaration_number TEXT,
+    bonus_type_name TEXT,
+    sticker_id TEXT,
+    site_country TEXT,
+    srv_dbs INTEGER,
+    penalty REAL,
+    additional_payment REAL,
+    rebill_logistic_cost REAL,
+    rebill_logistic_org TEXT,
+    storage_fee REAL,
+    deduction REAL,
+    acceptance REAL,
+    assembly_id INTEGER,
+    kiz TEXT,
+    srid TEXT,
+    report_type INTEGER,
+    is_legal_entity INTEGER,
+    trbx_id TEXT,
+    installment_cofinancing_amount REAL,
+    wibes_wb_discount_percent REAL,
+    cashback_amount REAL,
+    cashback_discount REAL,
+    PRIMARY KEY (org_id, rrd_id)
+);
+
+INSERT INTO FinOtchet_new (
+    org_id, Организация,
+    realizationreport_id, date_from, date_to, create_dt,
+    currency_name, suppliercontract_code, rrd_id, gi_id,
+    dlv_prc, fix_tariff_date_from, fix_tariff_date_to, subject_name,
+    nm_id, brand_name, sa_name, ts_name,
+    barcode, doc_type_name, quantity, retail_price,
+    retail_amount, sale_percent, commission_percent, office_name,
+    supplier_oper_name, order_dt, sale_dt, rr_dt,
+    shk_id, retail_price_withdisc_rub, delivery_amount, return_amount,
+    delivery_rub, gi_box_type_name, product_discount_for_report, supplier_promo,
+    ppvz_spp_prc, ppvz_kvw_prc_base, ppvz_kvw_prc, sup_rating_prc_up,
+    is_kgvp_v2, ppvz_sales_commission, ppvz_for_pay, ppvz_reward,
+    acquiring_fee, acquiring_percent, payment_processing, acquiring_bank,
+    ppvz_vw, ppvz_vw_nds, ppvz_office_name, ppvz_office_id,
+    ppvz_supplier_id, ppvz_supplier_name, ppvz_inn, declaration_number,
+    bonus_type_name, sticker_id, site_country, srv_dbs,
+    penalty, additional_payment, rebill_logistic_cost, rebill_logistic_org,
+    storage_fee, deduction, acceptance, assembly_id,
+    kiz, srid, report_type, is_legal_entity,
+    trbx_id, installment_cofinancing_amount, wibes_wb_discount_percent, cashback_amount,
+    cashback_discount
+)
+SELECT
+    CAST(org_id AS INTEGER),
+    Организация,
+    CAST(NULLIF(NULLIF(realizationreport_id, ''), 'None') AS INTEGER),
+    NULLIF(NULLIF(date_from, ''), 'None'),
+    NULLIF(NULLIF(date_to, ''), 'None'),
+    NULLIF(NULLIF(create_dt, ''), 'None'),
+    NULLIF(NULLIF(currency_name, ''), 'None'),
+    NULLIF(NULLIF(suppliercontract_code, ''), 'None'),
+    CAST(NULLIF(NULLIF(rrd_id, ''), 'None') AS INTEGER),
+    CAST(NULLIF(NULLIF(gi_id, ''), 'None') AS INTEGER),
+    CAST(NULLIF(NULLIF(dlv_prc, ''), 'None') AS REAL),
+    NULLIF(NULLIF(fix_tariff_date_from, ''), 'None'),
+    NULLIF(NULLIF(fix_tariff_date_to, ''), 'None'),
+    NULLIF(NULLIF(subject_name, ''), 'None'),
+    CAST(NULLIF(NULLIF(nm_id, ''), 'None') AS INTEGER),
+    NULLIF(NULLIF(brand_name, ''), 'None'),
+    NULLIF(NULLIF(sa_name, ''), 'None'),
+    NULLIF(NULLIF(ts_name, ''), 'None'),
+    NULLIF(NULLIF(barcode, ''), 'None'),
+    NULLIF(NULLIF(doc_type_name, ''), 'None'),
+    CAST(NULLIF(NULLIF(quantity, ''), 'None') AS INTEGER),
+    CAST(NULLIF(NULLIF(retail_price, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(retail_amount, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(sale_percent, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(commission_percent, ''), 'None') AS REAL),
+    NULLIF(NULLIF(office_name, ''), 'None'),
+    NULLIF(NULLIF(supplier_oper_name, ''), 'None'),
+    NULLIF(NULLIF(order_dt, ''), 'None'),
+    NULLIF(NULLIF(sale_dt, ''), 'None'),
+    NULLIF(NULLIF(rr_dt, ''), 'None'),
+    CAST(NULLIF(NULLIF(shk_id, ''), 'None') AS INTEGER),
+    CAST(NULLIF(NULLIF(retail_price_withdisc_rub, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(delivery_amount, ''), 'None') AS INTEGER),
+    CAST(NULLIF(NULLIF(return_amount, ''), 'None') AS INTEGER),
+    CAST(NULLIF(NULLIF(delivery_rub, ''), 'None') AS REAL),
+    NULLIF(NULLIF(gi_box_type_name, ''), 'None'),
+    CAST(NULLIF(NULLIF(product_discount_for_report, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(supplier_promo, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(ppvz_spp_prc, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(ppvz_kvw_prc_base, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(ppvz_kvw_prc, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(sup_rating_prc_up, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(is_kgvp_v2, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(ppvz_sales_commission, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(ppvz_for_pay, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(ppvz_reward, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(acquiring_fee, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(acquiring_percent, ''), 'None') AS REAL),
+    NULLIF(NULLIF(payment_processing, ''), 'None'),
+    NULLIF(NULLIF(acquiring_bank, ''), 'None'),
+    CAST(NULLIF(NULLIF(ppvz_vw, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(ppvz_vw_nds, ''), 'None') AS REAL),
+    NULLIF(NULLIF(ppvz_office_name, ''), 'None'),
+    CAST(NULLIF(NULLIF(ppvz_office_id, ''), 'None') AS INTEGER),
+    CAST(NULLIF(NULLIF(ppvz_supplier_id, ''), 'None') AS INTEGER),
+    NULLIF(NULLIF(ppvz_supplier_name, ''), 'None'),
+    NULLIF(NULLIF(ppvz_inn, ''), 'None'),
+    NULLIF(NULLIF(declaration_number, ''), 'None'),
+    NULLIF(NULLIF(bonus_type_name, ''), 'None'),
+    NULLIF(NULLIF(sticker_id, ''), 'None'),
+    NULLIF(NULLIF(site_country, ''), 'None'),
+    CASE srv_dbs WHEN 'True' THEN 1 WHEN 'False' THEN 0 ELSE CAST(NULLIF(NULLIF(srv_dbs, ''), 'None') AS INTEGER) END,
+    CAST(NULLIF(NULLIF(penalty, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(additional_payment, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(rebill_logistic_cost, ''), 'None') AS REAL),
+    NULLIF(NULLIF(rebill_logistic_org, ''), 'None'),
+    CAST(NULLIF(NULLIF(storage_fee, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(deduction, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(acceptance, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(assembly_id, ''), 'None') AS INTEGER),
+    NULLIF(NULLIF(kiz, ''), 'None'),
+    NULLIF(NULLIF(srid, ''), 'None'),
+    CAST(NULLIF(NULLIF(report_type, ''), 'None') AS INTEGER),
+    CASE is_legal_entity WHEN 'True' THEN 1 WHEN 'False' THEN 0 ELSE CAST(NULLIF(NULLIF(is_legal_entity, ''), 'None') AS INTEGER) END,
+    NULLIF(NULLIF(trbx_id, ''), 'None'),
+    CAST(NULLIF(NULLIF(installment_cofinancing_amount, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(wibes_wb_discount_percent, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(cashback_amount, ''), 'None') AS REAL),
+    CAST(NULLIF(NULLIF(cashback_discount, ''), 'None') AS REAL)
+FROM FinOtchet;
+
+DROP TABLE FinOtchet;
+ALTER TABLE FinOtchet_new RENAME TO FinOtchet;
+
+COMMIT;
+
+-- Reclaim the space freed by the conversion.
+VACUUM;
@@ -0,0 +1,10 @@
+-- Indexes backing the incremental watermark lookups
+-- (SELECT MAX(lastChangeDate) ... WHERE org_id = ?). The orders index also
+-- covers srid: the fallback lookup orders by (lastChangeDate, srid).
+-- FinOtchet needs no extra index: after 20261017_typed_finotchet_columns.sql
+-- rrd_id is INTEGER and the (org_id, rrd_id) primary key serves MAX(rrd_id).
+CREATE INDEX IF NOT EXISTS idx_SalesWB_org_lcd ON SalesWBFlat(org_id, lastChangeDate);
+DROP INDEX IF EXISTS idx_OrdersWB_org_lcd;
+CREATE INDEX IF NOT EXISTS idx_OrdersWB_org_lcd_srid ON OrdersWBFlat(org_id, lastChangeDate, srid);
+
+ANALYZE;
@@ -17,7 +17,7 @@ CREATE TABLE katalog (
     PRIMARY KEY (org_id, chrtID, snapshot_date)
 );
 
-CREATE TABLE FinOtchet (org_id INTEGER, Организация TEXT, realizationreport_id TEXT, date_from TEXT, date_to TEXT, create_dt TEXT, currency_name TEXT, suppliercontract_code TEXT, rrd_id TEXT, gi_id TEXT, dlv_prc TEXT, fix_tariff_date_from TEXT, fix_tariff_date_to TEXT, subject_name TEXT, nm_id TEXT, brand_name TEXT, sa_name TEXT, ts_name TEXT, barcode TEXT, doc_type_name TEXT, quantity TEXT, retail_price TEXT, retail_amount TEXT, sale_percent TEXT, commission_percent TEXT, office_name TEXT, supplier_oper_name TEXT, order_dt TEXT, sale_dt TEXT, rr_dt TEXT, shk_id TEXT, retail_price_withdisc_rub TEXT, delivery_amount TEXT, return_amount TEXT, delivery_rub TEXT, gi_box_type_name TEXT, product_discount_for_report TEXT, supplier_promo TEXT, ppvz_spp_prc TEXT, ppvz_kvw_prc_base TEXT, ppvz_kvw_prc TEXT, sup_rating_prc_up TEXT, is_kgvp_v2 TEXT, ppvz_sales_commission TEXT, ppvz_for_pay TEXT, ppvz_reward TEXT, acquiring_fee TEXT, acquiring_percent TEXT, payment_processing TEXT, acquiring_bank TEXT, ppvz_vw TEXT, ppvz_vw_nds TEXT, ppvz_office_name TEXT, ppvz_office_id TEXT, ppvz_supplier_id TEXT, ppvz_supplier_name TEXT, ppvz_inn TEXT, declaration_number TEXT, bonus_type_name TEXT, sticker_id TEXT, site_country TEXT, srv_dbs TEXT, penalty TEXT, additional_payment TEXT, rebill_logistic_cost TEXT, rebill_logistic_org TEXT, storage_fee TEXT, deduction TEXT, acceptance TEXT, assembly_id TEXT, kiz TEXT, srid TEXT, report_type TEXT, is_legal_entity TEXT, trbx_id TEXT, installment_cofinancing_amount TEXT, wibes_wb_discount_percent TEXT, cashback_amount TEXT, cashback_discount TEXT, PRIMARY KEY (org_id, rrd_id));
+CREATE TABLE FinOtchet (org_id INTEGER, Организация TEXT, realizationreport_id INTEGER, date_from TEXT, date_to TEXT, create_dt TEXT, currency_name TEXT, suppliercontract_code TEXT, rrd_id INTEGER, gi_id INTEGER, dlv_prc REAL, fix_tariff_date_from TEXT, fix_tariff_date_to TEXT, subject_name TEXT, nm_id INTEGER, brand_name TEXT, sa_name TEXT, ts_name TEXT, barcode TEXT, doc_type_name TEXT, quantity INTEGER, retail_price REAL, retail_amount REAL, sale_percent REAL, commission_percent REAL, office_name TEXT, supplier_oper_name TEXT, order_dt TEXT, sale_dt TEXT, rr_dt TEXT, shk_id INTEGER, retail_price_withdisc_rub REAL, delivery_amount INTEGER, return_amount INTEGER, delivery_rub REAL, gi_box_type_name TEXT, product_discount_for_report REAL, supplier_promo REAL, ppvz_spp_prc REAL, ppvz_kvw_prc_base REAL, ppvz_kvw_prc REAL, sup_rating_prc_up REAL, is_kgvp_v2 REAL, ppvz_sales_commission REAL, ppvz_for_pay REAL, ppvz_reward REAL, acquiring_fee REAL, acquiring_percent REAL, payment_processing TEXT, acquiring_bank TEXT, ppvz_vw REAL, ppvz_vw_nds REAL, ppvz_office_name TEXT, ppvz_office_id INTEGER, ppvz_supplier_id INTEGER, ppvz_supplier_name TEXT, ppvz_inn TEXT, declaration_number TEXT, bonus_type_name TEXT, sticker_id TEXT, site_country TEXT, srv_dbs INTEGER, penalty REAL, additional_payment REAL, rebill_logistic_cost REAL, rebill_logistic_org TEXT, storage_fee REAL, deduction REAL, acceptance REAL, assembly_id INTEGER, kiz TEXT, srid TEXT, report_type INTEGER, is_legal_entity INTEGER, trbx_id TEXT, installment_cofinancing_amount REAL, wibes_wb_discount_percent REAL, cashback_amount REAL, cashback_discount REAL, PRIMARY KEY (org_id, rrd_id));
 
 CREATE TABLE OrdersWBFlat (
     org_id INTEGER,
@@ -26,6 +26,8 @@ CREATE TABLE OrdersWBFlat (
     PRIMARY KEY (org_id, srid)
 );
 
+CREATE INDEX idx_OrdersWB_org_lcd_srid ON OrdersWBFlat(org_id, lastChangeDate, srid);
+
 CREATE TABLE SalesWBFlat (
     org_id INTEGER,
     Организация TEXT,
@@ -33,6 +35,8 @@ CREATE TABLE SalesWBFlat (
     PRIMARY KEY (org_id, srid)
 );
 
+CREATE INDEX idx_SalesWB_org_lcd ON SalesWBFlat(org_id, lastChangeDate);
+
 CREATE TABLE StocksWBFlat (
     org_id INTEGER,
     Организация TEXT,
@@ -182,6 +186,13 @@ CREATE TABLE AdvCampaignsFullStats (
     PRIMARY KEY (org_id, advertId, date, appType, nmId)
 );
 
+CREATE TABLE AdvFullStatsRejected (
+    org_id TEXT,
+    advertId TEXT,
+    RejectedAt TEXT,        -- последний ответ 400; кампания пропускается 3 дня
+    PRIMARY KEY (org_id, advertId)
+);
+
 CREATE INDEX idx_AdvCampDet_org_ad ON AdvCampaignsDetailsFlat(org_id, advertId);
 
 CREATE TABLE wb_spp (
@@ -193,3 +204,81 @@ CREATE TABLE wb_spp (
     updated_at   TEXT    NOT NULL
 );
 
+CREATE TABLE ImportState (
+    script TEXT NOT NULL,
+    org_id TEXT NOT NULL,
+    cursor TEXT,
+    last_success TEXT,
+    rows_loaded INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (script, org_id)
+);
+
+CREATE TABLE PnLDaily (
+    org_id INTEGER NOT NULL,
+    nm_id INTEGER NOT NULL,
+    sa_name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    sales_qty INTEGER NOT NULL DEFAULT 0,
+    returns_qty INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    for_pay REAL NOT NULL DEFAULT 0,
+    commission REAL NOT NULL DEFAULT 0,
+    acquiring REAL NOT NULL DEFAULT 0,
+    logistics REAL NOT NULL DEFAULT 0,
+    storage REAL NOT NULL DEFAULT 0,
+    penalties REAL NOT NULL DEFAULT 0,
+    deductions REAL NOT NULL DEFAULT 0,
+    acceptance REAL NOT NULL DEFAULT 0,
+    additional_payment REAL NOT NULL DEFAULT 0,
+    payout REAL NOT NULL DEFAULT 0,
+    rows_aggregated INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (org_id, nm_id, sa_name, day)
+);
+
+CREATE TABLE UnitEconomicsDaily (
+    org_id INTEGER NOT NULL,
+    nm_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    sales_qty INTEGER NOT NULL DEFAULT 0,
+    returns_qty INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    for_pay REAL NOT NULL DEFAULT 0,
+    commission REAL NOT NULL DEFAULT 0,
+    logistics REAL NOT NULL DEFAULT 0,
+    penalties REAL NOT NULL DEFAULT 0,
+    storage REAL NOT NULL DEFAULT 0,
+    ad_cost REAL NOT NULL DEFAULT 0,
+    margin REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (org_id, nm_id, day)
+);
+
+CREATE TABLE UnitEconomics (
+    org_id INTEGER NOT NULL,
+    nm_id INTEGER NOT NULL,
+    date_from TEXT,
+    date_to TEXT,
+    sales_qty INTEGER,
+    returns_qty INTEGER,
+    revenue REAL,
+    for_pay REAL,
+    commission REAL,
+    logistics REAL,
+    penalties REAL,
+    storage REAL,
+    ad_cost REAL,
+    margin REAL,
+    margin_pct REAL,
+    ad_share REAL,
+    storage_per_unit REAL,
+    roi REAL,
+    PRIMARY KEY (org_id, nm_id)
+);
+
+CREATE TABLE ExportState (
+    table_name TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    exported_at TEXT,
+    PRIMARY KEY (table_name, partition)
+);
@@ -2,52 +2,78 @@
 
 import pkgutil
 import sys
-from importlib import import_module
 from pathlib import Path
+from typing import List, Optional, Sequence
 
 import typer
+from typer.core import TyperCommand, TyperGroup
 
-from finmodel.logger import LOG_FILE, setup_logging
+from finmodel.logger import get_log_file, setup_logging
 
-app = typer.Typer(help="Finmodel command line interface")
+SCRIPTS_DIR = Path(__file__).resolve().parent / "scripts"
 
 
-def _run_module(module_name: str) -> None:
-    module = import_module(f"finmodel.scripts.{module_name}")
-    if not hasattr(module, "main"):
-        typer.echo(f"Module {module_name} has no main() function.")
-        raise typer.Exit(code=1)
-    old_argv = sys.argv[:]
+def _run_module(module_name: str, args: Sequence[str] = ()) -> None:
+    from finmodel.utils.pipeline import run_script
+
     try:
-        sys.argv = [module_name]
-        module.main()
-    finally:
-        sys.argv = old_argv
+        run_script(module_name, args)
+    except AttributeError as exc:
+        typer.echo(str(exc))
+        raise typer.Exit(code=1)
+
+
+def _script_names() -> List[str]:
+    """Return module names in ``finmodel.scripts`` without importing them."""
+    if not SCRIPTS_DIR.exists():
+        return []
+    return sorted(info.name for info in pkgutil.iter_modules([str(SCRIPTS_DIR)]))
+
+
+def _create_command(name: str) -> TyperCommand:
+    def command(ctx: typer.Context) -> None:
+        _run_module(name, ctx.args)
 
+    # Arguments after the command name are passed on to the script's parser.
+    sub = typer.Typer(add_completion=False)
+    sub.command(
+        name,
+        help=f"Run {name} script.",
+        context_settings={"allow_extra_args": True, "ignore_unknown_options": True},
+    )(command)
+    return typer.main.get_command(sub)
 
-def _create_command(name: str):
-    def command() -> None:
-        _run_module(name)
 
-    command.__doc__ = f"Run {name} script."
-    return command
+class ScriptGroup(TyperGroup):
+    """Command group that builds script commands only when they are looked up.
 
+    Script modules (and the pandas/requests imports they carry) are imported
+    by :func:`_run_module` when the command actually runs, so ``--help`` and
+    single-command invocations stay cheap.
+    """
 
-scripts_dir = Path(__file__).resolve().parent / "scripts"
-if scripts_dir.exists():
-    for module_info in pkgutil.iter_modules([str(scripts_dir)]):
-        app.command(module_info.name)(_create_command(module_info.name))
+    def list_commands(self, ctx: typer.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(_script_names()))
+
+    def get_command(self, ctx: typer.Context, cmd_name: str) -> Optional[TyperCommand]:
+        command = super().get_command(ctx, cmd_name)
+        if command is None and cmd_name in _script_names():
+            command = _create_command(cmd_name)
+        return command
+
+
+app = typer.Typer(cls=ScriptGroup, help="Finmodel command line interface")
+
+
+@app.callback()
+def _root() -> None:
+    """Finmodel command line interface."""
 
 
 @app.command()
 def menu() -> None:
     """Interactive menu to run common commands."""
-    registered = app.registered_commands
-    if isinstance(registered, dict):
-        command_map = {name: cmd for name, cmd in registered.items() if name and name != "menu"}
-    else:
-        command_map = {cmd.name: cmd for cmd in registered if cmd.name and cmd.name != "menu"}
-    command_names = sorted(command_map.keys())
+    command_names = _script_names()
     if not command_names:
         typer.echo("No commands available.")
         return
@@ -67,14 +93,9 @@ def menu() -> None:
             typer.echo("Invalid choice. Please try again.")
             continue
         try:
-            old_argv = sys.argv[:]
-            try:
-                sys.argv = [command_name]
-                command_map[command_name].callback()
-                typer.echo("Command completed successfully.")
-                typer.echo(f"Logs available at {LOG_FILE}")
-            finally:
-                sys.argv = old_argv
+            _run_module(command_name)
+            typer.echo("Command completed successfully.")
+            typer.echo(f"Logs available at {get_log_file()}")
         except Exception as exc:  # pragma: no cover - defensive
             typer.echo(f"Error: {exc}")
         if not typer.confirm("Return to main menu?", default=True):
@@ -1,26 +1,45 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional
+from pathlib import Path
+from typing import Any, Optional
 
 from finmodel.utils.paths import get_project_root
 
-LOG_DIR = get_project_root() / "log"
-LOG_FILE = LOG_DIR / "finmodel.log"
-
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
 
+def get_log_dir() -> Path:
+    """Return the directory for log files under the project root."""
+    return get_project_root() / "log"
+
+
+def get_log_file() -> Path:
+    """Return path to ``finmodel.log``."""
+    return get_log_dir() / "finmodel.log"
+
+
+def __getattr__(name: str) -> Any:
+    # ``LOG_DIR``/``LOG_FILE`` are resolved on access so importing the logger
+    # does not search the filesystem for the project root.
+    if name == "LOG_DIR":
+        return get_log_dir()
+    if name == "LOG_FILE":
+        return get_log_file()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def setup_logging() -> None:
     """Configure logging for the project."""
     if logging.getLogger().hasHandlers():
         return
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_file = get_log_file()
+    log_file.parent.mkdir(parents=True, exist_ok=True)
     logging.basicConfig(
         level=logging.INFO,
         format=LOG_FORMAT,
         handlers=[
-            logging.FileHandler(LOG_FILE, encoding="utf-8"),
+            logging.FileHandler(log_file, encoding="utf-8"),
             logging.StreamHandler(),
         ],
     )
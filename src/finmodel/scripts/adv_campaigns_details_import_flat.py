@@ -1,12 +1,12 @@
-import sqlite3
-import time
 from datetime import datetime
 
 import pandas as pd
-import requests
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.http import get_session
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 from finmodel.utils.settings import find_setting, load_organizations
 
 logger = get_logger(__name__)
@@ -58,7 +58,7 @@ def main() -> None:
         "LoadDate",
     ]
 
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     cursor.execute(f"DROP TABLE IF EXISTS {TABLE_NAME};")
     cursor.execute(
@@ -97,6 +97,7 @@ def main() -> None:
     URL_COUNT = "https://advert-api.wildberries.ru/adv/v1/promotion/count"
     URL_DETAILS = "https://advert-api.wildberries.ru/adv/v1/promotion/adverts"
     HEADERS_BASE = {"Content-Type": "application/json"}
+    http = get_session(retry_post=True)
 
     # --- Фильтры: нужны status ∈ {9, 11} и type ∈ {8, 9} ---
     ALLOWED_STATUS = {"9", "11"}  # 9 - активно, 11 - пауза
@@ -127,24 +128,22 @@ def main() -> None:
         headers["Authorization"] = token
 
         # 1) Получаем ID кампаний через /promotion/count
+        acquire(token, URL_COUNT)
         try:
-            resp = requests.get(URL_COUNT, headers=headers, timeout=60)
+            resp = http.get(URL_COUNT, headers=headers, timeout=60)
             logger.info("  [count] HTTP %s", resp.status_code)
             if resp.status_code != 200:
                 logger.warning("  Ошибка count: %s", resp.text[:300])
-                time.sleep(0.3)
                 continue
             data = resp.json() or {}
         except Exception as e:
             logger.warning("  Ошибка запроса count: %s", e)
-            time.sleep(0.3)
             continue
 
         # Ожидаем формат: {"adverts":[{"type":..,"status":..,"count":..,"advert_list":[{"advertId":..,"changeTime":..}, ...]}], "all": N}
         adverts = data.get("adverts", [])
         if not isinstance(adverts, list) or not adverts:
             logger.warning("  Нет кампаний в ответе count.")
-            time.sleep(0.3)
             continue
 
         # Фильтруем по статусу и типу, собираем ID
@@ -160,7 +159,6 @@ def main() -> None:
         advert_ids = sorted(set(advert_ids))
         if not advert_ids:
             logger.warning("  После фильтра status∈{9,11}, type∈{8,9} кампаний нет.")
-            time.sleep(0.3)
             continue
 
         logger.info(
@@ -174,16 +172,14 @@ def main() -> None:
             try:
                 # можно указать порядок: например, по последнему изменению
                 params = {"order": "change", "direction": "desc"}
-                resp = requests.post(
+                acquire(token, URL_DETAILS)  # лимит 5 req/s
+                resp = http.post(
                     URL_DETAILS,
                     headers=headers,
                     params=params,
                     json=[int(x) for x in batch],
                     timeout=60,
                 )
-                # соблюдаем лимиты 5 req/s
-                time.sleep(0.3)
-
                 logger.info("  [adverts] ids=%s → HTTP %s", len(batch), resp.status_code)
                 if resp.status_code != 200:
                     logger.warning("  Ошибка adverts: %s", resp.text[:300])
@@ -1,12 +1,12 @@
-import sqlite3
-import time
 from datetime import datetime
 
 import pandas as pd
-import requests
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.http import get_session
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 from finmodel.utils.settings import find_setting, load_organizations
 
 logger = get_logger(__name__)
@@ -44,7 +44,7 @@ def main() -> None:
 
     # --- Пересоздаём таблицу ---
     total_rows = 0
-    with sqlite3.connect(db_path) as conn:
+    with connect(db_path) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute("DROP TABLE IF EXISTS AdvCampaignsFlat;")
@@ -66,6 +66,7 @@ def main() -> None:
 
             URL = "https://advert-api.wildberries.ru/adv/v1/promotion/count"
             HEADERS_BASE = {"Content-Type": "application/json"}
+            http = get_session()
 
             def norm_ts(v):
                 if not v or str(v).strip() == "":
@@ -84,8 +85,9 @@ def main() -> None:
                 headers = HEADERS_BASE.copy()
                 headers["Authorization"] = token
 
+                acquire(token, URL)  # лимит 5 req/sec
                 try:
-                    resp = requests.get(URL, headers=headers, timeout=60)
+                    resp = http.get(URL, headers=headers, timeout=60)
                     logger.info("  HTTP %s", resp.status_code)
                     preview = (resp.text or "")[:500].replace("\n", " ")
                     logger.info("  Ответ (начало): %s", preview if preview else "[пусто]")
@@ -96,13 +98,11 @@ def main() -> None:
                     data = resp.json() or {}
                 except Exception as e:
                     logger.warning("  Ошибка запроса: %s", e)
-                    time.sleep(0.3)
                     continue
 
                 adverts = data.get("adverts", [])
                 if not isinstance(adverts, list) or not adverts:
                     logger.warning("  Пустой список adverts.")
-                    time.sleep(0.3)
                     continue
 
                 now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -133,7 +133,6 @@ def main() -> None:
 
                 if not rows:
                     logger.warning("  Кампаний не найдено по этому токену.")
-                    time.sleep(0.3)
                     continue
 
                 try:
@@ -145,8 +144,6 @@ def main() -> None:
                     logger.info("  ✅ Загружено %s кампаний (плоско).", len(rows))
                 except Exception as e:
                     logger.warning("  Ошибка вставки: %s", e)
-
-                time.sleep(0.3)  # лимит 5 req/sec
         finally:
             cursor.close()
 
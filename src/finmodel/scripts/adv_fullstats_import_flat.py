@@ -1,14 +1,14 @@
 # -*- coding: utf-8 -*-
-import random
-import sqlite3
-import time
 from datetime import datetime, timedelta
 
 import pandas as pd
-import requests
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.concurrency import SQLiteWriter, run_per_org
+from finmodel.utils.db import connect
+from finmodel.utils.http import get_session
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire, backoff, retry_delay
 from finmodel.utils.settings import find_setting, load_organizations
 
 
@@ -35,6 +35,9 @@ def main() -> None:
     URL_COUNT = "https://advert-api.wildberries.ru/adv/v1/promotion/count"
     URL_FULLSTATS = "https://advert-api.wildberries.ru/adv/v2/fullstats"
     HEADERS_BASE = {"Content-Type": "application/json"}
+    # no transport-level POST retries: they would bypass the per-token limiter,
+    # 429 and 5xx are retried in request_fullstats_batch after acquire()
+    http = get_session(retry_post=False, retry_429=False)
 
     # Статусы: -1 удаляется, 4 готова, 7 завершено, 8 отказался, 9 активно, 11 пауза
     ALLOWED_STATUS = {"7", "9", "11"}
@@ -42,8 +45,12 @@ def main() -> None:
     ALLOWED_TYPES = {"8", "9"}
 
     RECENT_CHANGE_DAYS = 7  # ужесточил с 14 до 7, чтобы меньше 400
-    REQ_INTERVAL_SEC = 65  # минимум между ЛЮБЫМИ POST к fullstats
+    RETRY_429_SEC = 75  # пауза после 429, если WB не прислал X-Ratelimit-Retry
+    RETRY_5XX = 2  # повторы POST после 5xx, каждый через лимитер токена
     TABLE = "AdvCampaignsFullStats"
+    # campaigns answered with 400; skipped until the rejection is REJECTED_TTL_DAYS old
+    REJECTED_TABLE = "AdvFullStatsRejected"
+    REJECTED_TTL_DAYS = 3
 
     # ---------- Helpers ----------
     def normalize_day(s: str) -> str:
@@ -69,18 +76,6 @@ def main() -> None:
         except Exception:
             return True
 
-    # простой троттлер для всех POST
-    _last_post_ts = 0.0
-
-    def throttle_fullstats():
-        nonlocal _last_post_ts
-        now = time.monotonic()
-        wait = _last_post_ts + REQ_INTERVAL_SEC - now
-        if wait > 0:
-            time.sleep(wait + random.uniform(0, 3))
-            now = time.monotonic()
-        _last_post_ts = now
-
     # ---------- Orgs/tokens ----------
     df_orgs = load_organizations(sheet=org_sheet)
     if df_orgs.empty:
@@ -88,7 +83,7 @@ def main() -> None:
         raise SystemExit(1)
 
     # ---------- DB & target table ----------
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, check_same_thread=False)
     cur = conn.cursor()
     cur.execute(
         f"""
@@ -123,6 +118,39 @@ def main() -> None:
     )
     conn.commit()
 
+    cur.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS {REJECTED_TABLE} (
+        org_id TEXT,
+        advertId TEXT,
+        RejectedAt TEXT,
+        PRIMARY KEY (org_id, advertId)
+    );
+    """
+    )
+    rejected_since = (datetime.now() - timedelta(days=REJECTED_TTL_DAYS)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    cur.execute(f"DELETE FROM {REJECTED_TABLE} WHERE RejectedAt < ?", (rejected_since,))
+    conn.commit()
+    writer = SQLiteWriter(conn)
+
+    def load_rejected(org_id: str) -> set:
+        with writer.cursor() as wcur:
+            wcur.execute(f"SELECT advertId FROM {REJECTED_TABLE} WHERE org_id = ?", (org_id,))
+            return {int(r[0]) for r in wcur.fetchall()}
+
+    def remember_rejected(org_id: str, ids) -> None:
+        if not ids:
+            return
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with writer.cursor() as wcur:
+            wcur.executemany(
+                f"INSERT OR REPLACE INTO {REJECTED_TABLE} VALUES (?, ?, ?)",
+                [(org_id, str(cid), now) for cid in ids],
+            )
+            conn.commit()
+
     # ---------- Local filter (no IN (...)) ----------
     def get_local_eligible_ids(conn, org_id: str, ids_from_api, begin: str, end: str):
         """
@@ -182,7 +210,7 @@ def main() -> None:
         headers = HEADERS_BASE.copy()
         headers["Authorization"] = token
         try:
-            r = requests.get(URL_COUNT, headers=headers, timeout=60)
+            r = http.get(URL_COUNT, headers=headers, timeout=60)
             if r.status_code != 200:
                 logger.warning("  [count] HTTP %s: %s", r.status_code, r.text[:300])
                 return []
@@ -199,62 +227,89 @@ def main() -> None:
                     ids.append(int(cid))
         return sorted(set(ids))
 
-    # ---------- fullstats with global throttle & split ----------
-    def request_fullstats_batch(headers, ids_batch, begin, end, preview=False):
+    # ---------- fullstats with per-token throttle & split ----------
+    def request_fullstats_batch(headers, ids_batch, begin, end, preview=False, rejected=None):
+        """POST ``ids_batch`` and return the campaigns of all successful responses.
+
+        A 400 means the batch contains at least one campaign WB refuses for the
+        interval. The batch is bisected to find it; whenever the first half
+        succeeds, the second half is known to be bad and is split without
+        posting it, so one bad id costs about log2(n) extra POSTs instead of
+        2·log2(n). Refused ids are appended to ``rejected``.
+        """
         payload_all = []
 
+        token = headers["Authorization"]
+
         def _post(ids_sub):
-            throttle_fullstats()  # <= гарантируем 1 POST/≈минуту на продавца
+            acquire(token, URL_FULLSTATS)  # <= гарантируем 1 POST/минуту на продавца
             body = prepare_request_body_interval(ids_sub, begin, end)
             if preview:
                 logger.info("    POST preview: %s (+%s ids)", body[:1], max(0, len(body) - 1))
-            return requests.post(URL_FULLSTATS, headers=headers, json=body, timeout=120)
+            return http.post(URL_FULLSTATS, headers=headers, json=body, timeout=120)
 
-        def _handle(ids_sub):
-            nonlocal payload_all
+        def _handle(ids_sub, known_bad=False) -> bool:
+            """Return True when every id of ``ids_sub`` was fetched successfully."""
             if not ids_sub:
-                return
-            resp = _post(ids_sub)
-
-            if resp.status_code == 429:
-                # глобальный лимитер WB — подождём подольше и повторим один раз
-                sleep_s = REQ_INTERVAL_SEC + 10
-                logger.warning("    429 Too Many Requests. Жду %s сек…", sleep_s)
-                time.sleep(sleep_s)
+                return True
+            if not known_bad:
                 resp = _post(ids_sub)
-
-            if resp.status_code == 200:
-                data = resp.json() or []
-                if isinstance(data, list):
-                    payload_all.extend(data)
-                else:
-                    logger.warning("    Неожиданный формат ответа; пропущено.")
-                return
-
-            if resp.status_code == 400:
-                # дробим, но это тоже пойдёт через глобальный троттлер (по одному POST в ~минуту)
-                if len(ids_sub) == 1:
-                    logger.warning("    400 на кампанию %s — пропускаю.", ids_sub[0])
-                    return
-                mid = max(1, len(ids_sub) // 2)
-                _handle(ids_sub[:mid])
-                _handle(ids_sub[mid:])
-                return
-
-            if resp.status_code == 401:
-                logger.error("    401 Unauthorized — токен/права. Пропускаю организацию.")
-                raise PermissionError
-
-            logger.warning("    HTTP %s: %s (пропущено)", resp.status_code, resp.text[:500])
+                retried_429, retries_5xx = False, 0
+                while True:
+                    if resp.status_code == 429 and not retried_429:
+                        # лимитер WB — подождём подольше и повторим один раз
+                        retried_429 = True
+                        delay = retry_delay(resp, RETRY_429_SEC)
+                        logger.warning("    429 Too Many Requests. Жду %s сек…", delay)
+                        backoff(token, URL_FULLSTATS, delay)
+                    elif resp.status_code >= 500 and retries_5xx < RETRY_5XX:
+                        retries_5xx += 1
+                        logger.warning(
+                            "    HTTP %s от WB, повтор %s/%s…",
+                            resp.status_code,
+                            retries_5xx,
+                            RETRY_5XX,
+                        )
+                    else:
+                        break
+                    resp = _post(ids_sub)
+
+                if resp.status_code == 200:
+                    data = resp.json() or []
+                    if isinstance(data, list):
+                        payload_all.extend(data)
+                    else:
+                        logger.warning("    Неожиданный формат ответа; пропущено.")
+                    return True
+
+                if resp.status_code == 401:
+                    logger.error("    401 Unauthorized — токен/права. Пропускаю организацию.")
+                    raise PermissionError
+
+                if resp.status_code != 400:
+                    logger.warning("    HTTP %s: %s (пропущено)", resp.status_code, resp.text[:500])
+                    return False
+
+            # 400: дробим, но это тоже пойдёт через троттлер токена (по одному POST в минуту)
+            if len(ids_sub) == 1:
+                logger.warning("    400 на кампанию %s — пропускаю.", ids_sub[0])
+                if rejected is not None:
+                    rejected.append(ids_sub[0])
+                return False
+            mid = max(1, len(ids_sub) // 2)
+            first_ok = _handle(ids_sub[:mid])
+            _handle(ids_sub[mid:], known_bad=first_ok)
+            return False
 
         _handle(ids_batch)
         return payload_all
 
     # ---------- Main ----------
     now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    total_rows = 0
 
-    for _, org in df_orgs.iterrows():
+    # fullstats allows ~1 POST/min per seller: organizations run in parallel,
+    # each one throttled by its own token in acquire().
+    def import_org(org) -> int:
         org_id = str(org["id"])
         org_name = str(org["Организация"])
         token = str(org["Token_WB"]).strip()
@@ -264,7 +319,8 @@ def main() -> None:
         ids_api = get_campaign_ids_from_api(token)
         logger.info("  Всего кампаний с API: %s", len(ids_api))
 
-        ids_eligible = get_local_eligible_ids(conn, org_id, ids_api, begin, end)
+        with writer.cursor():
+            ids_eligible = get_local_eligible_ids(conn, org_id, ids_api, begin, end)
         logger.info(
             "  После локального фильтра (status∈%s, type∈%s, даты/изменения): %s",
             ALLOWED_STATUS,
@@ -272,23 +328,37 @@ def main() -> None:
             len(ids_eligible),
         )
 
+        known_rejected = load_rejected(org_id)
+        if known_rejected:
+            ids_eligible = [cid for cid in ids_eligible if cid not in known_rejected]
+            logger.info(
+                "  Пропускаю кампании с отказом 400 за последние %s дн.: %s",
+                REJECTED_TTL_DAYS,
+                len(known_rejected),
+            )
+
         if not ids_eligible:
             logger.warning("  Нет подходящих кампаний для запроса fullstats.")
-            continue
+            return 0
 
         headers = HEADERS_BASE.copy()
         headers["Authorization"] = token
+        org_rows = 0
 
         for batch_num, ids_batch in enumerate(chunked(ids_eligible, 100), start=1):
             logger.info(
-                "  ▶ fullstats: батч %s (ids=%s), глобальный лимит ~1 POST/мин…",
+                "  ▶ fullstats: батч %s (ids=%s), лимит ~1 POST/мин на токен…",
                 batch_num,
                 len(ids_batch),
             )
             try:
-                payload = request_fullstats_batch(
-                    headers, ids_batch, begin, end, preview=(batch_num == 1)
-                )
+                rejected = []
+                try:
+                    payload = request_fullstats_batch(
+                        headers, ids_batch, begin, end, preview=(batch_num == 1), rejected=rejected
+                    )
+                finally:
+                    remember_rejected(org_id, rejected)
 
                 rows = []
                 for camp in payload:
@@ -398,10 +468,15 @@ def main() -> None:
                         "views, clicks, ctr, cpc, sum, atbs, orders, cr, shks, sum_price, avg_position, LoadDate"
                     )
                     ph = ",".join(["?"] * 19)
-                    cur.executemany(f"INSERT OR REPLACE INTO {TABLE} ({cols}) VALUES ({ph})", rows)
-                    conn.commit()
-                    total_rows += len(rows)
-                    logger.info("    ✅ вставлено %s строк (итого: %s)", len(rows), total_rows)
+                    with writer.cursor() as wcur:
+                        wcur.executemany(
+                            f"INSERT OR REPLACE INTO {TABLE} ({cols}) VALUES ({ph})", rows
+                        )
+                        conn.commit()
+                    org_rows += len(rows)
+                    logger.info(
+                        "    ✅ %s: вставлено %s строк (итого: %s)", org_name, len(rows), org_rows
+                    )
                 else:
                     logger.warning("    пустой набор данных для батча.")
 
@@ -410,8 +485,11 @@ def main() -> None:
             except Exception as e:
                 logger.warning("    Ошибка запроса/вставки: %s", e)
 
+        return org_rows
+
+    total_rows = sum(run_per_org(df_orgs, import_org))
     logger.info("✅ Готово. Добавлено/обновлено строк: %s в %s", total_rows, TABLE)
-    conn.close()
+    writer.close()
 
 
 if __name__ == "__main__":
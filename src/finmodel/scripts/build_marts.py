@@ -0,0 +1,193 @@
+"""Maintain pre-aggregated marts built from the raw import tables."""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from typing import List, Optional
+
+from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.import_state import (
+    ensure_import_state,
+    load_cursor,
+    reset_cursor,
+    save_cursor,
+)
+from finmodel.utils.paths import get_db_path
+
+logger = get_logger(__name__)
+
+SCRIPT = "build_marts:PnLDaily"  # key in ImportState, cursor is the last aggregated rrd_id
+
+# One row per organization, product and report day of FinOtchet. Amounts are
+# signed: returns are subtracted from sales. commission is the WB reward with
+# VAT (ppvz_vw + ppvz_vw_nds); acquiring is kept apart, so revenue minus both
+# is close to for_pay.
+PNL_DAILY_SQL = """
+CREATE TABLE IF NOT EXISTS PnLDaily (
+    org_id INTEGER NOT NULL,
+    nm_id INTEGER NOT NULL,
+    sa_name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    sales_qty INTEGER NOT NULL DEFAULT 0,
+    returns_qty INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    for_pay REAL NOT NULL DEFAULT 0,
+    commission REAL NOT NULL DEFAULT 0,
+    acquiring REAL NOT NULL DEFAULT 0,
+    logistics REAL NOT NULL DEFAULT 0,
+    storage REAL NOT NULL DEFAULT 0,
+    penalties REAL NOT NULL DEFAULT 0,
+    deductions REAL NOT NULL DEFAULT 0,
+    acceptance REAL NOT NULL DEFAULT 0,
+    additional_payment REAL NOT NULL DEFAULT 0,
+    payout REAL NOT NULL DEFAULT 0,
+    rows_aggregated INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (org_id, nm_id, sa_name, day)
+);
+"""
+
+# Aggregates of FinOtchet rows with rrd_id in (?, ?] of one organization.
+# rrd_id is cast because FinOtchet tables created before the typed schema
+# store it as TEXT, where '9' > '10'.
+# The SELECT must keep its WHERE clause: it disambiguates the upsert syntax.
+PNL_DAILY_UPSERT_SQL = """
+INSERT INTO PnLDaily (
+    org_id, nm_id, sa_name, day, sales_qty, returns_qty, revenue, for_pay, commission,
+    acquiring, logistics, storage, penalties, deductions, acceptance, additional_payment, payout,
+    rows_aggregated
+)
+SELECT
+    org_id, nm_id, sa_name, day,
+    SUM(CASE WHEN sign > 0 THEN quantity ELSE 0 END),
+    SUM(CASE WHEN sign < 0 THEN quantity ELSE 0 END),
+    SUM(sign * retail_amount),
+    SUM(sign * for_pay),
+    SUM(sign * commission),
+    SUM(sign * acquiring),
+    SUM(logistics),
+    SUM(storage),
+    SUM(penalty),
+    SUM(deduction),
+    SUM(acceptance),
+    SUM(additional_payment),
+    SUM(sign * for_pay - logistics - storage - penalty - deduction - acceptance
+        + additional_payment),
+    COUNT(*)
+FROM (
+    SELECT
+        org_id,
+        COALESCE(nm_id, 0) AS nm_id,
+        COALESCE(sa_name, '') AS sa_name,
+        substr(rr_dt, 1, 10) AS day,
+        CASE doc_type_name WHEN 'Продажа' THEN 1 WHEN 'Возврат' THEN -1 ELSE 0 END AS sign,
+        COALESCE(quantity, 0) AS quantity,
+        COALESCE(retail_amount, 0) AS retail_amount,
+        COALESCE(ppvz_for_pay, 0) AS for_pay,
+        COALESCE(ppvz_vw, 0) + COALESCE(ppvz_vw_nds, 0) AS commission,
+        COALESCE(acquiring_fee, 0) AS acquiring,
+        COALESCE(delivery_rub, 0) + COALESCE(rebill_logistic_cost, 0) AS logistics,
+        COALESCE(storage_fee, 0) AS storage,
+        COALESCE(penalty, 0) AS penalty,
+        COALESCE(deduction, 0) AS deduction,
+        COALESCE(acceptance, 0) AS acceptance,
+        COALESCE(additional_payment, 0) AS additional_payment
+    FROM FinOtchet
+    WHERE org_id = ? AND CAST(rrd_id AS INTEGER) > ? AND CAST(rrd_id AS INTEGER) <= ?
+)
+WHERE day IS NOT NULL
+GROUP BY org_id, nm_id, sa_name, day
+ON CONFLICT (org_id, nm_id, sa_name, day) DO UPDATE SET
+    sales_qty = sales_qty + excluded.sales_qty,
+    returns_qty = returns_qty + excluded.returns_qty,
+    revenue = revenue + excluded.revenue,
+    for_pay = for_pay + excluded.for_pay,
+    commission = commission + excluded.commission,
+    acquiring = acquiring + excluded.acquiring,
+    logistics = logistics + excluded.logistics,
+    storage = storage + excluded.storage,
+    penalties = penalties + excluded.penalties,
+    deductions = deductions + excluded.deductions,
+    acceptance = acceptance + excluded.acceptance,
+    additional_payment = additional_payment + excluded.additional_payment,
+    payout = payout + excluded.payout,
+    rows_aggregated = rows_aggregated + excluded.rows_aggregated
+"""
+
+
+def ensure_pnl_daily(conn: sqlite3.Connection | sqlite3.Cursor) -> None:
+    """Create the ``PnLDaily`` table if it does not exist."""
+    conn.execute(PNL_DAILY_SQL)
+
+
+def build_pnl_daily(conn: sqlite3.Connection, full: bool = False) -> int:
+    """Fold FinOtchet rows added since the last run into ``PnLDaily``.
+
+    The last aggregated ``rrd_id`` of every organization is kept in
+    ``ImportState``; only rows above it are read, and the mart update is
+    committed together with the new cursor. Rows re-imported under an already
+    aggregated ``rrd_id`` are not counted again. ``full`` drops the mart and
+    rebuilds it from all rows. Returns the number of FinOtchet rows folded in.
+    """
+    cur = conn.cursor()
+    ensure_pnl_daily(cur)
+    ensure_import_state(cur)
+    if full:
+        cur.execute("DELETE FROM PnLDaily")
+        reset_cursor(cur, SCRIPT)
+    conn.commit()
+
+    total = 0
+    org_ids = [r[0] for r in cur.execute("SELECT DISTINCT org_id FROM FinOtchet").fetchall()]
+    for org_id in org_ids:
+        saved = load_cursor(cur, SCRIPT, org_id)
+        start = int(saved) if saved is not None else 0
+        cur.execute(
+            "SELECT MAX(CAST(rrd_id AS INTEGER)), COUNT(*) FROM FinOtchet "
+            "WHERE org_id = ? AND CAST(rrd_id AS INTEGER) > ?",
+            (org_id, start),
+        )
+        last, count = cur.fetchone()
+        if last is None:
+            logger.info("  Орг %s: новых строк FinOtchet нет (rrd_id > %s)", org_id, start)
+            continue
+        cur.execute(PNL_DAILY_UPSERT_SQL, (org_id, start, last))
+        save_cursor(cur, SCRIPT, org_id, last, count)
+        conn.commit()
+        total += count
+        logger.info("  Орг %s: +%s строк FinOtchet (rrd_id %s..%s)", org_id, count, start, last)
+    return total
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="build_marts", description="Обновление витрин.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild the marts from all rows instead of only new ones.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    setup_logging()
+    args = parse_args(argv)
+    db_path = get_db_path()
+    logger.info("DB: %s", db_path)
+
+    conn = connect(db_path)
+    try:
+        try:
+            added = build_pnl_daily(conn, full=args.full)
+        except sqlite3.OperationalError as exc:
+            logger.error("Не удалось построить PnLDaily: %s", exc)
+            raise SystemExit(1)
+        rows = conn.execute("SELECT COUNT(*) FROM PnLDaily").fetchone()[0]
+    finally:
+        conn.close()
+    logger.info("✅ PnLDaily: учтено новых строк FinOtchet: %s, строк витрины: %s", added, rows)
+
+
+if __name__ == "__main__":
+    main()
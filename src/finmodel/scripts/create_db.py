@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-import sqlite3
 from pathlib import Path
 
 import typer
 
 from finmodel.logger import setup_logging
+from finmodel.utils.db import connect
 
 
 def create_db(db_path: Path, schema_path: Path) -> None:
@@ -13,7 +13,7 @@ def create_db(db_path: Path, schema_path: Path) -> None:
     if not schema_path.exists():
         raise FileNotFoundError(f"Schema file not found: {schema_path}")
     schema_sql = schema_path.read_text(encoding="utf-8")
-    with sqlite3.connect(db_path) as conn:
+    with connect(db_path) as conn:
         conn.executescript(schema_sql)
 
 
@@ -0,0 +1,75 @@
+"""Export finmodel.db tables to partitioned Parquet files."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.parquet_export import export_table, list_tables
+from finmodel.utils.paths import get_db_path, get_project_root
+from finmodel.utils.settings import find_setting
+
+logger = get_logger(__name__)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="export", description="Выгрузка таблиц finmodel.db в Parquet."
+    )
+    parser.add_argument(
+        "tables",
+        nargs="*",
+        metavar="TABLE",
+        help="Tables to export (default: all tables of the database).",
+    )
+    parser.add_argument(
+        "--out",
+        metavar="DIR",
+        help="Output directory (default: PARQUET_DIR or parquet/ in the project root).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rewrite every partition instead of only the changed ones.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    setup_logging()
+    args = parse_args(argv)
+    out_dir = Path(args.out or find_setting("PARQUET_DIR", default=get_project_root() / "parquet"))
+    db_path = get_db_path()
+    logger.info("DB: %s → %s", db_path, out_dir)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.error("Для экспорта в Parquet установите pyarrow: pip install 'finmodel[parquet]'")
+        raise SystemExit(1)
+
+    conn = connect(db_path)
+    try:
+        tables = args.tables or list_tables(conn)
+        failed = []
+        for table in tables:
+            try:
+                written, removed = export_table(conn, table, out_dir, full=args.full)
+            except Exception:
+                logger.exception("Ошибка экспорта таблицы %s", table)
+                failed.append(table)
+                continue
+            logger.info("  %s: записано партиций %s, удалено %s", table, written, removed)
+    finally:
+        conn.close()
+    if failed:
+        logger.error("Не выгружены таблицы: %s", ", ".join(failed))
+        raise SystemExit(1)
+    logger.info("✅ Экспорт завершён: %s таблиц", len(tables))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
-import sqlite3
-import time
-
-import requests
-from requests.adapters import HTTPAdapter, Retry
+from typing import Any
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.concurrency import SQLiteWriter, run_per_org
+from finmodel.utils.db import bulk_load, connect
+from finmodel.utils.http import make_http
+from finmodel.utils.import_state import ensure_import_state, load_cursor, save_cursor
+from finmodel.utils.jsonstream import batched, iter_json_array
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 from finmodel.utils.settings import (
     find_setting,
     load_organizations,
@@ -15,6 +17,8 @@ from finmodel.utils.settings import (
 
 logger = get_logger(__name__)
 
+SCRIPT = "finotchet_import"  # key in ImportState
+
 
 WB_FIELDS = [
     "realizationreport_id",
@@ -97,20 +101,83 @@ WB_FIELDS = [
 ]
 LOWER_FIELDS = {"sa_name"}
 
+# Column types of FinOtchet. Fields not listed are TEXT; dates are stored as
+# ISO-8601 TEXT so SQLite date functions and range filters work on them.
+INTEGER_FIELDS = {
+    "realizationreport_id",
+    "rrd_id",
+    "gi_id",
+    "nm_id",
+    "quantity",
+    "shk_id",
+    "delivery_amount",
+    "return_amount",
+    "ppvz_office_id",
+    "ppvz_supplier_id",
+    "srv_dbs",
+    "assembly_id",
+    "report_type",
+    "is_legal_entity",
+}
+REAL_FIELDS = {
+    "dlv_prc",
+    "retail_price",
+    "retail_amount",
+    "sale_percent",
+    "commission_percent",
+    "retail_price_withdisc_rub",
+    "delivery_rub",
+    "product_discount_for_report",
+    "supplier_promo",
+    "ppvz_spp_prc",
+    "ppvz_kvw_prc_base",
+    "ppvz_kvw_prc",
+    "sup_rating_prc_up",
+    "is_kgvp_v2",
+    "ppvz_sales_commission",
+    "ppvz_for_pay",
+    "ppvz_reward",
+    "acquiring_fee",
+    "acquiring_percent",
+    "ppvz_vw",
+    "ppvz_vw_nds",
+    "penalty",
+    "additional_payment",
+    "rebill_logistic_cost",
+    "storage_fee",
+    "deduction",
+    "acceptance",
+    "installment_cofinancing_amount",
+    "wibes_wb_discount_percent",
+    "cashback_amount",
+    "cashback_discount",
+}
 
-def make_http() -> requests.Session:
-    session = requests.Session()
-    retries = Retry(
-        total=5,
-        read=5,
-        connect=5,
-        backoff_factor=0.5,
-        status_forcelist=(429, 500, 502, 503, 504),
-        allowed_methods=frozenset(["GET"]),
-    )
-    session.mount("https://", HTTPAdapter(max_retries=retries))
-    session.mount("http://", HTTPAdapter(max_retries=retries))
-    return session
+
+def field_type(field: str) -> str:
+    """Return the SQLite column type of a FinOtchet field."""
+    if field in INTEGER_FIELDS:
+        return "INTEGER"
+    if field in REAL_FIELDS:
+        return "REAL"
+    return "TEXT"
+
+
+def convert_value(field: str, value: Any) -> Any:
+    """Convert an API value to the column type; empty values become ``None``."""
+    if value is None or value == "":
+        return None
+    kind = field_type(field)
+    try:
+        if kind == "INTEGER":
+            return int(value)
+        if kind == "REAL":
+            return float(value)
+    except (TypeError, ValueError):
+        logger.debug("Unexpected %s value for %s: %r", kind, field, value)
+        return str(value)
+    value = str(value)
+    return value.lower() if field in LOWER_FIELDS else value
 
 
 def main() -> None:
@@ -118,7 +185,7 @@ def main() -> None:
 
     PAGE_LIMIT = 100_000
     REQUEST_TIMEOUT = 60
-    API_SLEEP = 60
+    INSERT_BATCH = 5_000  # rows per executemany while streaming a page
 
     db_path = get_db_path()
 
@@ -140,9 +207,9 @@ def main() -> None:
         logger.error("Настройки.xlsm не содержит организаций с токенами.")
         raise SystemExit(1)
 
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, check_same_thread=False)
     cursor = conn.cursor()
-    fields_sql = ", ".join([f"{f} TEXT" for f in WB_FIELDS])
+    fields_sql = ", ".join([f"{f} {field_type(f)}" for f in WB_FIELDS])
     cursor.execute(
         f"""
     CREATE TABLE IF NOT EXISTS FinOtchet (
@@ -153,13 +220,15 @@ def main() -> None:
     );
     """
     )
+    ensure_import_state(cursor)
     conn.commit()
+    writer = SQLiteWriter(conn)
 
     url = "https://statistics-api.wildberries.ru/api/v5/supplier/reportDetailByPeriod"
     headers_template = {"Content-Type": "application/json"}
     http = make_http()
 
-    for _, row in df_orgs.iterrows():
+    def import_org(row) -> int:
         org_id = row["id"]
         org_name = row["Организация"]
         token = row["Token_WB"]
@@ -168,9 +237,14 @@ def main() -> None:
         headers = headers_template.copy()
         headers["Authorization"] = token
 
-        cursor.execute("SELECT MAX(rrd_id) FROM FinOtchet WHERE org_id = ?", (org_id,))
-        rrd_row = cursor.fetchone()
-        rrdid = int(rrd_row[0]) if rrd_row and rrd_row[0] is not None else 0
+        with writer.cursor() as cur:
+            saved = load_cursor(cur, SCRIPT, org_id)
+            if saved is None:
+                # No checkpoint yet (e.g. table filled by an older version)
+                cur.execute("SELECT MAX(rrd_id) FROM FinOtchet WHERE org_id = ?", (org_id,))
+                rrd_row = cur.fetchone()
+                saved = rrd_row[0] if rrd_row else None
+        rrdid = int(saved) if saved is not None else 0
         logger.info("  Начальное rrd_id=%s", rrdid)
         total_loaded = 0
         page = 1
@@ -183,52 +257,57 @@ def main() -> None:
                 "limit": PAGE_LIMIT,
             }
             logger.info("  📤 Запрос page %s, rrdid=%s ...", page, rrdid)
+            acquire(token, url)
             try:
-                resp = http.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
-                if resp.status_code != 200:
-                    logger.warning("  Запрос вернул статус %s: %s", resp.status_code, resp.text)
-                    time.sleep(API_SLEEP)
-                    break
-                data = resp.json()
+                resp = http.get(
+                    url, params=params, headers=headers, timeout=REQUEST_TIMEOUT, stream=True
+                )
             except Exception as e:
                 logger.warning("  Ошибка запроса: %s", e)
-                time.sleep(API_SLEEP)
                 break
 
-            if not data:
+            # Stream the page: records are decoded and inserted in batches,
+            # so memory does not grow with the page size.
+            loaded = 0
+            last_rec = None
+            placeholders = ",".join(["?"] * (2 + len(WB_FIELDS)))
+            with resp:
+                if resp.status_code != 200:
+                    logger.warning("  Запрос вернул статус %s: %s", resp.status_code, resp.text)
+                    break
+                try:
+                    for batch in batched(iter_json_array(resp), INSERT_BATCH):
+                        rows = [
+                            [org_id, org_name] + [convert_value(f, rec.get(f)) for f in WB_FIELDS]
+                            for rec in batch
+                        ]
+                        with writer.cursor() as cur:
+                            cur.executemany(
+                                f"INSERT OR REPLACE INTO FinOtchet VALUES ({placeholders})",
+                                rows,
+                            )
+                            save_cursor(cur, SCRIPT, org_id, batch[-1].get("rrd_id"), len(rows))
+                            conn.commit()
+                        loaded += len(rows)
+                        last_rec = batch[-1]
+                except Exception as e:
+                    logger.warning("  Ошибка загрузки страницы: %s", e)
+                    break
+
+            if not loaded:
                 logger.info("✅ Фин. отчёт загружен для этой организации.")
                 break
 
-            rows = []
-            for rec in data:
-                rows.append(
-                    [
-                        org_id,
-                        org_name,
-                    ]
-                    + [
-                        str(rec.get(f, "")).lower() if f in LOWER_FIELDS else str(rec.get(f, ""))
-                        for f in WB_FIELDS
-                    ]
-                )
+            total_loaded += loaded
+            logger.info("  +%s записей (итого: %s)", loaded, total_loaded)
 
-            try:
-                placeholders = ",".join(["?"] * (2 + len(WB_FIELDS)))
-                cursor.executemany(
-                    f"INSERT OR REPLACE INTO FinOtchet VALUES ({placeholders})",
-                    rows,
-                )
-                conn.commit()
-            except Exception as e:
-                logger.warning("  Ошибка вставки: %s", e)
-                break
+            rrdid = int(last_rec.get("rrd_id", 0))
+            page += 1
 
-            total_loaded += len(rows)
-            logger.info("  +%s записей (итого: %s)", len(rows), total_loaded)
+        return total_loaded
 
-            rrdid = int(data[-1].get("rrd_id", 0))
-            page += 1
-            time.sleep(API_SLEEP)
+    with bulk_load(conn):
+        run_per_org(df_orgs, import_org)
 
     cursor.execute("SELECT COUNT(*) FROM FinOtchet")
     total_rows = cursor.fetchone()[0] or 0
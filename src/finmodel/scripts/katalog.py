@@ -1,14 +1,25 @@
+import argparse
+import json
 import sqlite3
-import time
-
-import requests
+from typing import List, Optional, Set
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.http import get_session
+from finmodel.utils.import_state import ensure_import_state, load_cursor, save_cursor
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 from finmodel.utils.settings import find_setting, load_organizations
 
 # Keep REQUIRED_COLUMNS in sync with ``load_organizations`` implementation.
 REQUIRED_COLUMNS = {"id", "Организация", "Token_WB"}
+SCRIPT = "katalog"  # key in ImportState
+PAGE_LIMIT = 100
+# Card columns of ``katalog`` besides ``snapshot_date``.
+CARD_COLUMNS = (
+    "org_id, Организация, nmID, imtID, nmUUID, subjectID, subjectName, brand, vendorCode, "
+    "techSize, sku, chrtID, createdAt, updatedAt"
+)
 
 logger = get_logger(__name__)
 
@@ -21,7 +32,11 @@ def fetch_cards(
     headers: dict,
     url: str,
     label: str,
-) -> None:
+    *,
+    start: Optional[dict] = None,
+    checkpoint: bool = False,
+    seen: Optional[Set[int]] = None,
+) -> Optional[int]:
     """Fetch cards from *url* and store them in ``katalog``.
 
     Parameters
@@ -36,19 +51,35 @@ def fetch_cards(
         Endpoint to query (active or trash).
     label
         Text to distinguish log entries (e.g. ``"active"`` or ``"trash"``).
+    start
+        ``{"updatedAt": ..., "nmID": ...}`` cursor to resume from; only cards
+        updated after it are returned.
+    checkpoint
+        Request cards in ascending ``updatedAt`` order and save the cursor of
+        every stored page in ``ImportState`` so the next run can resume.
+    seen
+        Set collecting the ``chrtID`` of every stored size.
+
+    Returns the number of cards received, or ``None`` if a request or a write
+    failed before the end of the list.
     """
 
+    http = get_session(retry_post=True)  # cards list is a read-only POST
     has_more = True
-    updatedAt = None
-    nmID = None
+    updatedAt = (start or {}).get("updatedAt")
+    nmID = (start or {}).get("nmID")
+    total = 0
 
     while has_more:
-        payload = {"settings": {"cursor": {"limit": 100}, "filter": {"withPhoto": -1}}}
+        payload = {"settings": {"cursor": {"limit": PAGE_LIMIT}, "filter": {"withPhoto": -1}}}
+        if checkpoint:
+            payload["settings"]["sort"] = {"ascending": True}
         if updatedAt and nmID:
             payload["settings"]["cursor"].update({"updatedAt": updatedAt, "nmID": nmID})
 
+        acquire(headers.get("Authorization"), url)
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = http.post(url, json=payload, headers=headers, timeout=30)
             if response.status_code != 200:
                 logger.warning(
                     "Ошибка запроса (%s): статус %s, ответ: %s",
@@ -56,11 +87,11 @@ def fetch_cards(
                     response.status_code,
                     response.text,
                 )
-                break
+                return None
             data = response.json()
         except Exception as e:  # pylint: disable=broad-except
             logger.warning("Ошибка запроса (%s): %s", label, e)
-            break
+            return None
 
         cards = data.get("cards", [])
         if not cards:
@@ -108,27 +139,80 @@ def fetch_cards(
                 """,
                     rows,
                 )
-                conn.commit()
             except Exception as e:  # pylint: disable=broad-except
                 logger.warning("Ошибка записи в БД (%s): %s", label, e)
-                break
+                conn.rollback()
+                return None
+            if seen is not None:
+                seen.update(r[11] for r in rows if r[11] is not None)
 
-        if cards:
-            last_card = cards[-1]
-            updatedAt = last_card.get("updatedAt")
-            nmID = last_card.get("nmID")
-            has_more = len(cards) == 100
-            logger.debug("Next %s cursor: updatedAt=%s, nmID=%s", label, updatedAt, nmID)
-        else:
-            has_more = False
+        last_card = cards[-1]
+        updatedAt = last_card.get("updatedAt")
+        nmID = last_card.get("nmID")
+        if checkpoint and updatedAt and nmID:
+            state = json.dumps({"updatedAt": updatedAt, "nmID": nmID})
+            save_cursor(cursor, SCRIPT, org_id, state, len(cards))
+        conn.commit()
+        total += len(cards)
+        has_more = len(cards) == PAGE_LIMIT
+        logger.debug("Next %s cursor: updatedAt=%s, nmID=%s", label, updatedAt, nmID)
 
         logger.info("  Загружено %s %s карточек", len(cards), label)
-        if has_more:
-            time.sleep(0.6)
+    return total
+
+
+def carry_forward_snapshot(cursor: sqlite3.Cursor, org_id: int) -> int:
+    """Copy the latest earlier snapshot of ``org_id`` into today's ``snapshot_date``.
+
+    An incremental run only receives changed cards; starting today's snapshot
+    from the previous one keeps the unchanged cards in it. Rows already stored
+    for today are kept. Returns the number of rows copied.
+    """
+    cursor.execute(
+        f"""
+        INSERT OR IGNORE INTO katalog ({CARD_COLUMNS}, snapshot_date)
+        SELECT {CARD_COLUMNS}, CURRENT_DATE FROM katalog
+        WHERE org_id = ? AND snapshot_date = (
+            SELECT MAX(snapshot_date) FROM katalog
+            WHERE org_id = ? AND snapshot_date < CURRENT_DATE
+        )
+        """,
+        (org_id, org_id),
+    )
+    return cursor.rowcount
 
 
-def main() -> None:
+def drop_unseen_cards(cursor: sqlite3.Cursor, org_id: int, seen: Set[int]) -> int:
+    """Delete sizes missing from a complete refetch from today's snapshot of ``org_id``."""
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS katalog_seen (chrtID INTEGER PRIMARY KEY)")
+    cursor.execute("DELETE FROM katalog_seen")
+    cursor.executemany("INSERT OR IGNORE INTO katalog_seen VALUES (?)", [(c,) for c in seen])
+    cursor.execute(
+        """
+        DELETE FROM katalog
+        WHERE org_id = ? AND snapshot_date = CURRENT_DATE AND chrtID IS NOT NULL
+          AND chrtID NOT IN (SELECT chrtID FROM katalog_seen)
+        """,
+        (org_id,),
+    )
+    removed = cursor.rowcount
+    cursor.execute("DELETE FROM katalog_seen")
+    return removed
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Refetch all cards instead of only those changed since the last run.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     setup_logging()
+    args = parse_args(argv)
     # 📌 Paths
     db_path = get_db_path()
 
@@ -154,7 +238,7 @@ def main() -> None:
     # 📌 Подключение к базе
     conn = None
     try:
-        conn = sqlite3.connect(db_path, timeout=10)
+        conn = connect(db_path, timeout=10)
         cursor = conn.cursor()
     except sqlite3.OperationalError as e:
         logger.error("Ошибка подключения к базе: %s", e)
@@ -162,11 +246,10 @@ def main() -> None:
             conn.close()
         raise SystemExit(1)
 
-    # 📌 Пересоздание таблицы с нужными столбцами
-    cursor.execute("DROP TABLE IF EXISTS katalog;")
+    # 📌 Таблица создаётся один раз; строки каждого дня хранятся со своим snapshot_date
     cursor.execute(
         """
-    CREATE TABLE katalog (
+    CREATE TABLE IF NOT EXISTS katalog (
         org_id INTEGER,
         Организация TEXT,
         nmID INTEGER,
@@ -186,6 +269,7 @@ def main() -> None:
     );
     """
     )
+    ensure_import_state(conn)
     conn.commit()
 
     # Показываем структуру таблицы
@@ -207,12 +291,58 @@ def main() -> None:
         headers = headers_template.copy()
         headers["Authorization"] = token
 
-        fetch_cards(cursor, conn, org_id, org_name, headers, active_url, "active")
-        fetch_cards(cursor, conn, org_id, org_name, headers, trash_url, "trash")
+        saved = None if args.full else load_cursor(cursor, SCRIPT, org_id)
+        start = json.loads(saved) if saved else None
+        carried = carry_forward_snapshot(cursor, org_id)
+        conn.commit()
+        if carried:
+            logger.info("  Снимок на сегодня начат с предыдущего: %s строк", carried)
+        if start:
+            logger.info(
+                "  Инкремент: карточки, изменённые после %s (nmID=%s)",
+                start.get("updatedAt"),
+                start.get("nmID"),
+            )
+            fetch_cards(
+                cursor,
+                conn,
+                org_id,
+                org_name,
+                headers,
+                active_url,
+                "active",
+                start=start,
+                checkpoint=True,
+            )
+            continue
+
+        # full reconcile: the trash list is not ordered by updatedAt, so it is
+        # only read here; sizes missing from a complete refetch are removed
+        logger.info("  Полная выгрузка карточек")
+        seen: Set[int] = set()
+        active = fetch_cards(
+            cursor,
+            conn,
+            org_id,
+            org_name,
+            headers,
+            active_url,
+            "active",
+            checkpoint=True,
+            seen=seen,
+        )
+        trash = fetch_cards(cursor, conn, org_id, org_name, headers, trash_url, "trash", seen=seen)
+        if active is None or trash is None:
+            logger.warning("  Выгрузка прервана — исчезнувшие карточки не удаляются")
+            continue
+        removed = drop_unseen_cards(cursor, org_id, seen)
+        conn.commit()
+        if removed:
+            logger.info("  Удалено исчезнувших карточек из снимка: %s", removed)
 
     # 📌 Завершение
     conn.close()
-    logger.info("✅ Все карточки успешно загружены в таблицу katalog (без дублей).")
+    logger.info("✅ Снимок каталога на сегодня обновлён в таблице katalog.")
 
 
 if __name__ == "__main__":
@@ -1,18 +1,127 @@
+import argparse
 import sqlite3
-import time
 from datetime import datetime, timedelta
-
-import requests
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.concurrency import SQLiteWriter, run_per_org
+from finmodel.utils.db import connect
+from finmodel.utils.http import get_session
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire, backoff, retry_delay
 from finmodel.utils.settings import find_setting, load_organizations
 
 logger = get_logger(__name__)
 
+# aggregationLevel of the WB report and the table its rows are stored in. The
+# level applies to the whole 7-day window: requests are counted per batch of
+# 20 nmIDs, so requesting older days weekly would cost a second POST per batch.
+TABLES = {"day": "WB_NMReportHistory", "week": "WB_NMReportHistoryWeekly"}
+# Sources of nmID activity besides the report itself: (table, nmID column).
+ACTIVITY_TABLES = (("OrdersWBFlat", "nmId"), ("SalesWBFlat", "nmId"))
+# Inactive nmIDs are requested again once their last loaded day is this old.
+RECHECK_DAYS = 7
+
+
+def _as_nmid(value: object) -> Optional[int]:
+    """Return ``value`` as an nmID, or ``None`` for blanks and junk like ``"None"``."""
+    try:
+        number = float(str(value).strip())
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() else None
+
+
+def load_last_loaded(cur: sqlite3.Cursor, table: str, org_id: str) -> Dict[int, str]:
+    """Return the latest loaded ``dt`` (``YYYY-MM-DD``) of every nmID of ``org_id``."""
+    rows = cur.execute(
+        f"SELECT nmID, MAX(substr(dt, 1, 10)) FROM {table} WHERE org_id = ? GROUP BY nmID",
+        (org_id,),
+    ).fetchall()
+    last_loaded: Dict[int, str] = {}
+    for value, dt in rows:
+        nm = _as_nmid(value)
+        if nm is not None and dt:
+            last_loaded[nm] = max(dt, last_loaded.get(nm, dt))
+    return last_loaded
+
+
+def find_inactive_nmids(
+    cur: sqlite3.Cursor,
+    table: str,
+    org_id: str,
+    nmids: Iterable[int],
+    since: str,
+    last_loaded: Dict[int, str],
+    recheck_before: Optional[str] = None,
+) -> Set[int]:
+    """Return nmIDs without views, orders or sales since ``since``.
+
+    Only nmIDs with report rows in ``last_loaded`` can be inactive; nmIDs never
+    loaded are always requested. A skipped nmID gets no new report rows, so
+    one whose last loaded day is before ``recheck_before`` is requested again
+    to see whether it came back to life. Activity is taken from the report
+    rows (views or orders) and from the orders/sales tables when they exist.
+    """
+    active: Set[int] = set()
+    queries = [
+        (
+            f"SELECT DISTINCT nmID FROM {table} WHERE org_id = ? AND dt >= ? "
+            "AND (CAST(openCardCount AS REAL) > 0 OR CAST(ordersCount AS REAL) > 0)"
+        )
+    ] + [
+        f"SELECT DISTINCT {column} FROM {source} WHERE org_id = ? AND date >= ?"
+        for source, column in ACTIVITY_TABLES
+    ]
+    for sql in queries:
+        try:
+            rows = cur.execute(sql, (org_id, since)).fetchall()
+        except sqlite3.OperationalError:
+            continue
+        active.update(nm for nm in (_as_nmid(r[0]) for r in rows) if nm is not None)
+    return {
+        nm
+        for nm in nmids
+        if nm in last_loaded
+        and nm not in active
+        and not (recheck_before and last_loaded[nm] < recheck_before)
+    }
+
 
-def main() -> None:
+def plan_periods(
+    nmids: Iterable[int], last_loaded: Dict[int, str], date_from: str, date_to: str
+) -> Dict[Tuple[str, str], List[int]]:
+    """Group nmIDs by the period still to be requested.
+
+    The last loaded day is requested again because it may have been loaded
+    before the day was over; nmIDs without rows get the whole window.
+    """
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for nm in nmids:
+        last = last_loaded.get(nm)
+        begin = max(date_from, last) if last else date_from
+        groups.setdefault((min(begin, date_to), date_to), []).append(nm)
+    return groups
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--aggregation",
+        choices=sorted(TABLES),
+        help="Report aggregation level (default: NM_REPORT_AGGREGATION or day).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Request nmIDs without recent views, orders or sales too.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     setup_logging()
+    args = parse_args(argv)
     # --- Paths ---
     db_path = get_db_path()
 
@@ -28,6 +137,14 @@ def main() -> None:
     date_from = (today - timedelta(days=7)).strftime("%Y-%m-%d")
     date_to = today.strftime("%Y-%m-%d")
     logger.info("Период запроса: %s .. %s", date_from, date_to)
+    recheck_before = (today - timedelta(days=RECHECK_DAYS)).strftime("%Y-%m-%d")
+    aggregation = str(
+        args.aggregation or find_setting("NM_REPORT_AGGREGATION", default="day")
+    ).lower()
+    if aggregation not in TABLES:
+        logger.error("NM_REPORT_AGGREGATION must be one of %s, got %r", sorted(TABLES), aggregation)
+        raise SystemExit(1)
+    logger.info("Агрегация: %s", aggregation)
 
     # --- Load organizations and tokens ---
     df_orgs = load_organizations(sheet=org_sheet)
@@ -36,11 +153,11 @@ def main() -> None:
         raise SystemExit(1)
 
     # --- Подключение к БД ---
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, check_same_thread=False)
     cur = conn.cursor()
 
     # --- Таблица результата (плоская) ---
-    TABLE = "WB_NMReportHistory"
+    TABLE = TABLES[aggregation]
     cur.execute(
         f"""
     CREATE TABLE IF NOT EXISTS {TABLE} (
@@ -65,6 +182,7 @@ def main() -> None:
     """
     )
     conn.commit()
+    writer = SQLiteWriter(conn)
 
     # --- Хелперы ---
     def chunked(lst, n):
@@ -73,7 +191,7 @@ def main() -> None:
 
     API_URL = "https://seller-analytics-api.wildberries.ru/api/v2/nm-report/detail/history"
     HEADERS_BASE = {"Content-Type": "application/json"}
-    SLEEP_BETWEEN_CALLS = 20  # лимит 3 req/min → держим 20 сек
+    http = get_session(retry_post=True, retry_429=False)
 
     def get_nmids_for_org(c, org_id, org_name):
         # 1) katalog
@@ -100,46 +218,70 @@ def main() -> None:
         logger.warning("  Не найдены nmID для организации %s (ID=%s).", org_name, org_id)
         return []
 
-    def do_request(token, nm_ids):
+    def do_request(token, nm_ids, begin, end):
         headers = HEADERS_BASE.copy()
         headers["Authorization"] = token
         body = {
             "nmIDs": nm_ids,  # максимум 20
-            "period": {"begin": date_from, "end": date_to},
+            "period": {"begin": begin, "end": end},
             "timezone": "Europe/Moscow",
-            "aggregationLevel": "day",
+            "aggregationLevel": aggregation,
         }
-        resp = requests.post(API_URL, headers=headers, json=body, timeout=90)
+        acquire(token, API_URL)  # лимит 3 req/min на токен
+        resp = http.post(API_URL, headers=headers, json=body, timeout=90)
         return resp
 
-    # --- Основной цикл по организациям ---
-    total_inserted = 0
+    # --- Организации параллельно: лимит 3 req/min действует на каждый токен ---
     now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    for _, org in df_orgs.iterrows():
+    def import_org(org) -> int:
         org_id = str(org["id"])
         org_name = str(org["Организация"])
         token = str(org["Token_WB"]).strip()
 
         logger.info("→ Организация: %s (ID=%s)", org_name, org_id)
-        nmids = get_nmids_for_org(cur, org_id, org_name)
+        with writer.cursor() as wcur:
+            nmids = get_nmids_for_org(wcur, org_id, org_name)
+            last_loaded = load_last_loaded(wcur, TABLE, org_id)
+            inactive = (
+                set()
+                if args.force
+                else find_inactive_nmids(
+                    wcur, TABLE, org_id, nmids, date_from, last_loaded, recheck_before
+                )
+            )
+        if inactive:
+            logger.info("  Пропускаю nmID без просмотров и заказов: %s (--force)", len(inactive))
+            nmids = [nm for nm in nmids if nm not in inactive]
         if not nmids:
-            continue
+            return 0
+        org_inserted = 0
 
-        logger.info("  Всего nmID: %s (батчи по 20)", len(nmids))
+        # nmIDs with the same missing period share batches
+        groups = plan_periods(nmids, last_loaded, date_from, date_to)
+        batches = [
+            (period, batch)
+            for period, group in sorted(groups.items())
+            for batch in chunked(group, 20)
+        ]
+        logger.info(
+            "  Всего nmID: %s, периодов: %s, батчей по 20: %s",
+            len(nmids),
+            len(groups),
+            len(batches),
+        )
 
-        batch_num = 0
-        for batch in chunked(nmids, 20):
-            batch_num += 1
-            logger.info("  ▶ Батч %s: %s nmID", batch_num, len(batch))
+        for batch_num, ((begin, end), batch) in enumerate(batches, start=1):
+            logger.info("  ▶ Батч %s: %s nmID, %s .. %s", batch_num, len(batch), begin, end)
 
             try:
-                resp = do_request(token, batch)
+                resp = do_request(token, batch, begin, end)
                 # Если упёрлись в лимит — немного подождём и повторим 1 раз
                 if resp.status_code == 429:
-                    logger.warning("    429 Too Many Requests. Жду 25 сек и повторяю…")
-                    time.sleep(25)
-                    resp = do_request(token, batch)
+                    delay = retry_delay(resp, 25)
+                    logger.warning("    429 Too Many Requests. Жду %s сек и повторяю…", delay)
+                    backoff(token, API_URL, delay)
+                    resp = do_request(token, batch, begin, end)
 
                 if resp.status_code == 401:
                     logger.error(
@@ -149,15 +291,12 @@ def main() -> None:
 
                 if resp.status_code != 200:
                     logger.warning("    HTTP %s: %s", resp.status_code, resp.text[:300])
-                    # даже при ошибке соблюдём паузу между вызовами
-                    time.sleep(SLEEP_BETWEEN_CALLS)
                     continue
 
                 payload = resp.json() or {}
                 data = payload.get("data", [])
                 if not isinstance(data, list):
                     logger.warning("    Неожиданный формат ответа (ожидали массив 'data').")
-                    time.sleep(SLEEP_BETWEEN_CALLS)
                     continue
 
                 rows = []
@@ -190,20 +329,23 @@ def main() -> None:
 
                 if rows:
                     ph = ",".join(["?"] * 16)
-                    cur.executemany(f"INSERT OR REPLACE INTO {TABLE} VALUES ({ph})", rows)
-                    conn.commit()
-                    total_inserted += len(rows)
-                    logger.info("    ✅ +%s строк (итого: %s)", len(rows), total_inserted)
+                    with writer.cursor() as wcur:
+                        wcur.executemany(f"INSERT OR REPLACE INTO {TABLE} VALUES ({ph})", rows)
+                        conn.commit()
+                    org_inserted += len(rows)
+                    logger.info(
+                        "    ✅ %s: +%s строк (итого: %s)", org_name, len(rows), org_inserted
+                    )
                 else:
                     logger.warning("    Пустые данные по этому батчу.")
 
             except Exception as e:
                 logger.warning("    Ошибка запроса/вставки: %s", e)
 
-            # строго выдерживаем лимит 3 запроса/мин → пауза 20 секунд
-            time.sleep(SLEEP_BETWEEN_CALLS)
+        return org_inserted
 
-    conn.close()
+    total_inserted = sum(run_per_org(df_orgs, import_org))
+    writer.close()
     logger.info("✅ Готово. Всего добавлено/обновлено строк: %s в %s", total_inserted, TABLE)
 
 
@@ -1,16 +1,24 @@
 import argparse
-import sqlite3
-import time
-
-import requests
-from requests.adapters import HTTPAdapter, Retry
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.concurrency import SQLiteWriter, run_per_org
+from finmodel.utils.db import bulk_load, connect
+from finmodel.utils.http import make_http
+from finmodel.utils.import_state import (
+    ensure_import_state,
+    load_cursor,
+    reset_cursor,
+    save_cursor,
+)
+from finmodel.utils.jsonstream import batched, iter_json_array
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 from finmodel.utils.settings import find_setting, load_organizations, load_period, parse_date
 
 logger = get_logger(__name__)
 
+SCRIPT = "orderswb_import_flat"  # key in ImportState
+
 
 def main(argv: list[str] | None = None) -> None:
     parser = argparse.ArgumentParser()
@@ -25,6 +33,7 @@ def main(argv: list[str] | None = None) -> None:
     # Максимальный размер страницы, заявленный в документации WB API
     PAGE_LIMIT = 100_000
     REQUEST_TIMEOUT = 60
+    INSERT_BATCH = 5_000  # rows per executemany while streaming a page
 
     # --- Paths ---
     db_path = get_db_path()
@@ -82,7 +91,7 @@ def main(argv: list[str] | None = None) -> None:
     LOWER_FIELDS = {"supplierArticle"}
 
     # --- Подключение к базе и создание плоской таблицы ---
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, check_same_thread=False)
     cursor = conn.cursor()
     fields_sql = ", ".join([f"{f} TEXT" for f in ORDER_FIELDS])
     cursor.execute(
@@ -95,22 +104,16 @@ def main(argv: list[str] | None = None) -> None:
     );
     """
     )
+    # Backs the watermark lookups per organization, including the
+    # ORDER BY lastChangeDate, srid fallback (replaces idx_OrdersWB_org_lcd).
+    cursor.execute("DROP INDEX IF EXISTS idx_OrdersWB_org_lcd")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_OrdersWB_org_lcd_srid "
+        "ON OrdersWBFlat(org_id, lastChangeDate, srid)"
+    )
+    ensure_import_state(cursor)
     conn.commit()
-
-    # --- HTTP session ---
-    def make_http() -> requests.Session:
-        s = requests.Session()
-        retries = Retry(
-            total=5,
-            read=5,
-            connect=5,
-            backoff_factor=0.5,
-            status_forcelist=(429, 500, 502, 503, 504),
-            allowed_methods=frozenset(["GET"]),
-        )
-        s.mount("https://", HTTPAdapter(max_retries=retries))
-        s.mount("http://", HTTPAdapter(max_retries=retries))
-        return s
+    writer = SQLiteWriter(conn)
 
     # --- API запрос ---
     url = "https://statistics-api.wildberries.ru/api/v1/supplier/orders"
@@ -118,7 +121,7 @@ def main(argv: list[str] | None = None) -> None:
 
     http = make_http()
 
-    for _, row in df_orgs.iterrows():
+    def import_org(row) -> int:
         org_id = row["id"]
         org_name = row["Организация"]
         token = row["Token_WB"]
@@ -128,33 +131,39 @@ def main(argv: list[str] | None = None) -> None:
         headers["Authorization"] = token
 
         if args.full_reload:
-            cursor.execute(
-                "DELETE FROM OrdersWBFlat WHERE org_id = ? AND lastChangeDate >= ?",
-                (org_id, period_start),
-            )
-            conn.commit()
+            with writer.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM OrdersWBFlat WHERE org_id = ? AND lastChangeDate >= ?",
+                    (org_id, period_start),
+                )
+                reset_cursor(cur, SCRIPT, org_id)
+                conn.commit()
             date_from = period_start
         else:
-            cursor.execute(
-                """
-                SELECT lastChangeDate, srid FROM OrdersWBFlat
-                WHERE org_id = ?
-                ORDER BY lastChangeDate DESC, srid DESC
-                LIMIT 1
-                """,
-                (org_id,),
-            )
-            last_row = cursor.fetchone()
-            if last_row:
-                last_change, last_srid = last_row
-                logger.info(
-                    "  Last known record lastChangeDate=%s srid=%s",
-                    last_change,
-                    last_srid,
-                )
-                date_from = max(last_change, period_start)
-            else:
-                date_from = period_start
+            with writer.cursor() as cur:
+                last_change = load_cursor(cur, SCRIPT, org_id)
+                if last_change is None:
+                    # No checkpoint yet (e.g. table filled by an older version)
+                    cur.execute(
+                        """
+                        SELECT lastChangeDate, srid FROM OrdersWBFlat
+                        WHERE org_id = ?
+                        ORDER BY lastChangeDate DESC, srid DESC
+                        LIMIT 1
+                        """,
+                        (org_id,),
+                    )
+                    last_row = cur.fetchone()
+                    if last_row:
+                        last_change, last_srid = last_row
+                        logger.info(
+                            "  Last known record lastChangeDate=%s srid=%s",
+                            last_change,
+                            last_srid,
+                        )
+                else:
+                    logger.info("  Checkpoint lastChangeDate=%s", last_change)
+            date_from = max(last_change, period_start) if last_change else period_start
 
         total_loaded = 0
         page = 1
@@ -162,60 +171,77 @@ def main(argv: list[str] | None = None) -> None:
         while True:
             params = {"dateFrom": date_from}
             logger.info("  📤 Запрос page %s, dateFrom=%s ...", page, date_from)
+            acquire(token, url)
             try:
-                resp = http.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
-                if resp.status_code != 200:
-                    logger.warning("  Запрос вернул статус %s: %s", resp.status_code, resp.text)
-                    time.sleep(5)
-                    break
-                data = resp.json()
+                resp = http.get(
+                    url, params=params, headers=headers, timeout=REQUEST_TIMEOUT, stream=True
+                )
             except Exception as e:
                 logger.warning("  Ошибка запроса: %s", e)
-                time.sleep(5)
                 break
 
-            if not data:
-                logger.info("✅ Все заказы загружены для этой организации.")
-                break
+            # Stream the page: records are decoded and inserted in batches,
+            # so memory does not grow with the page size.
+            loaded = 0
+            last_rec = None
+            placeholders = ",".join(["?"] * (2 + len(ORDER_FIELDS)))
+            with resp:
+                if resp.status_code != 200:
+                    logger.warning("  Запрос вернул статус %s: %s", resp.status_code, resp.text)
+                    break
+                try:
+                    for batch in batched(iter_json_array(resp), INSERT_BATCH):
+                        # Распаковка
+                        rows = [
+                            [org_id, org_name]
+                            + [
+                                (
+                                    str(rec.get(f, "")).lower()
+                                    if f in LOWER_FIELDS
+                                    else str(rec.get(f, ""))
+                                )
+                                for f in ORDER_FIELDS
+                            ]
+                            for rec in batch
+                        ]
+                        with writer.cursor() as cur:
+                            cur.executemany(
+                                f"""
+                                INSERT OR REPLACE INTO OrdersWBFlat
+                                VALUES ({placeholders})
+                            """,
+                                rows,
+                            )
+                            save_cursor(
+                                cur, SCRIPT, org_id, batch[-1].get("lastChangeDate"), len(rows)
+                            )
+                            conn.commit()
+                        loaded += len(rows)
+                        last_rec = batch[-1]
+                except Exception as e:
+                    logger.warning("  Ошибка загрузки страницы: %s", e)
+                    break
 
-            # Распаковка
-            rows = []
-            for rec in data:
-                flat = [
-                    org_id,
-                    org_name,
-                ] + [
-                    str(rec.get(f, "")).lower() if f in LOWER_FIELDS else str(rec.get(f, ""))
-                    for f in ORDER_FIELDS
-                ]
-                rows.append(flat)
-            try:
-                placeholders = ",".join(["?"] * (2 + len(ORDER_FIELDS)))
-                cursor.executemany(
-                    f"""
-                    INSERT OR REPLACE INTO OrdersWBFlat
-                    VALUES ({placeholders})
-                """,
-                    rows,
-                )
-                conn.commit()
-            except Exception as e:
-                logger.warning("  Ошибка вставки: %s", e)
+            if not loaded:
+                logger.info("✅ Все заказы загружены для этой организации.")
                 break
 
-            total_loaded += len(rows)
-            logger.info("  +%s заказов (итого: %s)", len(rows), total_loaded)
+            total_loaded += loaded
+            logger.info("  +%s заказов (итого: %s)", loaded, total_loaded)
 
-            if len(rows) < PAGE_LIMIT:
+            if loaded < PAGE_LIMIT:
                 logger.info("  ✅ Заказы по периоду загружены полностью.")
                 break
 
             # pagination: следующий dateFrom = lastChangeDate последней строки
-            date_from = data[-1].get("lastChangeDate")
+            date_from = last_rec.get("lastChangeDate")
             page += 1
-            time.sleep(3)  # Лимит 1 запрос в минуту, но WB часто разрешает чуть чаще
 
-    conn.close()
+        return total_loaded
+
+    with bulk_load(conn):
+        run_per_org(df_orgs, import_org)
+    writer.close()
     logger.info("✅ Все заказы загружены и распарсены в таблицу OrdersWBFlat (без дублей).")
 
 
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+from graphlib import TopologicalSorter
+from pathlib import Path
+from typing import List, Optional
+
+from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.paths import get_project_root
+from finmodel.utils.pipeline import (
+    DEFAULT_PIPELINE_WORKERS,
+    OK,
+    load_pipeline,
+    run_pipeline,
+)
+from finmodel.utils.settings import find_setting
+
+logger = get_logger(__name__)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="pipeline", description="Запуск импортов по графу зависимостей в одном процессе."
+    )
+    parser.add_argument(
+        "--config",
+        metavar="PATH",
+        help="YAML с описанием шагов (по умолчанию: PIPELINE_CONFIG или pipeline.yml).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=f"Шагов одновременно (по умолчанию из файла или {DEFAULT_PIPELINE_WORKERS}).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Только показать порядок шагов, ничего не запускать.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    setup_logging()
+    args = parse_args(argv)
+    config = Path(
+        args.config or find_setting("PIPELINE_CONFIG", default=get_project_root() / "pipeline.yml")
+    )
+    try:
+        steps, file_workers = load_pipeline(config)
+    except (FileNotFoundError, ValueError) as exc:
+        logger.error("%s", exc)
+        raise SystemExit(1)
+    if not steps:
+        logger.error("В %s не описано ни одного шага.", config)
+        raise SystemExit(1)
+    workers = args.workers or file_workers or DEFAULT_PIPELINE_WORKERS
+    logger.info("Пайплайн %s: %s шагов, до %s одновременно", config, len(steps), workers)
+
+    if args.dry_run:
+        order = TopologicalSorter({s.name: s.after for s in steps.values()}).static_order()
+        for idx, name in enumerate(order, start=1):
+            after = ", ".join(steps[name].after) or "—"
+            logger.info("%2d. %s (после: %s)", idx, name, after)
+        return
+
+    status = run_pipeline(steps, workers=workers)
+    failed = [name for name, result in status.items() if result != OK]
+    if failed:
+        logger.error("Не выполнены шаги: %s", ", ".join(failed))
+        raise SystemExit(1)
+    logger.info("✅ Пайплайн завершён: %s шагов", len(status))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,42 @@
 import argparse
-import sqlite3
-import time
-
-import requests
-from requests.adapters import HTTPAdapter, Retry
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.concurrency import SQLiteWriter, run_per_org
+from finmodel.utils.db import bulk_load, connect
+from finmodel.utils.http import make_http
+from finmodel.utils.import_state import (
+    ensure_import_state,
+    load_cursor,
+    reset_cursor,
+    save_cursor,
+)
+from finmodel.utils.jsonstream import batched, iter_json_array
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 from finmodel.utils.settings import find_setting, load_organizations, load_period, parse_date
 
 logger = get_logger(__name__)
 
+SCRIPT = "saleswb_import_flat"  # key in ImportState
+
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--full-reload",
         action="store_true",
         help="Delete existing SalesWBFlat rows before import.",
     )
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
     setup_logging()
-    args = parse_args()
+    args = parse_args(argv)
     # Maximum page size stated in WB API documentation
     PAGE_LIMIT = 100_000
     REQUEST_TIMEOUT = 60
+    INSERT_BATCH = 5_000  # rows per executemany while streaming a page
 
     # --- Paths ---
     db_path = get_db_path()
@@ -86,7 +95,7 @@ def main() -> None:
     LOWER_FIELDS = {"supplierArticle"}
 
     # --- Connect to DB and create flat table ---
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, check_same_thread=False)
     cursor = conn.cursor()
     fields_sql = ", ".join([f"{f} TEXT" for f in SALES_FIELDS])
     cursor.execute(
@@ -99,25 +108,17 @@ def main() -> None:
     );
     """
     )
+    # Backs the MAX(lastChangeDate) watermark lookup per organization.
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_SalesWB_org_lcd ON SalesWBFlat(org_id, lastChangeDate)"
+    )
+    ensure_import_state(cursor)
     if args.full_reload:
         logger.info("Full reload requested: clearing SalesWBFlat table")
         cursor.execute("DELETE FROM SalesWBFlat")
+        reset_cursor(cursor, SCRIPT)
     conn.commit()
-
-    # --- HTTP session ---
-    def make_http() -> requests.Session:
-        s = requests.Session()
-        retries = Retry(
-            total=5,
-            read=5,
-            connect=5,
-            backoff_factor=0.5,
-            status_forcelist=(429, 500, 502, 503, 504),
-            allowed_methods=frozenset(["GET"]),
-        )
-        s.mount("https://", HTTPAdapter(max_retries=retries))
-        s.mount("http://", HTTPAdapter(max_retries=retries))
-        return s
+    writer = SQLiteWriter(conn)
 
     # --- API requests ---
     url = "https://statistics-api.wildberries.ru/api/v1/supplier/sales"
@@ -125,7 +126,7 @@ def main() -> None:
 
     http = make_http()
 
-    for _, row in df_orgs.iterrows():
+    def import_org(row) -> int:
         org_id = row["id"]
         org_name = row["Организация"]
         token = row["Token_WB"]
@@ -137,11 +138,15 @@ def main() -> None:
         if args.full_reload:
             date_from = period_start
         else:
-            cursor.execute(
-                "SELECT MAX(lastChangeDate) FROM SalesWBFlat WHERE org_id = ?",
-                (org_id,),
-            )
-            last_date = cursor.fetchone()[0]
+            with writer.cursor() as cur:
+                last_date = load_cursor(cur, SCRIPT, org_id)
+                if last_date is None:
+                    # No checkpoint yet (e.g. table filled by an older version)
+                    cur.execute(
+                        "SELECT MAX(lastChangeDate) FROM SalesWBFlat WHERE org_id = ?",
+                        (org_id,),
+                    )
+                    last_date = cur.fetchone()[0]
             date_from = last_date if last_date else period_start
 
         total_loaded = 0
@@ -150,60 +155,77 @@ def main() -> None:
         while True:
             params = {"dateFrom": date_from}
             logger.info("  📤 Запрос page %s, dateFrom=%s ...", page, date_from)
+            acquire(token, url)
             try:
-                resp = http.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
-                if resp.status_code != 200:
-                    logger.warning("  Запрос вернул статус %s: %s", resp.status_code, resp.text)
-                    time.sleep(5)
-                    break
-                data = resp.json()
+                resp = http.get(
+                    url, params=params, headers=headers, timeout=REQUEST_TIMEOUT, stream=True
+                )
             except Exception as e:
                 logger.warning("  Ошибка запроса: %s", e)
-                time.sleep(5)
                 break
 
-            if not data:
-                logger.info("✅ Все продажи загружены для этой организации.")
-                break
+            # Stream the page: records are decoded and inserted in batches,
+            # so memory does not grow with the page size.
+            loaded = 0
+            last_rec = None
+            placeholders = ",".join(["?"] * (2 + len(SALES_FIELDS)))
+            with resp:
+                if resp.status_code != 200:
+                    logger.warning("  Запрос вернул статус %s: %s", resp.status_code, resp.text)
+                    break
+                try:
+                    for batch in batched(iter_json_array(resp), INSERT_BATCH):
+                        # Unpack
+                        rows = [
+                            [org_id, org_name]
+                            + [
+                                (
+                                    str(rec.get(f, "")).lower()
+                                    if f in LOWER_FIELDS
+                                    else str(rec.get(f, ""))
+                                )
+                                for f in SALES_FIELDS
+                            ]
+                            for rec in batch
+                        ]
+                        with writer.cursor() as cur:
+                            cur.executemany(
+                                f"""
+                                INSERT OR REPLACE INTO SalesWBFlat
+                                VALUES ({placeholders})
+                            """,
+                                rows,
+                            )
+                            save_cursor(
+                                cur, SCRIPT, org_id, batch[-1].get("lastChangeDate"), len(rows)
+                            )
+                            conn.commit()
+                        loaded += len(rows)
+                        last_rec = batch[-1]
+                except Exception as e:
+                    logger.warning("  Ошибка загрузки страницы: %s", e)
+                    break
 
-            # Unpack
-            rows = []
-            for rec in data:
-                flat = [
-                    org_id,
-                    org_name,
-                ] + [
-                    str(rec.get(f, "")).lower() if f in LOWER_FIELDS else str(rec.get(f, ""))
-                    for f in SALES_FIELDS
-                ]
-                rows.append(flat)
-            try:
-                placeholders = ",".join(["?"] * (2 + len(SALES_FIELDS)))
-                cursor.executemany(
-                    f"""
-                    INSERT OR REPLACE INTO SalesWBFlat
-                    VALUES ({placeholders})
-                """,
-                    rows,
-                )
-                conn.commit()
-            except Exception as e:
-                logger.warning("  Ошибка вставки: %s", e)
+            if not loaded:
+                logger.info("✅ Все продажи загружены для этой организации.")
                 break
 
-            total_loaded += len(rows)
-            logger.info("  +%s продаж (итого: %s)", len(rows), total_loaded)
+            total_loaded += loaded
+            logger.info("  +%s продаж (итого: %s)", loaded, total_loaded)
 
-            if len(rows) < PAGE_LIMIT:
+            if loaded < PAGE_LIMIT:
                 logger.info("  ✅ Продажи по периоду загружены полностью.")
                 break
 
             # pagination: next dateFrom = lastChangeDate of last row
-            date_from = data[-1].get("lastChangeDate")
+            date_from = last_rec.get("lastChangeDate")
             page += 1
-            time.sleep(3)  # WB limit: 1 request per minute, but slightly faster is OK
 
-    conn.close()
+        return total_loaded
+
+    with bulk_load(conn):
+        run_per_org(df_orgs, import_org)
+    writer.close()
     logger.info("✅ Все продажи загружены и распарсены в таблицу SalesWBFlat (без дублей).")
 
 
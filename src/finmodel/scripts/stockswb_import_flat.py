@@ -1,12 +1,11 @@
 import json
-import sqlite3
-import time
-
-import requests
-from requests.adapters import HTTPAdapter, Retry
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.concurrency import SQLiteWriter, run_per_org
+from finmodel.utils.db import bulk_load, connect
+from finmodel.utils.http import make_http
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 from finmodel.utils.settings import find_setting, load_organizations, load_period, parse_date
 
 logger = get_logger(__name__)
@@ -64,7 +63,7 @@ def main() -> None:
     LOWER_FIELDS = {"supplierArticle"}
 
     # --- Пересоздание таблицы ---
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, check_same_thread=False)
     cursor = conn.cursor()
     fields_sql = ", ".join([f"{f} TEXT" for f in STOCKS_FIELDS])
     cursor.execute("DROP TABLE IF EXISTS StocksWBFlat;")
@@ -79,21 +78,7 @@ def main() -> None:
     """
     )
     conn.commit()
-
-    # --- HTTP session ---
-    def make_http() -> requests.Session:
-        s = requests.Session()
-        retries = Retry(
-            total=5,
-            read=5,
-            connect=5,
-            backoff_factor=0.5,
-            status_forcelist=(429, 500, 502, 503, 504),
-            allowed_methods=frozenset(["GET"]),
-        )
-        s.mount("https://", HTTPAdapter(max_retries=retries))
-        s.mount("http://", HTTPAdapter(max_retries=retries))
-        return s
+    writer = SQLiteWriter(conn)
 
     # --- API-запрос ---
     url = "https://statistics-api.wildberries.ru/api/v1/supplier/stocks"
@@ -101,7 +86,7 @@ def main() -> None:
 
     http = make_http()
 
-    for _, row in df_orgs.iterrows():
+    def import_org(row) -> int:
         org_id = row["id"]
         org_name = row["Организация"]
         token = row["Token_WB"]
@@ -117,16 +102,15 @@ def main() -> None:
         while True:
             params = {"dateFrom": date_from}
             logger.info("  📤 Запрос page %s, dateFrom=%s ...", page, date_from)
+            acquire(token, url)
             try:
                 resp = http.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
                 if resp.status_code != 200:
                     logger.warning("  Запрос вернул статус %s: %s", resp.status_code, resp.text)
-                    time.sleep(5)
                     break
                 data = resp.json()
             except Exception as e:
                 logger.warning("  Ошибка запроса: %s", e)
-                time.sleep(5)
                 break
 
             if not data:
@@ -146,14 +130,15 @@ def main() -> None:
                 rows.append(flat)
             try:
                 placeholders = ",".join(["?"] * (2 + len(STOCKS_FIELDS)))
-                cursor.executemany(
-                    f"""
-                    INSERT OR REPLACE INTO StocksWBFlat
-                    VALUES ({placeholders})
-                """,
-                    rows,
-                )
-                conn.commit()
+                with writer.cursor() as cur:
+                    cur.executemany(
+                        f"""
+                        INSERT OR REPLACE INTO StocksWBFlat
+                        VALUES ({placeholders})
+                    """,
+                        rows,
+                    )
+                    conn.commit()
             except Exception as e:
                 logger.warning("  Ошибка вставки: %s", e)
                 break
@@ -168,9 +153,12 @@ def main() -> None:
             # pagination: следующий dateFrom = lastChangeDate последней строки
             date_from = data[-1].get("lastChangeDate")
             page += 1
-            time.sleep(3)  # WB лимит: 1 запрос в минуту, но можно чуть чаще
 
-    conn.close()
+        return total_loaded
+
+    with bulk_load(conn):
+        run_per_org(df_orgs, import_org)
+    writer.close()
     logger.info("✅ Все остатки загружены и распарсены в таблицу StocksWBFlat (без дублей).")
 
 
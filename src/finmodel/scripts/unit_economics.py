@@ -0,0 +1,66 @@
+"""Materialize per-product unit economics from the imported tables."""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from typing import List, Optional
+
+from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.paths import get_db_path
+from finmodel.utils.settings import find_setting, load_period, parse_date
+from finmodel.utils.unit_economics import DAILY_TABLE, PERIOD_TABLE, build_period, update_daily
+
+logger = get_logger(__name__)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="unit_economics", description="Юнит-экономика по товарам за период."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Recompute every day, e.g. after commission tariffs changed.",
+    )
+    parser.add_argument(
+        "--date-from", help="Period start (default: ПериодНачало from Настройки.xlsm)."
+    )
+    parser.add_argument("--date-to", help="Period end (default: ПериодКонец from Настройки.xlsm).")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    setup_logging()
+    args = parse_args(argv)
+    db_path = get_db_path()
+    logger.info("DB: %s", db_path)
+
+    date_from, date_to = args.date_from, args.date_to
+    if not (date_from and date_to):
+        settings_sheet = find_setting("SETTINGS_SHEET", default="Настройки")
+        start, end = load_period(sheet=settings_sheet)
+        date_from = date_from or start
+        date_to = date_to or end
+    date_from = parse_date(date_from).strftime("%Y-%m-%d") if date_from else None
+    date_to = parse_date(date_to).strftime("%Y-%m-%d") if date_to else None
+    logger.info("Период: %s .. %s", date_from or "начало", date_to or "конец")
+
+    conn = connect(db_path)
+    try:
+        try:
+            days = update_daily(conn, full=args.full)
+            rows = build_period(conn, date_from, date_to)
+        except sqlite3.Error as exc:
+            logger.error("Не удалось рассчитать юнит-экономику: %s", exc)
+            raise SystemExit(1)
+    finally:
+        conn.close()
+    logger.info(
+        "✅ %s: пересчитано дней: %s; %s: %s товаров", DAILY_TABLE, days, PERIOD_TABLE, rows
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,23 +5,27 @@ from __future__ import annotations
 import argparse
 import csv
 import sqlite3
-import time
+from abc import ABC, abstractmethod
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import requests
-from requests.adapters import HTTPAdapter, Retry
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
 from finmodel.utils.db_load import load_wb_tokens
+from finmodel.utils.http import make_http
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 from finmodel.utils.settings import find_setting
 
 WB_ENDPOINT = "https://discounts-prices-api.wildberries.ru/api/v2/list/goods/filter"
 TIMEOUT = 15
-SLEEP_BETWEEN_BATCHES_SEC = 0.4
 PAGE_LIMIT = 1000
+# Explicit nmID lists up to this size are requested one by one via filterNmID;
+# anything larger (and nmIDs taken from katalog) uses the paged full list.
+NM_FILTER_MAX = 20
 
 logger = get_logger(__name__)
 
@@ -34,24 +38,6 @@ def iter_chunks(lst: List[str], size: int) -> Iterable[List[str]]:
         yield lst[i : i + size]
 
 
-def make_http(api_key: Optional[str] = None) -> requests.Session:
-    s = requests.Session()
-    retries = Retry(
-        total=5,
-        read=5,
-        connect=5,
-        backoff_factor=0.5,
-        status_forcelist=(429, 500, 502, 503, 504),
-        allowed_methods=frozenset(["GET"]),
-    )
-    s.headers.update({"Accept": "application/json", "User-Agent": "WB-SPP-Fetcher/1.0 (+PowerBI)"})
-    if api_key:
-        s.headers["Authorization"] = api_key
-    s.mount("https://", HTTPAdapter(max_retries=retries))
-    s.mount("http://", HTTPAdapter(max_retries=retries))
-    return s
-
-
 def fetch_batch(
     http: requests.Session,
     nm_id: Optional[str] = None,
@@ -147,35 +133,112 @@ def fetch_batch(
     return out
 
 
-def calc_metrics(row: Dict[str, Any]) -> Dict[str, Any]:
-    price: Optional[float] = row.get("price")
-    discounted: Optional[float] = row.get("discountedPrice")
-    discount: Optional[float] = row.get("discount")
+def iter_goods_pages(
+    http: requests.Session, token: Optional[str]
+) -> Iterator[List[Dict[str, Any]]]:
+    """Page through all goods of the seller, ``PAGE_LIMIT`` per request."""
+    offset = 0
+    while True:
+        acquire(token, WB_ENDPOINT)
+        batch = fetch_batch(http, limit=PAGE_LIMIT, offset=offset)
+        if not batch:
+            break
+        yield batch
+        offset += PAGE_LIMIT
+
+
+def iter_goods_by_nm(
+    http: requests.Session, token: Optional[str], nmids: Iterable[str]
+) -> Iterator[List[Dict[str, Any]]]:
+    """Request goods one nmID at a time; nmIDs failing with HTTP errors are skipped."""
+    for nm in nmids:
+        acquire(token, WB_ENDPOINT)
+        try:
+            yield fetch_batch(http, nm_id=nm)
+        except requests.exceptions.HTTPError as exc:
+            logger.warning("HTTP error for nmID %s: %s", nm, exc)
+            if exc.response is not None:
+                logger.warning("Response body: %s", exc.response.text)
 
-    discount_total_pct: Optional[float] = (
-        (1 - (discounted / price)) * 100.0
-        if price is not None and discounted is not None and price != 0
-        else None
-    )
-    spp_pct_approx: Optional[float] = (
-        discount_total_pct - discount
-        if discount_total_pct is not None and discount is not None
-        else None
-    )
 
-    now_utc = datetime.now(timezone.utc)
+def iter_goods(
+    http: requests.Session,
+    token: Optional[str],
+    nmids: List[str],
+    explicit: bool = True,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield price batches for ``nmids`` choosing the cheapest request pattern.
+
+    A short ``explicit`` list is requested per nmID. Otherwise the whole goods
+    list is paged and compared with ``nmids`` in memory: for an explicit list
+    only the requested nmIDs are kept, for nmIDs from katalog all goods are
+    kept and the differences are logged.
+    """
+    if nmids and explicit and len(nmids) <= NM_FILTER_MAX:
+        yield from iter_goods_by_nm(http, token, nmids)
+        return
+    expected = {str(nm) for nm in nmids}
+    received: set = set()
+    for page in iter_goods_pages(http, token):
+        received.update(r.get("nmId") for r in page)
+        if expected and explicit:
+            page = [r for r in page if r.get("nmId") in expected]
+        yield page
+    if not expected:
+        return
+    missing = sorted(expected - received)
+    if missing:
+        logger.warning("Нет цен для %s nmID (например: %s)", len(missing), ", ".join(missing[:10]))
+    extra = received - expected
+    if extra and not explicit:
+        logger.info("Цены получены для %s nmID, которых нет в katalog", len(extra))
+
+
+def fetch_goods(
+    http: requests.Session,
+    token: Optional[str],
+    nmids: List[str],
+    explicit: bool = True,
+) -> List[Dict[str, Any]]:
+    """Return all rows of :func:`iter_goods` as one list."""
+    return [row for batch in iter_goods(http, token, nmids, explicit) for row in batch]
 
-    return {
-        **row,
-        "price_rub": float(price) if isinstance(price, (int, float)) else None,
-        "salePrice_rub": float(discounted) if isinstance(discounted, (int, float)) else None,
-        "discount_total_pct": discount_total_pct,
-        "spp_pct_approx": spp_pct_approx,
 
-        "updated_at_utc": now_utc.isoformat(timespec="seconds"),
-        "snapshot_date": now_utc.date().isoformat(),
+def _as_float(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
 
-    }
+
+def calc_metrics_batch(
+    rows: List[Dict[str, Any]], now_utc: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Add price metrics and the snapshot timestamp to every row of a page.
+
+    All rows of the batch share one timestamp. Non-numeric prices count as
+    missing. The rows are updated in place and returned.
+    """
+    now_utc = now_utc or datetime.now(timezone.utc)
+    updated_at = now_utc.isoformat(timespec="seconds")
+    snapshot_date = now_utc.date().isoformat()
+    for row in rows:
+        price = _as_float(row.get("price"))
+        discounted = _as_float(row.get("discountedPrice"))
+        discount = _as_float(row.get("discount"))
+        discount_total_pct = (
+            (1 - discounted / price) * 100.0 if price and discounted is not None else None
+        )
+        row["price_rub"] = price
+        row["salePrice_rub"] = discounted
+        row["discount_total_pct"] = discount_total_pct
+        row["spp_pct_approx"] = (
+            discount_total_pct - discount
+            if discount_total_pct is not None and discount is not None
+            else None
+        )
+        row["updated_at_utc"] = updated_at
+        row["snapshot_date"] = snapshot_date
+    return rows
 
 
 # ───────────────────────────── IO: sources ───────────────────────────── #
@@ -284,135 +347,230 @@ CSV_FIELDS: List[str] = [
     "snapshot_date",
 ]
 
+# SQLite column types for CSV_FIELDS
+FIELD_TYPES: Dict[str, str] = {
+    "price": "REAL",
+    "discountedPrice": "REAL",
+    "discount": "REAL",
+    "price_rub": "REAL",
+    "salePrice_rub": "REAL",
+    "discount_total_pct": "REAL",
+    "spp_pct_approx": "REAL",
+}
+
+# Rows collected before every configured sink receives them.
+SINK_BUFFER_ROWS = 5_000
+
+
+class Sink(ABC):
+    """Destination for enriched price rows, fed batch by batch.
+
+    Used as a context manager: :meth:`close` finishes the output when the
+    block succeeds, :meth:`abort` when it raises.
+    """
+
+    name = "sink"
+
+    def __init__(self) -> None:
+        self.written = 0
+
+    @abstractmethod
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        """Persist one batch of rows."""
+
+    def close(self) -> None:
+        logger.info("Записано строк (%s): %s", self.name, self.written)
+
+    def abort(self) -> None:
+        """Release the output after a failure; rows already written are kept."""
+        self.close()
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class CsvSink(Sink):
+    """Append rows to a CSV file with ``CSV_FIELDS`` columns."""
+
+    name = "CSV"
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self._fh = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._fh, fieldnames=CSV_FIELDS)
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._writer.writerows({k: r.get(k) for k in CSV_FIELDS} for r in rows)
+        self._fh.flush()
+        self.written += len(rows)
+
+    def close(self) -> None:
+        self._fh.close()
+        super().close()
+
+
+class SQLiteSink(Sink):
+    """Insert-or-replace rows into an SQLite table, one transaction per batch.
+
+    With ``with_org`` the table gets a leading ``org_id`` column that is part
+    of the primary key (the ``WBGoodsPricesFlat`` layout of ``finmodel.db``).
+    """
+
+    def __init__(self, db_path: str, table: str = "spp", with_org: bool = False) -> None:
+        super().__init__()
+        self.name = f"SQLite {table}"
+        self.columns = (["org_id"] if with_org else []) + CSV_FIELDS
+        key = (["org_id"] if with_org else []) + ["nmId", "sizeID", "snapshot_date"]
+        types = {"org_id": "INTEGER", **FIELD_TYPES}
+        ddl = ",\n".join(f"    {c} {types.get(c, 'TEXT')}" for c in self.columns)
+        self.conn = connect(db_path)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (\n{ddl},\n"
+            f"    PRIMARY KEY ({', '.join(key)})\n)"
+        )
+        self.conn.commit()
+        ph = ", ".join("?" * len(self.columns))
+        self._sql = f"INSERT OR REPLACE INTO {table} ({', '.join(self.columns)}) VALUES ({ph})"
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self.conn.executemany(self._sql, [tuple(r.get(c) for c in self.columns) for r in rows])
+        self.conn.commit()
+        self.written += len(rows)
+
+    def close(self) -> None:
+        self.conn.close()
+        super().close()
+
+
+class OdbcSink(Sink):
+    """Insert rows through ODBC (e.g. MS SQL Server).
+
+    The table must exist with columns matching ``CSV_FIELDS``. It is truncated
+    before the first batch and the whole load is one transaction committed by
+    :meth:`close`, so a failed run leaves the previous contents and an empty
+    run leaves the table untouched.
+    """
+
+    def __init__(self, dsn: str, table: str = "dbo.WBGoodsPricesFlat") -> None:
+        import pyodbc  # type: ignore
+
+        super().__init__()
+        self.name = f"ODBC {table}"
+        self.table = table
+        self.cn = pyodbc.connect(dsn, autocommit=False)
+        self._truncated = False
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        cur = self.cn.cursor()
+        try:
+            if not self._truncated:
+                cur.execute(f"TRUNCATE TABLE {self.table}")
+                self._truncated = True
+            cur.fast_executemany = True
+            cur.executemany(
+                f"INSERT INTO {self.table} ({', '.join(CSV_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(CSV_FIELDS))})",
+                [tuple(r.get(c) for c in CSV_FIELDS) for r in rows],
+            )
+        finally:
+            cur.close()
+        self.written += len(rows)
+
+    def close(self) -> None:
+        try:
+            self.cn.commit()
+        finally:
+            self.cn.close()
+        super().close()
+
+    def abort(self) -> None:
+        try:
+            self.cn.rollback()
+        finally:
+            self.cn.close()
+        logger.warning("Запись через ODBC в %s отменена", self.table)
+
+
+class FanoutSink(Sink):
+    """Buffer up to ``buffer_rows`` rows and hand each full buffer to all sinks."""
+
+    name = "всего"
+
+    def __init__(self, sinks: Iterable[Sink], buffer_rows: int = SINK_BUFFER_ROWS) -> None:
+        super().__init__()
+        self.sinks = list(sinks)
+        self.buffer_rows = buffer_rows
+        self._buffer: List[Dict[str, Any]] = []
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        # The buffer is handed over before writing: rows a sink failed on are
+        # never offered again, so sinks that already took them get no duplicates.
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        for sink in self.sinks:
+            sink.write(batch)
+        self.written += len(batch)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            self.abort()
+            raise
+        self._finish(lambda sink: sink.close())
+
+    def abort(self) -> None:
+        self._buffer = []
+        self._finish(lambda sink: sink.abort())
+
+    def _finish(self, action: Callable[[Sink], None]) -> None:
+        """Apply ``action`` to every sink; re-raise the first error afterwards."""
+        error: Optional[Exception] = None
+        for sink in self.sinks:
+            try:
+                action(sink)
+            except Exception as exc:
+                logger.exception("Ошибка при закрытии вывода %s", sink.name)
+                error = error or exc
+        if error is not None:
+            raise error
+
 
 def write_csv(path: str, rows: List[Dict[str, Any]]) -> None:
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=CSV_FIELDS)
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k) for k in CSV_FIELDS})
+    with CsvSink(path) as sink:
+        sink.write(rows)
 
 
 def write_to_sqlite(db_path: str, rows: List[Dict[str, Any]], table: str = "spp") -> int:
     if not rows:
         logger.warning("Нет строк для записи в SQLite — пропускаю.")
         return 0
-
-    with sqlite3.connect(db_path) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {table} (
-                nmId TEXT,
-                vendorCode TEXT,
-                sizeID TEXT,
-                price REAL,
-                discountedPrice REAL,
-                discount REAL,
-                price_rub REAL,
-                salePrice_rub REAL,
-                discount_total_pct REAL,
-                spp_pct_approx REAL,
-                updated_at_utc TEXT,
-                snapshot_date TEXT,
-                PRIMARY KEY (nmId, sizeID, snapshot_date)
-            )
-            """
-        )
-        data: List[Tuple[Any, ...]] = [
-            (
-                r.get("nmId"),
-                r.get("vendorCode"),
-                r.get("sizeID"),
-                r.get("price"),
-                r.get("discountedPrice"),
-                r.get("discount"),
-                r.get("price_rub"),
-                r.get("salePrice_rub"),
-                r.get("discount_total_pct"),
-                r.get("spp_pct_approx"),
-                r.get("updated_at_utc"),
-                r.get("snapshot_date"),
-            )
-            for r in rows
-        ]
-        cur.executemany(
-            f"""
-            INSERT OR REPLACE INTO {table}
-            (nmId, vendorCode, sizeID, price, discountedPrice, discount, price_rub, salePrice_rub, discount_total_pct, spp_pct_approx, updated_at_utc, snapshot_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            data,
-        )
-        conn.commit()
-    logger.info("Записано строк в SQLite: %s", len(rows))
+    with SQLiteSink(db_path, table) as sink:
+        sink.write(rows)
     return len(rows)
 
 
 def write_prices_to_db(db_path: str, rows: List[Dict[str, Any]]) -> int:
     """Persist rows into ``WBGoodsPricesFlat`` table inside ``finmodel.db``."""
 
-    with sqlite3.connect(db_path) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS WBGoodsPricesFlat (
-                org_id INTEGER,
-                nmId TEXT,
-                vendorCode TEXT,
-                sizeID TEXT,
-                price REAL,
-                discountedPrice REAL,
-                discount REAL,
-                price_rub REAL,
-                salePrice_rub REAL,
-                discount_total_pct REAL,
-                spp_pct_approx REAL,
-
-                updated_at_utc TEXT,
-
-                snapshot_date TEXT,
-                PRIMARY KEY (org_id, nmId, sizeID, snapshot_date)
-            )
-            """
-        )
+    with SQLiteSink(db_path, "WBGoodsPricesFlat", with_org=True) as sink:
         if not rows:
-            conn.commit()
             logger.warning("Нет строк для записи в БД — пропускаю.")
             return 0
-        data = [
-            (
-                r.get("org_id"),
-                r.get("nmId"),
-                r.get("vendorCode"),
-                r.get("sizeID"),
-                r.get("price"),
-                r.get("discountedPrice"),
-                r.get("discount"),
-                r.get("price_rub"),
-                r.get("salePrice_rub"),
-                r.get("discount_total_pct"),
-                r.get("spp_pct_approx"),
-
-                r.get("updated_at_utc"),
-
-                r.get("snapshot_date"),
-            )
-            for r in rows
-        ]
-        cur.executemany(
-            """
-            INSERT OR REPLACE INTO WBGoodsPricesFlat
-            (org_id, nmId, vendorCode, sizeID, price, discountedPrice, discount,
-
-             price_rub, salePrice_rub, discount_total_pct, spp_pct_approx, updated_at_utc, snapshot_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-
-            """,
-            data,
-        )
-        conn.commit()
-    logger.info("Записано строк в базу: %s", len(rows))
+        sink.write(rows)
     return len(rows)
 
 
@@ -422,51 +580,11 @@ def write_to_db_odbc(
     """Вставка через ODBC (например, в MS SQL Server).
     Таблица должна существовать с колонками, соответствующими CSV_FIELDS.
     """
-    import pyodbc  # type: ignore
-
     if not rows:
         logger.warning("Нет строк для записи в ODBC — пропускаю.")
         return 0
-
-    cn = pyodbc.connect(dsn, autocommit=False)
-    try:
-        cur = cn.cursor()
-        cur.execute(f"TRUNCATE TABLE {table}")
-        data: List[Tuple[Any, ...]] = [
-            (
-                r.get("nmId"),
-                r.get("vendorCode"),
-                r.get("sizeID"),
-                r.get("price"),
-                r.get("discountedPrice"),
-                r.get("discount"),
-                r.get("price_rub"),
-                r.get("salePrice_rub"),
-                r.get("discount_total_pct"),
-                r.get("spp_pct_approx"),
-
-                r.get("updated_at_utc"),
-
-                r.get("snapshot_date"),
-            )
-            for r in rows
-        ]
-        cur.fast_executemany = True
-        cur.executemany(
-            f"""
-            INSERT INTO {table}
-
-            (nmId, vendorCode, sizeID, price, discountedPrice, discount, price_rub, salePrice_rub, discount_total_pct, spp_pct_approx, updated_at_utc, snapshot_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-
-            """,
-            data,
-        )
-        cn.commit()
-    finally:
-        cn.close()
-
-    logger.info("Записано строк в ODBC: %s", len(rows))
+    with OdbcSink(dsn, table) as sink:
+        sink.write(rows)
     return len(rows)
 
 
@@ -482,26 +600,11 @@ def import_prices(
     if not api_key:
         raise ValueError("WB API key is required")
     http = http or make_http(api_key)
-    all_rows: List[Dict[str, Any]] = []
-    if nmids:
-        for nm in nmids:
-            raw_rows = fetch_batch(http, nm_id=nm)
-            all_rows.extend(calc_metrics(r) for r in raw_rows)
-            time.sleep(SLEEP_BETWEEN_BATCHES_SEC)
-    else:
-        offset = 0
-        while True:
-            raw_rows = fetch_batch(http, limit=PAGE_LIMIT, offset=offset)
-            if not raw_rows:
-                break
-            all_rows.extend(calc_metrics(r) for r in raw_rows)
-            offset += PAGE_LIMIT
-            time.sleep(SLEEP_BETWEEN_BATCHES_SEC)
-
-    written = 0
-    if dsn:
-        written = write_to_db_odbc(all_rows, dsn)
-    return written
+    sinks: List[Sink] = [OdbcSink(dsn)] if dsn else []
+    with FanoutSink(sinks) as out:
+        for batch in iter_goods(http, api_key, nmids or []):
+            out.write(calc_metrics_batch(batch))
+    return sinks[0].written if sinks else 0
 
 
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
@@ -551,8 +654,15 @@ def main(argv: Optional[List[str]] = None) -> None:
                 logger.error("Настройки.xlsm не содержит организаций с токенами")
                 raise SystemExit(1)
 
-        rows_out: List[Dict[str, Any]] = []
-        with sqlite3.connect(db_path) as conn:
+        sinks: List[Sink] = [SQLiteSink(db_path, "WBGoodsPricesFlat", with_org=True)]
+        if args.out_csv:
+            sinks.append(CsvSink(args.out_csv))
+        if args.out_sqlite:
+            sinks.append(SQLiteSink(args.out_sqlite, "WBGoodsPricesFlat"))
+        if args.out_odbc:
+            sinks.append(OdbcSink(args.out_odbc, args.odbc_table))
+
+        with FanoutSink(sinks) as out, connect(db_path) as conn:
             conn.row_factory = sqlite3.Row
             for org_id, token in tokens:
                 http = make_http(token)
@@ -564,49 +674,14 @@ def main(argv: Optional[List[str]] = None) -> None:
                 else:
                     nmids = []
 
-                if nmids:
-                    for nm in nmids:
-                        try:
-                            batch = fetch_batch(http, nm_id=nm)
-                        except requests.exceptions.HTTPError as exc:
-                            logger.warning("HTTP error for nmID %s: %s", nm, exc)
-                            if exc.response is not None:
-                                logger.warning("Response body: %s", exc.response.text)
-                            continue
-                        except Exception:
-                            logger.exception("Ошибка при запросе nmID: %s", nm)
-                            raise SystemExit(1)
-                        for row in batch:
-                            enriched = calc_metrics(row)
-                            enriched["org_id"] = org_id
-                            rows_out.append(enriched)
-                        time.sleep(SLEEP_BETWEEN_BATCHES_SEC)
-                else:
-                    offset = 0
-                    while True:
-                        try:
-                            batch = fetch_batch(http, limit=PAGE_LIMIT, offset=offset)
-                        except Exception:
-                            logger.exception("Ошибка при запросе offset: %s", offset)
-                            raise SystemExit(1)
-                        if not batch:
-                            break
-                        for row in batch:
-                            enriched = calc_metrics(row)
-                            enriched["org_id"] = org_id
-                            rows_out.append(enriched)
-                        offset += PAGE_LIMIT
-                        time.sleep(SLEEP_BETWEEN_BATCHES_SEC)
-
-        write_prices_to_db(db_path, rows_out)
-        if args.out_csv:
-            write_csv(args.out_csv, rows_out)
-        if args.out_sqlite:
-            write_to_sqlite(args.out_sqlite, rows_out, table="WBGoodsPricesFlat")
-        if args.out_odbc:
-            write_to_db_odbc(rows_out, args.out_odbc, table=args.odbc_table)
+                explicit = nmids_override is not None
+                for batch in iter_goods(http, token, nmids, explicit=explicit):
+                    enriched = calc_metrics_batch(batch)
+                    for row in enriched:
+                        row["org_id"] = org_id
+                    out.write(enriched)
 
-        logger.info("Обработано строк: %s", len(rows_out))
+        logger.info("Обработано строк: %s", out.written)
     except SystemExit:
         raise
     except Exception:
@@ -7,18 +7,24 @@ https://card.wb.ru/cards/v4/detail и сохраняет цены/скидки.
 Запуск по умолчанию ищет finmodel.db на уровень выше
 каталога, где лежит скрипт. Можно задать другой путь:
     python wb_spp_fetch.py --db "C:\\path\\to\\finmodel.db"
+
+По умолчанию nmID передаются пачками (до 100 через ";") и запрашиваются
+асинхронно с ограниченным числом одновременных запросов (--concurrency).
+Флаг --sync возвращает прежний последовательный режим.
 """
 
 import argparse
+import asyncio
 import sqlite3
-import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
-
-import requests
+from typing import List, Optional, Sequence, Tuple
 
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.http import get_session
 from finmodel.utils.paths import get_db_path
+from finmodel.utils.ratelimit import acquire
 
 logger = get_logger(__name__)
 
@@ -27,8 +33,11 @@ logger = get_logger(__name__)
 # ──────────────────────────────────────────────────────────────────────────────
 API_URL = "https://card.wb.ru/cards/v4/detail" "?appType=1&curr=rub&dest=-1257786&spp=0&nm={nm}"
 REQUEST_TIMEOUT = 10
-SLEEP_BETWEEN_CALLS = 0.2
 BATCH_SIZE = 100
+NM_PER_REQUEST = 100  # сколько nmID передавать в одном запросе через ";"
+CONCURRENCY = 8  # одновременных запросов в асинхронном режиме
+
+Row = Tuple[int, int, int, int, Optional[int]]
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 2. SQL
@@ -58,14 +67,12 @@ VALUES (?, ?, ?, ?, ?, datetime('now'));
 
 
 def get_nm_ids(cur) -> list[int]:
-    cur.execute("SELECT nmID FROM katalog")
+    cur.execute("SELECT DISTINCT nmID FROM katalog WHERE nmID IS NOT NULL")
     return [row[0] for row in cur.fetchall()]
 
 
-def fetch_card(nm_id: int) -> Tuple[int, int, int, int, Optional[int]]:
-    r = requests.get(API_URL.format(nm=nm_id), timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    product = r.json()["products"][0]
+def parse_product(product: dict) -> Row:
+    nm_id = int(product["id"])
     sizes = product.get("sizes", [])
     if not sizes:
         raise ValueError(f"no sizes data for nmID {nm_id}")
@@ -78,15 +85,104 @@ def fetch_card(nm_id: int) -> Tuple[int, int, int, int, Optional[int]]:
     return nm_id, priceU, salePriceU, sale_pct, spp
 
 
-def parse_args() -> argparse.Namespace:
+def fetch_cards(nm_ids: Sequence[int]) -> List[Row]:
+    """Fetch several cards with one request (``nm`` values joined by ``;``).
+
+    Products missing from the response or without price data are logged
+    and skipped.
+    """
+    url = API_URL.format(nm=";".join(str(nm) for nm in nm_ids))
+    acquire(None, url)  # публичный эндпоинт: лимит задан в реестре ratelimit
+    r = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    r.raise_for_status()
+    rows: List[Row] = []
+    for product in r.json().get("products", []) or []:
+        try:
+            rows.append(parse_product(product))
+        except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+            logger.warning("nmID=%s ❌ %s", product.get("id"), e)
+    missing = set(nm_ids) - {row[0] for row in rows}
+    if missing and len(nm_ids) > 1:
+        logger.debug("Нет данных для %s nmID из %s", len(missing), len(nm_ids))
+    return rows
+
+
+def fetch_card(nm_id: int) -> Row:
+    rows = fetch_cards([nm_id])
+    if not rows:
+        raise ValueError(f"no data for nmID {nm_id}")
+    return rows[0]
+
+
+async def fetch_all(
+    nm_ids: Sequence[int],
+    cur: sqlite3.Cursor,
+    *,
+    nm_per_request: int = NM_PER_REQUEST,
+    concurrency: int = CONCURRENCY,
+) -> int:
+    """Fetch ``nm_ids`` in batches with bounded concurrency and insert rows.
+
+    Each batch is one HTTP request run in a worker thread over the shared
+    pooled session; at most ``concurrency`` requests are in flight. Rows are
+    written with ``executemany`` as soon as a batch completes.
+    """
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+    batches = [list(nm_ids[i : i + nm_per_request]) for i in range(0, len(nm_ids), nm_per_request)]
+
+    async def run(batch: List[int]) -> List[Row]:
+        async with sem:
+            return await loop.run_in_executor(pool, fetch_cards, batch)
+
+    inserted = 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="spp") as pool:
+        tasks = [asyncio.ensure_future(run(b)) for b in batches]
+        for done, fut in enumerate(asyncio.as_completed(tasks), 1):
+            try:
+                rows = await fut
+            except Exception as e:
+                logger.warning("[%s/%s] батч ❌ %s", done, len(batches), e)
+                continue
+            if rows:
+                cur.executemany(INSERT_SQL, rows)
+                inserted += len(rows)
+            logger.info(
+                "[%s/%s] батчей, сохранено %s из %s nmID",
+                done,
+                len(batches),
+                inserted,
+                len(nm_ids),
+            )
+    return inserted
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument(
         "--db",
         metavar="PATH",
         help="Полный путь к finmodel.db (по умолчанию: ../finmodel.db).",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help=f"Одновременных запросов (по умолчанию: {CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--nm-per-request",
+        type=int,
+        default=NM_PER_REQUEST,
+        help=f"nmID в одном запросе (по умолчанию: {NM_PER_REQUEST}).",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Старый режим: по одному nmID за запрос, последовательно.",
+    )
     parser.add_argument("-h", "--help", action="help", help="Показать эту справку.")
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def resolve_db_path(cli_path: str | None) -> Path:
@@ -100,13 +196,13 @@ def resolve_db_path(cli_path: str | None) -> Path:
 # ──────────────────────────────────────────────────────────────────────────────
 
 
-def main() -> None:
+def main(argv: Optional[Sequence[str]] = None) -> None:
     setup_logging()
-    args = parse_args()
+    args = parse_args(argv)
     db_path: Path = resolve_db_path(args.db)
 
     logger.info("Используем базу: %s", db_path)
-    with sqlite3.connect(db_path) as con:
+    with connect(db_path) as con:
         cur = con.cursor()
         try:
             cur.execute(CREATE_WB_SPP_SQL)
@@ -120,34 +216,43 @@ def main() -> None:
 
             logger.info("Всего nmID: %s", len(nm_ids))
 
-            batch: list[tuple[int, int, int, int, Optional[int]]] = []
-            for i, nm in enumerate(nm_ids, 1):
-                try:
-                    row = fetch_card(nm)
-                except Exception as e:
-                    logger.warning("[%s/%s] nmID=%s ❌ %s", i, len(nm_ids), nm, e)
-                    time.sleep(SLEEP_BETWEEN_CALLS)
-                    continue
-
-                batch.append(row)
-                if len(batch) >= BATCH_SIZE:
+            if args.sync:
+                batch: list[Row] = []
+                for i, nm in enumerate(nm_ids, 1):
+                    try:
+                        row = fetch_card(nm)
+                    except Exception as e:
+                        logger.warning("[%s/%s] nmID=%s ❌ %s", i, len(nm_ids), nm, e)
+                        continue
+
+                    batch.append(row)
+                    if len(batch) >= BATCH_SIZE:
+                        cur.executemany(INSERT_SQL, batch)
+                        batch.clear()
+
+                    logger.info(
+                        "[%s/%s] nmID=%s priceU=%s salePriceU=%s sale%%=%s spp=%s",
+                        i,
+                        len(nm_ids),
+                        row[0],
+                        row[1],
+                        row[2],
+                        row[3],
+                        row[4],
+                    )
+
+                if batch:
                     cur.executemany(INSERT_SQL, batch)
-                    batch.clear()
-
-                logger.info(
-                    "[%s/%s] nmID=%s priceU=%s salePriceU=%s sale%%=%s spp=%s",
-                    i,
-                    len(nm_ids),
-                    row[0],
-                    row[1],
-                    row[2],
-                    row[3],
-                    row[4],
+            else:
+                inserted = asyncio.run(
+                    fetch_all(
+                        nm_ids,
+                        cur,
+                        nm_per_request=max(1, args.nm_per_request),
+                        concurrency=max(1, args.concurrency),
+                    )
                 )
-                time.sleep(SLEEP_BETWEEN_CALLS)
-
-            if batch:
-                cur.executemany(INSERT_SQL, batch)
+                logger.info("Сохранено строк: %s", inserted)
         finally:
             cur.close()
 
@@ -1,9 +1,8 @@
-import sqlite3
 from datetime import datetime
 
-import requests
-
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.http import get_session
 from finmodel.utils.paths import get_db_path
 from finmodel.utils.settings import find_setting, load_organizations, load_period, parse_date
 
@@ -59,7 +58,7 @@ def main() -> None:
         "LoadDate",
     ]
 
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cur = conn.cursor()
     cur.execute(f"DROP TABLE IF EXISTS {TABLE};")
     cur.execute(
@@ -88,11 +87,12 @@ def main() -> None:
 
     URL = "https://common-api.wildberries.ru/api/v1/tariffs/box"
     params = {"date": date_param}
+    http = get_session()
 
     def try_fetch(token: str):
         headers = {"Authorization": token}
         try:
-            r = requests.get(URL, headers=headers, params=params, timeout=60)
+            r = http.get(URL, headers=headers, params=params, timeout=60)
             logger.info("  Тест токена → HTTP %s", r.status_code)
             if r.status_code != 200:
                 logger.warning("  Ответ: %s", r.text[:300])
@@ -1,8 +1,6 @@
-import sqlite3
-
-import requests
-
 from finmodel.logger import get_logger, setup_logging
+from finmodel.utils.db import connect
+from finmodel.utils.http import get_session
 from finmodel.utils.paths import get_db_path
 from finmodel.utils.settings import find_setting, load_organizations
 
@@ -41,7 +39,7 @@ def main() -> None:
     ]
 
     # --- Пересоздаём таблицу ---
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     fields_sql = ", ".join([f"{f} TEXT" for f in FIELDS])
     cursor.execute("DROP TABLE IF EXISTS WBTariffsCommission;")
@@ -57,13 +55,14 @@ def main() -> None:
     # --- Пытаемся получить комиссии с каждым токеном ---
     url = "https://common-api.wildberries.ru/api/v1/tariffs/commission"
     params = {"locale": "ru"}
+    http = get_session()
     found_data = False
 
     for idx, token in enumerate(tokens, 1):
         headers = {"Authorization": token}
         logger.info("Пробую токен №%s ...", idx)
         try:
-            resp = requests.get(url, headers=headers, params=params, timeout=60)
+            resp = http.get(url, headers=headers, params=params, timeout=60)
             if resp.status_code != 200:
                 logger.warning("ответ WB: %s", resp.status_code)
                 continue
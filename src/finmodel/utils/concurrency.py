@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, TypeVar
+
+from finmodel.logger import get_logger
+from finmodel.utils.settings import find_setting
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_ORG_WORKERS = 4
+
+
+def get_org_workers(default: int = DEFAULT_ORG_WORKERS) -> int:
+    """Return how many organizations may be processed in parallel.
+
+    The value is looked up via :func:`find_setting` using the ``ORG_WORKERS``
+    key. Missing, malformed or non-positive values fall back to ``default``.
+    """
+    raw = find_setting("ORG_WORKERS", default=default)
+    try:
+        workers = int(raw)
+    except (TypeError, ValueError):
+        logger.warning("ORG_WORKERS must be an integer, got %r", raw)
+        return default
+    if workers < 1:
+        logger.warning("ORG_WORKERS must be positive, got %r", raw)
+        return default
+    return workers
+
+
+class SQLiteWriter:
+    """Share one SQLite connection between organization worker threads.
+
+    Every statement runs under a single lock, so inserts coming from
+    concurrent organizations are serialized. The connection must be opened
+    with ``check_same_thread=False``.
+    """
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def cursor(self) -> Iterator[sqlite3.Cursor]:
+        """Yield a cursor while holding the writer lock.
+
+        Commit inside the ``with`` block to keep a page insert atomic with
+        respect to other workers.
+        """
+        with self._lock:
+            yield self.conn.cursor()
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        with self._lock:
+            self.conn.close()
+
+
+def run_per_org(
+    df_orgs: Any, worker: Callable[[Any], T], max_workers: int | None = None
+) -> List[T]:
+    """Run ``worker`` for each organization row and return results in order.
+
+    Args:
+        df_orgs: Dataframe returned by :func:`load_organizations`.
+        worker: Callable receiving one organization row.
+        max_workers: Optional thread count. Defaults to :func:`get_org_workers`.
+
+    A single organization (or a single worker) runs inline in the calling
+    thread. The first exception raised by a worker is propagated after the
+    remaining organizations have finished.
+    """
+    rows = [row for _, row in df_orgs.iterrows()]
+    if not rows:
+        return []
+    workers = min(max_workers or get_org_workers(), len(rows))
+    if workers <= 1:
+        return [worker(row) for row in rows]
+
+    logger.info("Processing %s organizations with %s workers", len(rows), workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="org") as pool:
+        futures = [pool.submit(worker, row) for row in rows]
+    return [future.result() for future in futures]
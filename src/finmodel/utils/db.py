@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from finmodel.logger import get_logger
+from finmodel.utils.paths import get_db_path
+from finmodel.utils.settings import get_settings
+
+logger = get_logger(__name__)
+
+# Applied to every connection opened through :func:`connect`.
+# WAL lets readers (e.g. Power BI) query the database while an import writes;
+# with WAL, synchronous=NORMAL is still safe against corruption.
+PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64_000,  # negative value is KiB: ~64 MB page cache
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 30_000,  # ms to wait for a lock held by another process
+}
+
+
+class Connection(sqlite3.Connection):
+    """SQLite connection whose commits can be deferred by :func:`bulk_load`."""
+
+    _bulk_depth = 0
+
+    def commit(self) -> None:
+        if self._bulk_depth:
+            return
+        super().commit()
+
+
+def connect(db_path: str | Path | None = None, **kwargs: Any) -> sqlite3.Connection:
+    """Open ``finmodel.db`` (or ``db_path``) with the project pragmas.
+
+    Extra keyword arguments (e.g. ``check_same_thread=False``) are passed to
+    :func:`sqlite3.connect`.
+    """
+    path = db_path if db_path is not None else get_db_path()
+    kwargs.setdefault("factory", Connection)
+    conn = sqlite3.connect(path, **kwargs)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+# Nesting depth of :func:`bulk_load_suspended` in this process.
+_bulk_load_suspended = 0
+
+
+def bulk_load_enabled() -> bool:
+    """Return whether ``SQLITE_BULK_LOAD`` asks for single-transaction imports."""
+    return not _bulk_load_suspended and get_settings().sqlite_bulk_load
+
+
+@contextmanager
+def bulk_load_suspended() -> Iterator[None]:
+    """Ignore ``SQLITE_BULK_LOAD`` inside the block.
+
+    Used while several scripts write to the database at once: one long bulk
+    transaction would hold the write lock and make the others fail with
+    "database is locked" after ``busy_timeout``.
+    """
+    global _bulk_load_suspended
+    _bulk_load_suspended += 1
+    try:
+        yield
+    finally:
+        _bulk_load_suspended -= 1
+
+
+@contextmanager
+def bulk_load(
+    conn: sqlite3.Connection, enabled: bool | None = None
+) -> Iterator[sqlite3.Connection]:
+    """Optionally run a whole import in one transaction.
+
+    When enabled (by argument or the ``SQLITE_BULK_LOAD`` setting),
+    ``conn.commit()`` calls made inside the block are deferred until it
+    exits, so per-page commits of the scripts do not each pay for a WAL sync.
+    The transaction is committed when the block succeeds and rolled back if
+    it raises. When disabled, pages are committed as they arrive and a crash
+    loses at most the current page.
+    """
+    if enabled is None:
+        enabled = bulk_load_enabled()
+    if not enabled:
+        yield conn
+        return
+    deferred = isinstance(conn, Connection)
+    if deferred:
+        conn._bulk_depth += 1
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        if deferred:
+            conn._bulk_depth -= 1
+    conn.commit()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from finmodel.logger import get_logger
+
+logger = get_logger(__name__)
+
+USER_AGENT = "finmodel/0.1"
+
+# Statuses retried transparently by urllib3. Scripts that implement their own
+# 429 handling via :mod:`finmodel.utils.ratelimit` pass ``retry_429=False``.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Keep-alive pool size per host. Hosts hit by many threads at once get larger
+# pools; everything else uses ``DEFAULT_POOL_SIZE``.
+DEFAULT_POOL_SIZE = 10
+POOL_SIZES: Dict[str, int] = {
+    "statistics-api.wildberries.ru": 8,
+    "seller-analytics-api.wildberries.ru": 8,
+    "advert-api.wildberries.ru": 8,
+    "content-api.wildberries.ru": 8,
+    "discounts-prices-api.wildberries.ru": 8,
+    "card.wb.ru": 32,
+}
+
+# Log responses slower than this at INFO; faster ones only at DEBUG.
+SLOW_REQUEST_SEC = 10.0
+
+
+def log_timing(resp: requests.Response, *args: Any, **kwargs: Any) -> None:
+    """Response hook logging method, path, status and elapsed time."""
+    elapsed = resp.elapsed.total_seconds()
+    log = logger.info if elapsed >= SLOW_REQUEST_SEC else logger.debug
+    log(
+        "%s %s -> %s in %.2f s",
+        resp.request.method,
+        urlsplit(resp.url).path,
+        resp.status_code,
+        elapsed,
+    )
+
+
+def make_retry(*, retry_post: bool = False, retry_429: bool = True) -> Retry:
+    """Return the retry policy shared by all sessions.
+
+    Args:
+        retry_post: Also retry ``POST`` requests. Only enable this for
+            endpoints where ``POST`` is a read-only query.
+        retry_429: Retry ``429 Too Many Requests`` honouring ``Retry-After``.
+    """
+    methods = {"GET", "HEAD"}
+    if retry_post:
+        methods.add("POST")
+    statuses = RETRY_STATUSES if retry_429 else tuple(s for s in RETRY_STATUSES if s != 429)
+    return Retry(
+        total=5,
+        read=5,
+        connect=5,
+        backoff_factor=0.5,
+        status_forcelist=statuses,
+        allowed_methods=frozenset(methods),
+    )
+
+
+def make_http(
+    api_key: Optional[str] = None,
+    *,
+    retry_post: bool = False,
+    retry_429: bool = True,
+    hooks: Iterable[Callable[..., Any]] = (),
+) -> requests.Session:
+    """Create a pooled :class:`requests.Session` for WB APIs.
+
+    Args:
+        api_key: Optional token sent in the ``Authorization`` header.
+        retry_post: Retry ``POST`` requests as well (idempotent endpoints only).
+        retry_429: Let urllib3 retry ``429`` responses.
+        hooks: Extra response hooks called after :func:`log_timing`.
+
+    The session negotiates compressed responses (``br`` is advertised only
+    when a brotli decoder is installed) and keeps connections alive in
+    per-host pools sized by :data:`POOL_SIZES`.
+    """
+    session = requests.Session()
+    retries = make_retry(retry_post=retry_post, retry_429=retry_429)
+    session.headers.update(
+        {
+            "Accept": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "User-Agent": USER_AGENT,
+        }
+    )
+    if api_key:
+        session.headers["Authorization"] = api_key
+    default = HTTPAdapter(
+        pool_connections=len(POOL_SIZES) + 1,
+        pool_maxsize=DEFAULT_POOL_SIZE,
+        max_retries=retries,
+    )
+    session.mount("https://", default)
+    session.mount("http://", default)
+    for host, size in POOL_SIZES.items():
+        session.mount(f"https://{host}", HTTPAdapter(pool_maxsize=size, max_retries=retries))
+    session.hooks["response"] = [log_timing, *hooks]
+    return session
+
+
+_sessions: Dict[tuple, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(*, retry_post: bool = False, retry_429: bool = True) -> requests.Session:
+    """Return a process-wide session without ``Authorization`` header.
+
+    Scripts pass per-organization tokens in request headers and reuse this
+    session, so connections survive across organizations and calls.
+    """
+    key = (retry_post, retry_429)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = make_http(retry_post=retry_post, retry_429=retry_429)
+        return session
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import Any, Optional
+
+# One row per (script, organization): where the next run should resume.
+# ``cursor`` holds the script-specific pagination value (e.g. lastChangeDate
+# or rrd_id) of the last committed page; ``rows_loaded`` is cumulative.
+IMPORT_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS ImportState (
+    script TEXT NOT NULL,
+    org_id TEXT NOT NULL,
+    cursor TEXT,
+    last_success TEXT,
+    rows_loaded INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (script, org_id)
+);
+"""
+
+
+def ensure_import_state(conn: sqlite3.Connection | sqlite3.Cursor) -> None:
+    """Create the ``ImportState`` table if it does not exist."""
+    conn.execute(IMPORT_STATE_SQL)
+
+
+def load_cursor(cur: sqlite3.Cursor, script: str, org_id: Any) -> Optional[str]:
+    """Return the saved cursor of ``script`` for ``org_id`` or ``None``."""
+    cur.execute(
+        "SELECT cursor FROM ImportState WHERE script = ? AND org_id = ?",
+        (script, str(org_id)),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def save_cursor(cur: sqlite3.Cursor, script: str, org_id: Any, cursor: Any, rows: int = 0) -> None:
+    """Record that a page ending at ``cursor`` was loaded.
+
+    Call it with the cursor used for the page insert and commit afterwards,
+    so the checkpoint and the data become visible in the same transaction.
+    """
+    cur.execute(
+        """
+        INSERT INTO ImportState (script, org_id, cursor, last_success, rows_loaded)
+        VALUES (?, ?, ?, datetime('now'), ?)
+        ON CONFLICT (script, org_id) DO UPDATE SET
+            cursor = excluded.cursor,
+            last_success = excluded.last_success,
+            rows_loaded = ImportState.rows_loaded + excluded.rows_loaded
+        """,
+        (script, str(org_id), None if cursor is None else str(cursor), rows),
+    )
+
+
+def reset_cursor(cur: sqlite3.Cursor, script: str, org_id: Any = None) -> None:
+    """Forget saved cursors so the next run starts from the period start.
+
+    Without ``org_id`` the cursors of all organizations of ``script`` are
+    removed.
+    """
+    if org_id is None:
+        cur.execute("DELETE FROM ImportState WHERE script = ?", (script,))
+    else:
+        cur.execute(
+            "DELETE FROM ImportState WHERE script = ? AND org_id = ?",
+            (script, str(org_id)),
+        )
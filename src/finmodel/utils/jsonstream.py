@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import codecs
+import json
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+# Bytes read from the socket at a time.
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\r\n"
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+def iter_array_text(chunks: Iterable[str]) -> Iterator[Any]:
+    """Yield the elements of a JSON array arriving as text chunks.
+
+    Only the current element and the unread tail of the last chunk are kept
+    in memory. A top-level ``null`` yields nothing; any other non-array value
+    raises :class:`ValueError`.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    def read_more() -> None:
+        nonlocal buf, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+        else:
+            buf = buf[pos:] + chunk
+            pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                if started:
+                    raise ValueError("Unexpected end of JSON array")
+                return
+            read_more()
+            continue
+
+        if not started:
+            if buf[pos] != "[":
+                # Not an array: parse the whole (small) body at once.
+                while not eof:
+                    read_more()
+                value = json.loads(buf[pos:])
+                if value is None:
+                    return
+                raise ValueError(f"Expected JSON array, got {type(value).__name__}")
+            started = True
+            pos += 1
+            continue
+
+        if buf[pos] == "]":
+            return
+        if buf[pos] == ",":
+            pos += 1
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            read_more()
+            continue
+        if not eof and (end == len(buf) or buf[end] not in _DELIMITERS):
+            # A number may continue in the next chunk; decode it again later.
+            read_more()
+            continue
+        yield value
+        pos = end
+
+
+def iter_json_array(resp: Any, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield records of a JSON array response without loading it whole.
+
+    ``resp`` should come from a request made with ``stream=True`` so the body
+    is read from the socket as records are consumed.
+    """
+    chunks = resp.iter_content(chunk_size=chunk_size)
+    # RFC 8259: JSON exchanged between systems is always UTF-8.
+    yield from iter_array_text(codecs.iterdecode(chunks, "utf-8"))
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield lists of up to ``size`` items from ``iterable``."""
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
@@ -0,0 +1,295 @@
+"""Export SQLite tables to Parquet partitioned by organization and month.
+
+Files are laid out Hive-style as
+``<out>/<table>/org_id=<id>/month=<YYYY-MM>/part-0.parquet`` so Power BI,
+pandas and DuckDB can prune partitions and columns. ``ExportState`` keeps a
+signature per exported partition; a partition is rewritten only when its
+signature changed or its file is missing, and files of partitions that no
+longer exist in the database are removed. ``pyarrow`` is imported only when
+a file is written.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from finmodel.logger import get_logger
+
+logger = get_logger(__name__)
+
+EXPORT_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS ExportState (
+    table_name TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    exported_at TEXT,
+    PRIMARY KEY (table_name, partition)
+);
+"""
+
+# Bookkeeping tables are not exported.
+SKIP_TABLES = {"ImportState", "ExportState"}
+# First existing column is the partition month source (``YYYY-MM`` prefix).
+DATE_COLUMNS = ("rr_dt", "date", "day", "dt", "snapshot_date")
+# First existing column that grows whenever a row is added or changed. Tables
+# without one (small marts and dictionaries) are fingerprinted by hashing rows.
+MARKER_COLUMNS = ("lastChangeDate", "LoadDate", "updatedAt", "updated_at_utc", "rrd_id")
+# Markers that identify a row rather than its version: INSERT OR REPLACE of a
+# corrected FinOtchet row keeps COUNT and MAX(rrd_id), so the totals of the
+# REAL columns are added to the signature of such tables.
+IDENTITY_MARKERS = {"rrd_id"}
+# Rows read at a time while hashing a table.
+HASH_CHUNK_ROWS = 50_000
+# Partition value for rows without an organization or date.
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+Writer = Callable[[pd.DataFrame, Dict[str, str], Path], None]
+
+
+@dataclass(frozen=True)
+class TableLayout:
+    """How one table is partitioned and how its changes are detected."""
+
+    name: str
+    columns: Dict[str, str]  # column name -> INTEGER, REAL or TEXT
+    org_column: Optional[str]
+    date_column: Optional[str]
+    marker_column: Optional[str]
+
+    def partition_exprs(self) -> List[str]:
+        exprs = []
+        if self.org_column:
+            exprs.append(f"NULLIF(CAST(\"{self.org_column}\" AS TEXT), '')")
+        if self.date_column:
+            exprs.append(f"NULLIF(substr(\"{self.date_column}\", 1, 7), '')")
+        return exprs
+
+    def partition_path(self, values: Tuple[Optional[str], ...]) -> str:
+        """Return the relative directory of a partition, e.g. ``org_id=1/month=2024-03``."""
+        names = (["org_id"] if self.org_column else []) + (["month"] if self.date_column else [])
+        if not names:
+            return ""
+        return "/".join(
+            f"{name}={DEFAULT_PARTITION if value is None else value}"
+            for name, value in zip(names, values)
+        )
+
+
+def ensure_export_state(conn: sqlite3.Connection | sqlite3.Cursor) -> None:
+    """Create the ``ExportState`` table if it does not exist."""
+    conn.execute(EXPORT_STATE_SQL)
+
+
+def list_tables(conn: sqlite3.Connection) -> List[str]:
+    """Return exportable tables of the database."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY name"
+    ).fetchall()
+    return [r[0] for r in rows if r[0] not in SKIP_TABLES]
+
+
+def column_kind(declared: str) -> str:
+    """Map a declared SQLite column type to INTEGER, REAL or TEXT (SQLite affinity rules)."""
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return "INTEGER"
+    if any(t in declared for t in ("REAL", "FLOA", "DOUB")):
+        return "REAL"
+    return "TEXT"
+
+
+def table_layout(conn: sqlite3.Connection, table: str) -> TableLayout:
+    columns = {row[1]: column_kind(row[2]) for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    if not columns:
+        raise ValueError(f"Table not found: {table}")
+
+    def first(candidates: Iterable[str]) -> Optional[str]:
+        return next((c for c in candidates if c in columns), None)
+
+    return TableLayout(
+        name=table,
+        columns=columns,
+        org_column=first(("org_id",)),
+        date_column=first(DATE_COLUMNS),
+        marker_column=first(MARKER_COLUMNS),
+    )
+
+
+def _partition_keys(layout: TableLayout) -> str:
+    """Return the SELECT list computing the partition values of a row."""
+    return ", ".join(layout.partition_exprs())
+
+
+def _partition_filter(
+    layout: TableLayout, values: Tuple[Optional[str], ...]
+) -> Tuple[str, List[str]]:
+    """Return a WHERE clause and parameters selecting one partition.
+
+    The raw columns are compared so that SQLite can use an index on
+    ``org_id`` (e.g. the primary key) and range-scan the date column.
+    """
+    clauses: List[str] = []
+    params: List[str] = []
+    columns = [c for c in (layout.org_column, layout.date_column) if c]
+    for column, value in zip(columns, values):
+        if value is None:
+            clauses.append(f'("{column}" IS NULL OR "{column}" = \'\')')
+        elif column == layout.org_column:
+            clauses.append(f'"{column}" = ?')
+            params.append(value)
+        else:
+            # the range narrows the scan, substr keeps the match exact
+            clauses.append(f'"{column}" >= ? AND "{column}" < ? AND substr("{column}", 1, 7) = ?')
+            params.extend([value, value + chr(0x10FFFF), value])
+    return " AND ".join(clauses) or "1", params
+
+
+def partition_signatures(
+    conn: sqlite3.Connection, layout: TableLayout
+) -> Dict[Tuple[Optional[str], ...], Tuple[str, int]]:
+    """Return ``{partition values: (signature, rows)}`` of the current table contents."""
+    keys = _partition_keys(layout)
+    width = len(layout.partition_exprs())
+    table = f'"{layout.name}"'
+    if layout.marker_column:
+        aggregates = f'COUNT(*), MAX("{layout.marker_column}")'
+        if layout.marker_column in IDENTITY_MARKERS:
+            real_totals = [
+                f"printf('%.2f', TOTAL(\"{c}\"))"
+                for c, kind in layout.columns.items()
+                if kind == "REAL"
+            ]
+            aggregates += ", " + (" || '|' || ".join(real_totals) or "''")
+        sql = f"SELECT {aggregates} FROM {table}"
+        if keys:
+            sql = f"SELECT {keys}, {aggregates} FROM {table} GROUP BY {keys}"
+        return {
+            tuple(row[:width]): (":".join(str(v) for v in row[width:]), row[width])
+            for row in conn.execute(sql)
+            if row[width]
+        }
+
+    # no change marker: fingerprint the rows themselves. quote() renders each
+    # stored value the same way on every run, whatever pandas would infer.
+    row_text = " || ',' || ".join(f'quote("{c}")' for c in layout.columns)
+    sql = f"SELECT {keys + ', ' if keys else ''}{row_text} AS row_text FROM {table}"
+    totals: Dict[Tuple[Optional[str], ...], List[int]] = {}
+    for chunk in pd.read_sql_query(sql, conn, chunksize=HASH_CHUNK_ROWS):
+        hashes = pd.util.hash_pandas_object(chunk["row_text"], index=False)
+        if not width:
+            groups = [((), hashes)]
+        else:
+            groups = hashes.groupby([chunk[c] for c in chunk.columns[:width]], dropna=False)
+        for key, series in groups:
+            key = key if isinstance(key, tuple) else (key,)
+            values = tuple(None if pd.isna(v) else v for v in key)
+            total = totals.setdefault(values, [0, 0])
+            total[0] += len(series)
+            total[1] = (total[1] + int(series.sum())) % 2**64
+    return {values: (f"{n}:{h:x}", n) for values, (n, h) in totals.items()}
+
+
+def read_partition(
+    conn: sqlite3.Connection, layout: TableLayout, values: Tuple[Optional[str], ...]
+) -> pd.DataFrame:
+    """Read one partition with columns converted to their declared types."""
+    where, params = _partition_filter(layout, values)
+    df = pd.read_sql_query(f'SELECT * FROM "{layout.name}" WHERE {where}', conn, params=params)
+    for column, kind in layout.columns.items():
+        if kind == "TEXT":
+            df[column] = df[column].astype("string")
+        elif kind == "REAL":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+        else:
+            numbers = pd.to_numeric(df[column], errors="coerce").astype("float64")
+            fractional = numbers.notna() & (numbers % 1 != 0)
+            if fractional.any():
+                # SQLite affinity lets e.g. 1.5 into an INTEGER column; the
+                # Parquet column stays int64 for every partition
+                logger.warning(
+                    "%s.%s: округлено нецелых значений: %s",
+                    layout.name,
+                    column,
+                    int(fractional.sum()),
+                )
+                numbers = numbers.round()
+            df[column] = numbers.astype("Int64")
+    return df
+
+
+def write_parquet(df: pd.DataFrame, columns: Dict[str, str], path: Path) -> None:
+    """Write ``df`` to ``path`` atomically with Arrow types matching ``columns``."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+    schema = pa.schema([pa.field(column, types[kind]) for column, kind in columns.items()])
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def export_table(
+    conn: sqlite3.Connection,
+    table: str,
+    out_dir: Path,
+    *,
+    full: bool = False,
+    writer: Writer = write_parquet,
+) -> Tuple[int, int]:
+    """Export changed partitions of ``table``; return (written, removed) partitions."""
+    layout = table_layout(conn, table)
+    cur = conn.cursor()
+    ensure_export_state(cur)
+    saved = dict(
+        cur.execute(
+            "SELECT partition, signature FROM ExportState WHERE table_name = ?", (table,)
+        ).fetchall()
+    )
+    current = partition_signatures(conn, layout)
+    table_dir = Path(out_dir) / table
+
+    written = 0
+    for values, (signature, rows) in sorted(current.items(), key=lambda kv: str(kv[0])):
+        partition = layout.partition_path(values)
+        path = table_dir / partition / "part-0.parquet"
+        if not full and saved.get(partition) == signature and path.exists():
+            continue
+        writer(read_partition(conn, layout, values), layout.columns, path)
+        cur.execute(
+            """
+            INSERT INTO ExportState (table_name, partition, signature, rows, exported_at)
+            VALUES (?, ?, ?, ?, datetime('now'))
+            ON CONFLICT (table_name, partition) DO UPDATE SET
+                signature = excluded.signature,
+                rows = excluded.rows,
+                exported_at = excluded.exported_at
+            """,
+            (table, partition, signature, rows),
+        )
+        conn.commit()
+        written += 1
+
+    live = {layout.partition_path(values) for values in current}
+    removed = 0
+    for partition in set(saved) - live:
+        path = table_dir / partition / "part-0.parquet"
+        if path.exists():
+            path.unlink()
+        cur.execute(
+            "DELETE FROM ExportState WHERE table_name = ? AND partition = ?", (table, partition)
+        )
+        conn.commit()
+        removed += 1
+    return written, removed
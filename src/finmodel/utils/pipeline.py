@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import inspect
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from graphlib import CycleError, TopologicalSorter
+from importlib import import_module
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+import yaml
+
+from finmodel.logger import get_logger
+from finmodel.utils.db import bulk_load_enabled, bulk_load_suspended
+
+logger = get_logger(__name__)
+
+DEFAULT_PIPELINE_WORKERS = 4
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass(frozen=True)
+class Step:
+    """One script of a pipeline, run after all steps listed in ``after``."""
+
+    name: str
+    after: Tuple[str, ...] = ()
+    args: Tuple[str, ...] = ()
+
+
+def run_script(name: str, args: Sequence[str] = ()) -> None:
+    """Import ``finmodel.scripts.<name>`` and run its ``main()``.
+
+    ``args`` are passed explicitly rather than through ``sys.argv`` so that
+    several scripts can run in one process at the same time. Scripts whose
+    ``main`` takes ``argv`` receive the list; typer-style ``main`` functions
+    with options are invoked through typer; argument-less ``main`` functions
+    do not accept ``args``.
+    """
+    module = import_module(f"finmodel.scripts.{name}")
+    main = getattr(module, "main", None)
+    if main is None:
+        raise AttributeError(f"Module {name} has no main() function.")
+    params = inspect.signature(main).parameters
+    if "argv" in params:
+        main(list(args))
+    elif not params:
+        if args:
+            raise ValueError(f"Script {name} does not accept arguments: {list(args)}")
+        main()
+    else:
+        import typer
+
+        app = typer.Typer(add_completion=False)
+        app.command()(main)
+        app(list(args), prog_name=name, standalone_mode=False)
+
+
+def parse_steps(raw: Mapping[str, Any]) -> Dict[str, Step]:
+    """Build steps from the ``steps`` mapping of a pipeline file.
+
+    Each value is either a list of dependencies or a mapping with optional
+    ``after`` (list of dependencies) and ``args`` (command line arguments).
+    Raises ``ValueError`` for unknown scripts, unknown dependencies and cycles.
+    """
+    steps: Dict[str, Step] = {}
+    for name, spec in (raw or {}).items():
+        name = str(name)
+        if spec is None:
+            spec = {}
+        if isinstance(spec, (list, tuple)):
+            spec = {"after": spec}
+        if not isinstance(spec, Mapping):
+            raise ValueError(f"Step {name}: expected a list of dependencies or a mapping")
+        after = spec.get("after") or ()
+        if isinstance(after, str):
+            after = (after,)
+        args = spec.get("args") or ()
+        if isinstance(args, str):
+            args = tuple(args.split())
+        steps[name] = Step(name, tuple(str(a) for a in after), tuple(str(a) for a in args))
+
+    for step in steps.values():
+        if find_spec(f"finmodel.scripts.{step.name}") is None:
+            raise ValueError(f"Unknown script: {step.name}")
+        missing = [dep for dep in step.after if dep not in steps]
+        if missing:
+            raise ValueError(f"Step {step.name} depends on undefined steps: {missing}")
+    try:
+        TopologicalSorter({s.name: s.after for s in steps.values()}).prepare()
+    except CycleError as exc:
+        raise ValueError(f"Pipeline has a dependency cycle: {exc.args[1]}") from exc
+    return steps
+
+
+def load_pipeline(path: str | Path) -> Tuple[Dict[str, Step], Optional[int]]:
+    """Read a pipeline YAML file and return its steps and ``workers`` value."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Pipeline file not found: {path}")
+    with path.open("r", encoding="utf-8") as fh:
+        data = yaml.safe_load(fh) or {}
+    workers = data.get("workers")
+    return parse_steps(data.get("steps") or {}), int(workers) if workers else None
+
+
+def run_pipeline(
+    steps: Mapping[str, Step],
+    workers: int = DEFAULT_PIPELINE_WORKERS,
+    runner: Callable[[str, Sequence[str]], None] = run_script,
+) -> Dict[str, str]:
+    """Run ``steps`` concurrently while respecting their dependencies.
+
+    A step starts as soon as all its dependencies finished successfully; up
+    to ``workers`` steps run at once in threads of this process, so they share
+    the HTTP session pools, the rate limiter and the settings caches. With
+    more than one worker ``SQLITE_BULK_LOAD`` is ignored, so concurrent steps
+    commit page by page instead of waiting on each other's write lock. When a
+    step fails, the steps depending on it are skipped. Returns a mapping of
+    step name to ``"ok"``, ``"failed"`` or ``"skipped"``.
+    """
+    if workers > 1:
+        if bulk_load_enabled():
+            logger.warning("SQLITE_BULK_LOAD не используется: шаги выполняются параллельно")
+        with bulk_load_suspended():
+            return _run_steps(steps, workers, runner)
+    return _run_steps(steps, workers, runner)
+
+
+def _run_steps(
+    steps: Mapping[str, Step],
+    workers: int,
+    runner: Callable[[str, Sequence[str]], None],
+) -> Dict[str, str]:
+    sorter = TopologicalSorter({s.name: s.after for s in steps.values()})
+    sorter.prepare()
+    status: Dict[str, str] = {}
+    started: Dict[str, float] = {}
+    running: Dict[Future, str] = {}
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="step") as pool:
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                step = steps[name]
+                blocked = [dep for dep in step.after if status.get(dep) != OK]
+                if blocked:
+                    logger.warning("⏭ %s пропущен: не выполнены %s", name, ", ".join(blocked))
+                    status[name] = SKIPPED
+                    sorter.done(name)
+                    continue
+                logger.info("▶ %s", name)
+                started[name] = time.monotonic()
+                running[pool.submit(runner, step.name, step.args)] = name
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                elapsed = time.monotonic() - started[name]
+                try:
+                    future.result()
+                    status[name] = OK
+                except SystemExit as exc:
+                    status[name] = OK if exc.code in (None, 0) else FAILED
+                except Exception:
+                    logger.exception("Шаг %s завершился с ошибкой", name)
+                    status[name] = FAILED
+                if status[name] == OK:
+                    logger.info("✅ %s за %.1f с", name, elapsed)
+                else:
+                    logger.error("❌ %s не выполнен (%.1f с)", name, elapsed)
+                sorter.done(name)
+    return status
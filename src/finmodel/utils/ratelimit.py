@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from finmodel.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket parameters for one WB API method.
+
+    ``burst`` requests may be sent at once; afterwards one request becomes
+    available every ``interval`` seconds.
+    """
+
+    interval: float
+    burst: int = 1
+
+
+# Documented WB API limits per seller token. Keys are ``host/path`` patterns
+# (``fnmatch`` syntax) matched against the request URL without scheme/query.
+RATE_LIMITS: Dict[str, RateLimit] = {
+    # statistics-api: 1 request per minute per method
+    "statistics-api.wildberries.ru/api/v1/supplier/sales": RateLimit(60),
+    "statistics-api.wildberries.ru/api/v1/supplier/orders": RateLimit(60),
+    "statistics-api.wildberries.ru/api/v1/supplier/stocks": RateLimit(60),
+    "statistics-api.wildberries.ru/api/v5/supplier/reportDetailByPeriod": RateLimit(60),
+    # seller-analytics-api
+    "seller-analytics-api.wildberries.ru/api/v2/nm-report/detail/history": RateLimit(20, 3),
+    "seller-analytics-api.wildberries.ru/api/v1/paid_storage": RateLimit(60, 5),
+    "seller-analytics-api.wildberries.ru/api/v1/paid_storage/tasks/*/status": RateLimit(5, 5),
+    "seller-analytics-api.wildberries.ru/api/v1/paid_storage/tasks/*/download": RateLimit(60),
+    # advert-api
+    "advert-api.wildberries.ru/adv/v1/promotion/count": RateLimit(0.2, 5),
+    "advert-api.wildberries.ru/adv/v1/promotion/adverts": RateLimit(0.2, 5),
+    "advert-api.wildberries.ru/adv/v2/fullstats": RateLimit(60),
+    # content-api: 100 requests per minute, burst 5
+    "content-api.wildberries.ru/content/v2/get/cards/*": RateLimit(0.6, 5),
+    # discounts-prices-api: 10 requests per 6 seconds, burst 5
+    "discounts-prices-api.wildberries.ru/api/v2/list/goods/*": RateLimit(0.6, 5),
+    # public card endpoint has no documented limit; keep requests polite
+    "card.wb.ru/cards/*": RateLimit(0.2),
+}
+
+# Do not log short waits; long ones replace former explicit "sleeping" messages.
+LOG_WAIT_THRESHOLD_SEC = 5.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket that reserves slots for callers.
+
+    A caller that finds the bucket empty reserves the next free slot and
+    sleeps exactly until it, so concurrent callers queue up without polling.
+    """
+
+    def __init__(self, limit: RateLimit) -> None:
+        self.limit = limit
+        self._tokens = float(limit.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(float(self.limit.burst), self._tokens + elapsed / self.limit.interval)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds to wait before using it."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * self.limit.interval
+
+    def try_reserve(self) -> float:
+        """Take one token if available now.
+
+        Returns ``0.0`` when a token was taken, otherwise the number of
+        seconds until one becomes available; nothing is reserved then.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) * self.limit.interval
+
+    def backoff(self, delay: float) -> None:
+        """Make the next request wait at least ``delay`` seconds."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 1 - delay / self.limit.interval)
+
+
+class RateLimiter:
+    """Registry of token buckets keyed by ``(token, endpoint pattern)``."""
+
+    def __init__(self, limits: Optional[Mapping[str, RateLimit]] = None) -> None:
+        self.limits: Mapping[str, RateLimit] = RATE_LIMITS if limits is None else limits
+        self._buckets: Dict[Tuple[Optional[str], str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def match(self, url: str) -> Optional[str]:
+        """Return the most specific registered pattern matching ``url``."""
+        parts = urlsplit(url)
+        target = f"{parts.netloc}{parts.path}".rstrip("/")
+        matches = [p for p in self.limits if fnmatchcase(target, p)]
+        if not matches:
+            return None
+        return max(matches, key=len)
+
+    def bucket(self, token: Optional[str], url: str) -> Optional[TokenBucket]:
+        """Return the bucket for ``token`` and ``url`` or ``None`` if unlimited."""
+        pattern = self.match(url)
+        if pattern is None:
+            return None
+        key = (token, pattern)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.limits[pattern])
+            return bucket
+
+    def acquire(self, token: Optional[str], url: str) -> float:
+        """Block until a request to ``url`` with ``token`` is allowed.
+
+        Returns the number of seconds slept. URLs without a registered limit
+        return immediately.
+        """
+        bucket = self.bucket(token, url)
+        if bucket is None:
+            return 0.0
+        wait = bucket.reserve()
+        if wait > 0:
+            log = logger.info if wait >= LOG_WAIT_THRESHOLD_SEC else logger.debug
+            log("Rate limit for %s: waiting %.1f s", urlsplit(url).path, wait)
+            time.sleep(wait)
+        return wait
+
+    def try_acquire(self, token: Optional[str], url: str) -> float:
+        """Take a slot for ``url`` without blocking.
+
+        Returns ``0.0`` if the request may be sent now, otherwise the number of
+        seconds the caller should wait before trying again.
+        """
+        bucket = self.bucket(token, url)
+        if bucket is None:
+            return 0.0
+        return bucket.try_reserve()
+
+    def backoff(self, token: Optional[str], url: str, delay: float) -> None:
+        """Postpone the next request to ``url`` with ``token`` by ``delay`` seconds."""
+        bucket = self.bucket(token, url)
+        if bucket is not None:
+            bucket.backoff(delay)
+
+
+rate_limiter = RateLimiter()
+
+
+def acquire(token: Optional[str], url: str) -> float:
+    """Wait for the shared limiter; see :meth:`RateLimiter.acquire`."""
+    return rate_limiter.acquire(token, url)
+
+
+def try_acquire(token: Optional[str], url: str) -> float:
+    """Non-blocking variant of :func:`acquire`; see :meth:`RateLimiter.try_acquire`."""
+    return rate_limiter.try_acquire(token, url)
+
+
+def backoff(token: Optional[str], url: str, delay: float) -> None:
+    """Postpone requests on the shared limiter; see :meth:`RateLimiter.backoff`."""
+    rate_limiter.backoff(token, url, delay)
+
+
+def retry_delay(resp: Any, default: float) -> float:
+    """Return the server-suggested wait for a 429 response.
+
+    WB sends ``X-Ratelimit-Retry`` (seconds); ``Retry-After`` is honoured as
+    well. Falls back to ``default`` when no usable header is present.
+    """
+    headers = getattr(resp, "headers", None) or {}
+    for name in ("X-Ratelimit-Retry", "Retry-After"):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(float(value), 0.0)
+        except (TypeError, ValueError):
+            continue
+    return default
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, List, Mapping, Optional
+
+import requests
+
+from finmodel.logger import get_logger
+from finmodel.utils.ratelimit import RateLimiter, rate_limiter, retry_delay
+
+logger = get_logger(__name__)
+
+# Polls of one task before it is abandoned (status is checked every ~5 s).
+MAX_POLLS = 60
+POLL_INTERVAL_SEC = 5.0
+# Attempts to create or download a task after 429 responses.
+MAX_ATTEMPTS = 2
+# Never sleep less than this between idle scheduler rounds.
+MIN_IDLE_SEC = 0.05
+
+
+@dataclass
+class ReportJob:
+    """One report to generate: the request ``params`` sent with ``token``.
+
+    ``context`` is opaque to the scheduler and handed back to the callback
+    together with the downloaded payload.
+    """
+
+    token: str
+    params: Dict[str, Any]
+    context: Any = None
+    task_id: Optional[str] = None
+    attempts: int = 0
+    polls: int = 0
+    next_poll: float = 0.0
+
+
+@dataclass
+class _TokenQueue:
+    pending: Deque[ReportJob] = field(default_factory=deque)
+    polling: List[ReportJob] = field(default_factory=list)
+    ready: Deque[ReportJob] = field(default_factory=deque)
+
+    def in_flight(self) -> int:
+        return len(self.polling) + len(self.ready)
+
+    def idle(self) -> bool:
+        return not (self.pending or self.polling or self.ready)
+
+
+class ReportTaskScheduler:
+    """Drive WB "create task → poll status → download" reports concurrently.
+
+    Jobs of every token are interleaved in one loop: tasks are created while
+    the token's create limit has a free slot (at most the create burst is kept
+    in flight per token), all created tasks share the status limit for
+    polling, and each report is downloaded as soon as it is ready. Requests
+    go through :meth:`RateLimiter.try_acquire`, so the loop only sleeps when
+    no request of any token may be sent.
+    """
+
+    def __init__(
+        self,
+        http: requests.Session,
+        create_url: str,
+        status_url: str,
+        download_url: str,
+        *,
+        headers: Optional[Mapping[str, str]] = None,
+        limiter: Optional[RateLimiter] = None,
+        max_in_flight: Optional[int] = None,
+        poll_interval: float = POLL_INTERVAL_SEC,
+        max_polls: int = MAX_POLLS,
+    ) -> None:
+        self.http = http
+        self.create_url = create_url
+        self.status_url = status_url
+        self.download_url = download_url
+        self.headers = dict(headers or {})
+        self.limiter = limiter or rate_limiter
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.max_polls = max_polls
+
+    # ---------------- HTTP ----------------
+    def _headers(self, token: str) -> Dict[str, str]:
+        headers = self.headers.copy()
+        headers["Authorization"] = token
+        return headers
+
+    def _create(self, job: ReportJob) -> requests.Response:
+        return self.http.get(
+            self.create_url, headers=self._headers(job.token), params=job.params, timeout=60
+        )
+
+    def _status(self, job: ReportJob) -> requests.Response:
+        url = self.status_url.format(task_id=job.task_id)
+        return self.http.get(url, headers=self._headers(job.token), timeout=60)
+
+    def _download(self, job: ReportJob) -> requests.Response:
+        url = self.download_url.format(task_id=job.task_id)
+        return self.http.get(url, headers=self._headers(job.token), timeout=120)
+
+    def _cap(self, token: str) -> int:
+        if self.max_in_flight is not None:
+            return self.max_in_flight
+        bucket = self.limiter.bucket(token, self.create_url)
+        return bucket.limit.burst if bucket is not None else 1
+
+    # ---------------- Steps ----------------
+    def _try_download(
+        self, queue: _TokenQueue, on_report: Callable[[ReportJob, Any], None]
+    ) -> Optional[float]:
+        job = queue.ready[0]
+        url = self.download_url.format(task_id=job.task_id)
+        wait = self.limiter.try_acquire(job.token, url)
+        if wait:
+            return wait
+        queue.ready.popleft()
+        try:
+            resp = self._download(job)
+            if resp.status_code == 429:
+                job.attempts += 1
+                delay = retry_delay(resp, 65)
+                self.limiter.backoff(job.token, url, delay)
+                if job.attempts < MAX_ATTEMPTS:
+                    logger.warning("  429 на download (task %s). Жду %s сек…", job.task_id, delay)
+                    queue.ready.appendleft(job)
+                else:
+                    logger.warning("  429 на download (task %s). Пропускаю окно.", job.task_id)
+                return None
+            if resp.status_code != 200:
+                logger.warning("  Ошибка download: %s %s", resp.status_code, resp.text[:200])
+                return None
+            payload = resp.json()
+        except Exception as e:
+            logger.warning("  Ошибка download: %s", e)
+            return None
+        try:
+            on_report(job, payload)
+        except Exception as e:
+            logger.warning("  Ошибка обработки отчёта (task %s): %s", job.task_id, e)
+        return None
+
+    def _try_poll(self, queue: _TokenQueue, job: ReportJob, now: float) -> Optional[float]:
+        url = self.status_url.format(task_id=job.task_id)
+        wait = self.limiter.try_acquire(job.token, url)
+        if wait:
+            return wait
+        job.polls += 1
+        job.next_poll = now + self.poll_interval
+        status = ""
+        try:
+            resp = self._status(job)
+            if resp.status_code == 429:
+                delay = retry_delay(resp, 6)
+                logger.warning("   429 на статусе. Жду %s сек…", delay)
+                self.limiter.backoff(job.token, url, delay)
+            elif resp.status_code != 200:
+                logger.warning("   статус HTTP %s: %s", resp.status_code, resp.text[:200])
+            else:
+                status = resp.json().get("data", {}).get("status", "")
+                logger.info("   task %s: статус %s", job.task_id, status)
+        except Exception as e:
+            logger.warning("   Ошибка get_status: %s", e)
+        if status == "done":
+            queue.polling.remove(job)
+            job.attempts = 0
+            queue.ready.append(job)
+        elif status in ("error", "failed"):
+            logger.error("   task %s: статус ошибки. Пропускаю окно.", job.task_id)
+            queue.polling.remove(job)
+        elif job.polls >= self.max_polls:
+            logger.warning("   task %s: слишком долго нет 'done'. Пропускаю окно.", job.task_id)
+            queue.polling.remove(job)
+        return None
+
+    def _try_create(self, queue: _TokenQueue, now: float) -> Optional[float]:
+        job = queue.pending[0]
+        wait = self.limiter.try_acquire(job.token, self.create_url)
+        if wait:
+            return wait
+        queue.pending.popleft()
+        try:
+            resp = self._create(job)
+            if resp.status_code == 429:
+                job.attempts += 1
+                delay = retry_delay(resp, 65)
+                self.limiter.backoff(job.token, self.create_url, delay)
+                if job.attempts < MAX_ATTEMPTS:
+                    logger.warning(
+                        "  429 Too Many Requests на создание. Жду %s сек и повторю…", delay
+                    )
+                    queue.pending.appendleft(job)
+                else:
+                    logger.warning("  429 на создание %s. Пропускаю окно.", job.params)
+                return None
+            if resp.status_code == 401:
+                logger.error("  401 Unauthorized. Пропускаю эту организацию.")
+                queue.pending.clear()
+                return None
+            if resp.status_code != 200:
+                logger.warning(
+                    "  Ошибка создания задания: %s %s", resp.status_code, resp.text[:200]
+                )
+                return None
+            task_id = resp.json().get("data", {}).get("taskId")
+        except Exception as e:
+            logger.warning("  Ошибка create_task: %s", e)
+            return None
+        if not task_id:
+            logger.warning("  taskId не получен.")
+            return None
+        logger.info("  %s → taskId: %s", job.params, task_id)
+        job.task_id = task_id
+        job.attempts = 0
+        job.polls = 0
+        # the report is never ready instantly; give the server one interval
+        job.next_poll = now + self.poll_interval
+        queue.polling.append(job)
+        return None
+
+    # ---------------- Loop ----------------
+    def run(self, jobs: Iterable[ReportJob], on_report: Callable[[ReportJob, Any], None]) -> None:
+        """Process ``jobs`` and call ``on_report(job, payload)`` for every download.
+
+        Failed windows are logged and skipped; a 401 on task creation drops
+        the remaining jobs of that token.
+        """
+        queues: Dict[str, _TokenQueue] = {}
+        for job in jobs:
+            queues.setdefault(job.token, _TokenQueue()).pending.append(job)
+
+        while True:
+            active = [q for q in queues.values() if not q.idle()]
+            if not active:
+                break
+            progressed = False
+            waits: List[float] = []
+            for queue in active:
+                now = time.monotonic()
+                if queue.ready:
+                    wait = self._try_download(queue, on_report)
+                    if wait is None:
+                        progressed = True
+                    else:
+                        waits.append(wait)
+                for job in list(queue.polling):
+                    if job.next_poll > now:
+                        waits.append(job.next_poll - now)
+                        continue
+                    wait = self._try_poll(queue, job, now)
+                    if wait is None:
+                        progressed = True
+                    else:
+                        waits.append(wait)
+                        # the status limit is shared by all tasks of the token
+                        break
+                if queue.pending and queue.in_flight() < self._cap(queue.pending[0].token):
+                    wait = self._try_create(queue, now)
+                    if wait is None:
+                        progressed = True
+                    else:
+                        waits.append(wait)
+            if not progressed:
+                time.sleep(max(min(waits, default=MIN_IDLE_SEC), MIN_IDLE_SEC))
@@ -1,22 +1,40 @@
 from __future__ import annotations
 
 import os
+import pickle
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, Tuple
 
-import pandas as pd
 import yaml
 
 from finmodel.logger import get_logger
 from finmodel.utils.paths import get_project_root
 
+if TYPE_CHECKING:  # pandas is imported lazily: reading config.yml must stay cheap
+    import pandas as pd
+
 _config: Dict[str, Any] | None = None
 _config_path: Path | None = None
+# (mtime_ns, size) of the loaded config file; ``None`` when it did not exist.
+_config_stamp: Tuple[int, int] | None = None
+# Parsed workbooks keyed by resolved path: ((mtime_ns, size), {sheet: DataFrame}).
+_workbooks: Dict[Path, Tuple[Tuple[int, int], Dict[str, pd.DataFrame]]] = {}
 logger = get_logger(__name__)
 
 
-def load_config(path: str | Path | None = None, force_reload: bool = False) -> Dict[str, Any]:
+def _file_stamp(path: Path) -> Tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_config(
+    path: str | Path | None = None, force_reload: bool = False, *, check_mtime: bool = False
+) -> Dict[str, Any]:
     """Load configuration from a YAML file or environment variables.
 
     The search order is:
@@ -25,31 +43,82 @@ def load_config(path: str | Path | None = None, force_reload: bool = False) -> D
     3. ``config.yml`` in the project root.
 
     Loaded values are cached for subsequent calls. Set ``force_reload`` to
-    ``True`` or pass a new ``path`` to reload the configuration.
+    ``True`` or pass a new ``path`` to reload the configuration. With
+    ``check_mtime`` the file is also re-read when its modification time or
+    size changed since it was loaded.
     """
-    global _config, _config_path
+    global _config, _config_path, _config_stamp
     base_dir = get_project_root()
     cfg_path = Path(path or os.getenv("FINMODEL_CONFIG", base_dir / "config.yml"))
-    if force_reload or _config is None or _config_path != cfg_path:
+    if (
+        force_reload
+        or _config is None
+        or _config_path != cfg_path
+        or (check_mtime and _file_stamp(cfg_path) != _config_stamp)
+    ):
+        stamp = _file_stamp(cfg_path)
         data: Dict[str, Any] = {}
-        if cfg_path.exists():
+        if stamp is not None:
             with cfg_path.open("r", encoding="utf-8") as fh:
                 data = yaml.safe_load(fh) or {}
         _config = data
         _config_path = cfg_path
+        _config_stamp = stamp
     return _config
 
 
+def refresh_config() -> Dict[str, Any]:
+    """Re-read the configuration file unconditionally.
+
+    Long-running processes can call it to pick up edits immediately instead
+    of waiting for the next modification-time check.
+    """
+    return load_config(force_reload=True)
+
+
 def find_setting(name: str, default: Any | None = None) -> Any:
     """Return configuration value by ``name``.
 
     Environment variables take precedence over the ``settings`` section of
-    the config file. If the key is missing, ``default`` is returned.
+    the config file. If the key is missing, ``default`` is returned. The file
+    is re-read only when it changed on disk.
     """
-    cfg = load_config(force_reload=True).get("settings", {})
+    cfg = load_config(check_mtime=True).get("settings", {})
     return os.getenv(name) or cfg.get(name, default)
 
 
+def _as_bool(value: Any) -> bool:
+    return str(value).strip().lower() in {"1", "true", "yes", "on"}
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Typed view of the options the scripts read via :func:`find_setting`.
+
+    Obtain it with :func:`get_settings`; values follow the same precedence
+    (environment, then ``config.yml``, then the defaults below).
+    """
+
+    org_sheet: str = "НастройкиОрганизаций"
+    settings_sheet: str = "Настройки"
+    sqlite_bulk_load: bool = False
+    settings_cache: bool = False
+
+    @classmethod
+    def load(cls) -> "Settings":
+        return cls(
+            org_sheet=str(find_setting("ORG_SHEET", default=cls.org_sheet)),
+            settings_sheet=str(find_setting("SETTINGS_SHEET", default=cls.settings_sheet)),
+            sqlite_bulk_load=_as_bool(find_setting("SQLITE_BULK_LOAD", default=False)),
+            settings_cache=_as_bool(find_setting("SETTINGS_CACHE", default=False)),
+        )
+
+
+def get_settings() -> Settings:
+    """Return the current :class:`Settings`, re-reading ``config.yml`` if it changed."""
+    return Settings.load()
+
+
 def parse_date(dt) -> datetime:
     """Parse various date formats into ``datetime``.
 
@@ -63,9 +132,90 @@ def parse_date(dt) -> datetime:
             return datetime.strptime(s, fmt)
         except ValueError:
             continue
+    import pandas as pd
+
     return pd.to_datetime(s).to_pydatetime()
 
 
+def _workbook_stamp(xls_path: Path) -> Tuple[int, int]:
+    st = xls_path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _sidecar_path(xls_path: Path) -> Path:
+    return xls_path.with_name(f".{xls_path.name}.cache.pkl")
+
+
+def _sidecar_enabled() -> bool:
+    return get_settings().settings_cache
+
+
+def _load_sidecar(xls_path: Path, stamp: Tuple[int, int]) -> Dict[str, pd.DataFrame] | None:
+    sidecar = _sidecar_path(xls_path)
+    if not sidecar.exists():
+        return None
+    try:
+        with sidecar.open("rb") as fh:
+            cached_stamp, sheets = pickle.load(fh)
+    except Exception as exc:
+        logger.debug("Ignoring unreadable workbook cache %s: %s", sidecar, exc)
+        return None
+    return sheets if tuple(cached_stamp) == stamp else None
+
+
+def _save_sidecar(xls_path: Path, stamp: Tuple[int, int], sheets: Dict[str, pd.DataFrame]) -> None:
+    sidecar = _sidecar_path(xls_path)
+    try:
+        with sidecar.open("wb") as fh:
+            pickle.dump((stamp, sheets), fh, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as exc:
+        logger.debug("Could not write workbook cache %s: %s", sidecar, exc)
+
+
+def _parsed_sheets(xls_path: Path) -> Dict[str, pd.DataFrame]:
+    key = xls_path.resolve()
+    stamp = _workbook_stamp(xls_path)
+    cached = _workbooks.get(key)
+    if cached is None or cached[0] != stamp:
+        use_sidecar = _sidecar_enabled()
+        sheets = _load_sidecar(xls_path, stamp) if use_sidecar else None
+        if sheets is None:
+            import pandas as pd
+
+            logger.debug("Parsing workbook %s", xls_path)
+            with pd.ExcelFile(xls_path) as xls:
+                sheets = {name: xls.parse(sheet_name=name, header=None) for name in xls.sheet_names}
+            if use_sidecar:
+                _save_sidecar(xls_path, stamp, sheets)
+        _workbooks[key] = cached = (stamp, sheets)
+    return cached[1]
+
+
+def read_workbook(path: str | Path | None = None) -> Dict[str, pd.DataFrame]:
+    """Return all sheets of ``Настройки.xlsm`` (or ``path``) as raw dataframes.
+
+    Sheets are read with ``header=None`` in a single pass and cached per
+    process, keyed by path, modification time and size, so the loaders below
+    share one parse. With ``SETTINGS_CACHE`` enabled the parsed sheets are also
+    pickled next to the workbook and reused by later processes until the
+    workbook changes. Callers receive copies and may modify them freely.
+    """
+    xls_path = Path(path or get_project_root() / "Настройки.xlsm")
+    return {name: df.copy() for name, df in _parsed_sheets(xls_path).items()}
+
+
+def clear_workbook_cache() -> None:
+    """Forget workbooks parsed by :func:`read_workbook` in this process."""
+    _workbooks.clear()
+
+
+def _read_sheet(xls_path: Path, sheet: str) -> pd.DataFrame:
+    sheets = _parsed_sheets(xls_path)
+    if sheet not in sheets:
+        raise ValueError(f"Worksheet named '{sheet}' not found")
+    return sheets[sheet].copy()
+
+
 def load_organizations(path: str | Path | None = None, sheet: str | None = None) -> pd.DataFrame:
     """Load organizations and tokens from an Excel workbook.
 
@@ -76,6 +226,8 @@ def load_organizations(path: str | Path | None = None, sheet: str | None = None)
     ``Организация`` and ``Token_WB``. Missing or empty rows are dropped.
     """
 
+    import pandas as pd
+
     sheet = sheet or find_setting("ORG_SHEET", default="НастройкиОрганизаций")
     base_dir = get_project_root()
     xls_path = Path(path or base_dir / "Настройки.xlsm")
@@ -84,16 +236,16 @@ def load_organizations(path: str | Path | None = None, sheet: str | None = None)
         logger.warning("Workbook %s not found", xls_path)
         return pd.DataFrame(columns=["id", "Организация", "Token_WB"])
 
-    with pd.ExcelFile(xls_path) as xls:
-        logger.debug("Available sheets in %s: %s", xls_path, xls.sheet_names)
-        if sheet not in xls.sheet_names:
-            logger.warning(
-                "Sheet %s not found in %s. Available sheets: %s", sheet, xls_path, xls.sheet_names
-            )
-            return pd.DataFrame(columns=["id", "Организация", "Token_WB"])
+    sheets = _parsed_sheets(xls_path)
+    sheet_names = list(sheets)
+    logger.debug("Available sheets in %s: %s", xls_path, sheet_names)
+    if sheet not in sheets:
+        logger.warning(
+            "Sheet %s not found in %s. Available sheets: %s", sheet, xls_path, sheet_names
+        )
+        return pd.DataFrame(columns=["id", "Организация", "Token_WB"])
 
-        df = xls.parse(sheet_name=sheet, header=None)
-    df = df.dropna(how="all")
+    df = sheets[sheet].dropna(how="all")  # returns a copy; the cache stays intact
     if df.empty:
         return pd.DataFrame(columns=["id", "Организация", "Token_WB"])
     header_idx = df.index[0]
@@ -137,6 +289,8 @@ def load_period(
     is returned and a warning is logged.
     """
 
+    import pandas as pd
+
     sheet = sheet or find_setting("SETTINGS_SHEET", default="Настройки")
     base_dir = get_project_root()
     xls_path = Path(path or base_dir / "Настройки.xlsm")
@@ -144,8 +298,7 @@ def load_period(
         logger.warning("Workbook %s not found", xls_path)
         return None, None
 
-    df = pd.read_excel(xls_path, sheet_name=sheet, header=None)
-    df = df.dropna(how="all")
+    df = _read_sheet(xls_path, sheet).dropna(how="all")
     if df.empty:
         return None, None
 
@@ -203,14 +356,15 @@ def load_global_settings(
     ignored.
     """
 
+    import pandas as pd
+
     sheet = sheet or find_setting("SETTINGS_SHEET", default="Настройки")
     base_dir = get_project_root()
     xls_path = Path(path or base_dir / "Настройки.xlsm")
     if not xls_path.exists():
         return {}
 
-    df = pd.read_excel(xls_path, sheet_name=sheet, header=None)
-    df = df.dropna(how="all")
+    df = _read_sheet(xls_path, sheet).dropna(how="all")
     if df.empty:
         return {}
 
@@ -0,0 +1,365 @@
+"""Unit economics per product and day computed from the imported tables.
+
+Sales and returns come from ``SalesWBFlat``, logistics and penalties from
+``FinOtchet``, storage from ``PaidStorageFlat``, advertising spend from the
+product rows of ``AdvCampaignsFullStats`` and commission rates from
+``WBTariffsCommission``. Additive components are materialized per
+``(org_id, nm_id, day)`` in ``UnitEconomicsDaily``; ratios over a period are
+derived from their sums into ``UnitEconomics``. Cost of goods is not part of
+the imported data, so margins are before it.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from finmodel.logger import get_logger
+from finmodel.utils.import_state import (
+    ensure_import_state,
+    load_cursor,
+    reset_cursor,
+    save_cursor,
+)
+
+logger = get_logger(__name__)
+
+SCRIPT = "unit_economics"  # key in ImportState, cursor holds a watermark per source
+DAILY_TABLE = "UnitEconomicsDaily"
+PERIOD_TABLE = "UnitEconomics"
+
+# Additive components stored per product and day: the ones read from the
+# sources and the margin derived from them.
+SOURCE_COMPONENTS: List[str] = [
+    "sales_qty",
+    "returns_qty",
+    "revenue",
+    "for_pay",
+    "commission",
+    "logistics",
+    "penalties",
+    "storage",
+    "ad_cost",
+]
+COMPONENTS: List[str] = SOURCE_COMPONENTS + ["margin"]
+INTEGER_COMPONENTS = {"sales_qty", "returns_qty"}
+COSTS: List[str] = ["commission", "logistics", "penalties", "storage", "ad_cost"]
+RATIOS: List[str] = ["margin_pct", "ad_share", "storage_per_unit", "roi"]
+
+# Source tables: (table, column that grows on every change, day expression).
+# Rows above the saved watermark mark their days for recomputation.
+SOURCES: Dict[str, Tuple[str, str, str]] = {
+    "sales": ("SalesWBFlat", "lastChangeDate", "substr(date, 1, 10)"),
+    "finance": ("FinOtchet", "rrd_id", "substr(rr_dt, 1, 10)"),
+    "storage": ("PaidStorageFlat", "LoadDate", "substr(date, 1, 10)"),
+    "ads": ("AdvCampaignsFullStats", "LoadDate", "substr(date, 1, 10)"),
+}
+
+# Sales from WB warehouses pay the FBW rate, the rest the marketplace rate.
+WB_WAREHOUSE_TYPE = "Склад WB"
+
+
+def _daily_sql() -> str:
+    cols = ",\n".join(
+        f"    {c} {'INTEGER' if c in INTEGER_COMPONENTS else 'REAL'} NOT NULL DEFAULT 0"
+        for c in COMPONENTS
+    )
+    return (
+        f"CREATE TABLE IF NOT EXISTS {DAILY_TABLE} (\n"
+        "    org_id INTEGER NOT NULL,\n"
+        "    nm_id INTEGER NOT NULL,\n"
+        "    day TEXT NOT NULL,\n"
+        f"{cols},\n"
+        "    PRIMARY KEY (org_id, nm_id, day)\n"
+        ");"
+    )
+
+
+def _period_sql() -> str:
+    cols = ",\n".join(
+        f"    {c} {'INTEGER' if c in INTEGER_COMPONENTS else 'REAL'}" for c in COMPONENTS + RATIOS
+    )
+    return (
+        f"CREATE TABLE IF NOT EXISTS {PERIOD_TABLE} (\n"
+        "    org_id INTEGER NOT NULL,\n"
+        "    nm_id INTEGER NOT NULL,\n"
+        "    date_from TEXT,\n"
+        "    date_to TEXT,\n"
+        f"{cols},\n"
+        "    PRIMARY KEY (org_id, nm_id)\n"
+        ");"
+    )
+
+
+def ensure_tables(conn: sqlite3.Connection | sqlite3.Cursor) -> None:
+    """Create the unit-economics tables if they do not exist."""
+    conn.execute(_daily_sql())
+    conn.execute(_period_sql())
+
+
+# ---------------- Reading ----------------
+def _query(conn: sqlite3.Connection, sql: str, params: Iterable[Any] = ()) -> pd.DataFrame:
+    """Run ``sql`` into a dataframe; a missing source table reads as empty."""
+    try:
+        return pd.read_sql_query(sql, conn, params=list(params))
+    except (sqlite3.OperationalError, pd.errors.DatabaseError) as exc:
+        if "no such table" not in str(exc):
+            raise
+        return pd.DataFrame()
+
+
+def _numeric(series: pd.Series) -> pd.Series:
+    return pd.to_numeric(series, errors="coerce").fillna(0.0)
+
+
+def _records(df: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    """Rows of ``df`` as tuples of Python values (``NaN`` becomes ``None``)."""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def _source_orgs(conn: sqlite3.Connection) -> List[str]:
+    orgs: Set[str] = set()
+    for table, _, _ in SOURCES.values():
+        df = _query(conn, f"SELECT DISTINCT org_id FROM {table} WHERE org_id IS NOT NULL")
+        orgs.update(str(v) for v in df.get("org_id", []))
+    return sorted(orgs)
+
+
+def changed_days(
+    conn: sqlite3.Connection, org_id: str, cursor: Dict[str, Any]
+) -> Tuple[Set[str], Dict[str, Any]]:
+    """Return days of ``org_id`` with source rows above ``cursor`` and the new cursor.
+
+    A source without a saved watermark contributes all of its days.
+    """
+    days: Set[str] = set()
+    new_cursor = dict(cursor)
+    for name, (table, mark, day_expr) in SOURCES.items():
+        where, params = "org_id = ?", [org_id]
+        if cursor.get(name) is not None:
+            where += f" AND {mark} > ?"
+            params.append(cursor[name])
+        df = _query(
+            conn,
+            f"SELECT {day_expr} AS day, MAX({mark}) AS mark FROM {table} "
+            f"WHERE {where} GROUP BY {day_expr}",
+            params,
+        )
+        if df.empty:
+            continue
+        days.update(d for d in df["day"] if d)
+        top = df["mark"].max()
+        new_cursor[name] = top.item() if hasattr(top, "item") else top
+    return days, new_cursor
+
+
+def _sales(conn: sqlite3.Connection, org_id: str, first: str, last: str) -> pd.DataFrame:
+    df = _query(
+        conn,
+        "SELECT nmId AS nm_id, substr(date, 1, 10) AS day, saleID, subject, warehouseType, "
+        "priceWithDisc, forPay FROM SalesWBFlat "
+        "WHERE org_id = ? AND substr(date, 1, 10) BETWEEN ? AND ?",
+        (org_id, first, last),
+    )
+    if df.empty:
+        return df
+    sign = np.where(df["saleID"].astype(str).str.startswith("R"), -1.0, 1.0)
+    revenue = sign * _numeric(df["priceWithDisc"]).abs()
+    for_pay = sign * _numeric(df["forPay"]).abs()
+
+    tariffs = _query(
+        conn, "SELECT subjectName, paidStorageKgvp, kgvpMarketplace FROM WBTariffsCommission"
+    )
+    rate = pd.Series(np.nan, index=df.index)
+    if not tariffs.empty:
+        tariffs = tariffs.drop_duplicates("subjectName").set_index("subjectName")
+        fbw = df["subject"].map(pd.to_numeric(tariffs["paidStorageKgvp"], errors="coerce"))
+        fbs = df["subject"].map(pd.to_numeric(tariffs["kgvpMarketplace"], errors="coerce"))
+        rate = pd.Series(np.where(df["warehouseType"] == WB_WAREHOUSE_TYPE, fbw, fbs), df.index)
+    # without a tariff the commission is what WB kept from the sale
+    commission = np.where(rate.notna(), revenue * rate / 100.0, revenue - for_pay)
+
+    return pd.DataFrame(
+        {
+            "nm_id": df["nm_id"],
+            "day": df["day"],
+            "sales_qty": (sign > 0).astype(int),
+            "returns_qty": (sign < 0).astype(int),
+            "revenue": revenue,
+            "for_pay": for_pay,
+            "commission": commission,
+        }
+    )
+
+
+def _finance(conn: sqlite3.Connection, org_id: str, first: str, last: str) -> pd.DataFrame:
+    df = _query(
+        conn,
+        "SELECT nm_id, substr(rr_dt, 1, 10) AS day, delivery_rub, rebill_logistic_cost, penalty "
+        "FROM FinOtchet WHERE org_id = ? AND substr(rr_dt, 1, 10) BETWEEN ? AND ?",
+        (org_id, first, last),
+    )
+    if df.empty:
+        return df
+    return pd.DataFrame(
+        {
+            "nm_id": df["nm_id"],
+            "day": df["day"],
+            "logistics": _numeric(df["delivery_rub"]) + _numeric(df["rebill_logistic_cost"]),
+            "penalties": _numeric(df["penalty"]),
+        }
+    )
+
+
+def _storage(conn: sqlite3.Connection, org_id: str, first: str, last: str) -> pd.DataFrame:
+    df = _query(
+        conn,
+        "SELECT nmId AS nm_id, substr(date, 1, 10) AS day, warehousePrice FROM PaidStorageFlat "
+        "WHERE org_id = ? AND substr(date, 1, 10) BETWEEN ? AND ?",
+        (org_id, first, last),
+    )
+    if df.empty:
+        return df
+    return pd.DataFrame(
+        {"nm_id": df["nm_id"], "day": df["day"], "storage": _numeric(df["warehousePrice"])}
+    )
+
+
+def _ads(conn: sqlite3.Connection, org_id: str, first: str, last: str) -> pd.DataFrame:
+    # only product rows: campaign and app rows repeat the same spend
+    df = _query(
+        conn,
+        'SELECT nmId AS nm_id, substr(date, 1, 10) AS day, "sum" AS spend '
+        "FROM AdvCampaignsFullStats WHERE org_id = ? AND nmId != '' "
+        "AND substr(date, 1, 10) BETWEEN ? AND ?",
+        (org_id, first, last),
+    )
+    if df.empty:
+        return df
+    return pd.DataFrame({"nm_id": df["nm_id"], "day": df["day"], "ad_cost": _numeric(df["spend"])})
+
+
+# ---------------- Computation ----------------
+def compute_daily(conn: sqlite3.Connection, org_id: str, days: Iterable[str]) -> pd.DataFrame:
+    """Return the components of ``org_id`` per product for each of ``days``."""
+    days = sorted(set(days))
+    columns = ["nm_id", "day"] + COMPONENTS
+    if not days:
+        return pd.DataFrame(columns=columns)
+    first, last = days[0], days[-1]
+    parts = [
+        part
+        for part in (
+            _sales(conn, org_id, first, last),
+            _finance(conn, org_id, first, last),
+            _storage(conn, org_id, first, last),
+            _ads(conn, org_id, first, last),
+        )
+        if not part.empty
+    ]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(parts, ignore_index=True)
+    df = df[df["day"].isin(days)]
+    # rows without a product (e.g. storage of a whole delivery) go to nm_id 0
+    df["nm_id"] = pd.to_numeric(df["nm_id"], errors="coerce").fillna(0).astype("int64")
+    df = df.reindex(columns=["nm_id", "day"] + SOURCE_COMPONENTS).fillna(0)
+    daily = df.groupby(["nm_id", "day"], as_index=False)[SOURCE_COMPONENTS].sum()
+    daily["margin"] = daily["revenue"] - daily[COSTS].sum(axis=1)
+    for col in INTEGER_COMPONENTS:
+        daily[col] = daily[col].astype("int64")
+    return daily[columns]
+
+
+def add_ratios(df: pd.DataFrame) -> pd.DataFrame:
+    """Add ``RATIOS`` computed from summed components; undefined ratios are NaN."""
+    revenue = df["revenue"].where(df["revenue"] != 0)
+    units = (df["sales_qty"] - df["returns_qty"]).where(lambda s: s > 0)
+    costs = df[COSTS].sum(axis=1)
+    df["margin_pct"] = df["margin"] / revenue * 100.0
+    df["ad_share"] = df["ad_cost"] / revenue * 100.0
+    df["storage_per_unit"] = df["storage"] / units
+    df["roi"] = df["margin"] / costs.where(costs != 0) * 100.0
+    return df
+
+
+# ---------------- Materialization ----------------
+def update_daily(conn: sqlite3.Connection, full: bool = False) -> int:
+    """Recompute ``UnitEconomicsDaily`` for days whose source rows changed.
+
+    Watermarks of every source are kept per organization in ``ImportState``;
+    the recomputed days and the new watermarks are committed together.
+    ``full`` recomputes every day (needed after tariff changes). Returns the
+    number of recomputed organization days.
+    """
+    cur = conn.cursor()
+    ensure_tables(cur)
+    ensure_import_state(cur)
+    if full:
+        cur.execute(f"DELETE FROM {DAILY_TABLE}")
+        reset_cursor(cur, SCRIPT)
+    conn.commit()
+
+    placeholders = ", ".join("?" * len(COMPONENTS))
+    insert_sql = (
+        f"INSERT INTO {DAILY_TABLE} (org_id, nm_id, day, {', '.join(COMPONENTS)}) "
+        f"VALUES (?, ?, ?, {placeholders})"
+    )
+    total = 0
+    for org_id in _source_orgs(conn):
+        saved = load_cursor(cur, SCRIPT, org_id)
+        cursor = json.loads(saved) if saved else {}
+        days, new_cursor = changed_days(conn, org_id, cursor)
+        if not days:
+            continue
+        daily = compute_daily(conn, org_id, days)
+        cur.executemany(
+            f"DELETE FROM {DAILY_TABLE} WHERE org_id = ? AND day = ?",
+            [(org_id, day) for day in sorted(days)],
+        )
+        cur.executemany(insert_sql, [(org_id, *row) for row in _records(daily)])
+        save_cursor(cur, SCRIPT, org_id, json.dumps(new_cursor), len(daily))
+        conn.commit()
+        total += len(days)
+        logger.info("  Орг %s: пересчитано дней: %s, строк: %s", org_id, len(days), len(daily))
+    return total
+
+
+def build_period(
+    conn: sqlite3.Connection, date_from: Optional[str] = None, date_to: Optional[str] = None
+) -> int:
+    """Replace ``UnitEconomics`` with per-product totals and ratios over a period.
+
+    Without bounds every materialized day is included. Returns the row count.
+    """
+    where, params = [], []
+    if date_from:
+        where.append("day >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("day <= ?")
+        params.append(date_to)
+    sums = ", ".join(f"SUM({c}) AS {c}" for c in COMPONENTS)
+    df = pd.read_sql_query(
+        f"SELECT org_id, nm_id, MIN(day) AS date_from, MAX(day) AS date_to, {sums} "
+        f"FROM {DAILY_TABLE} {'WHERE ' + ' AND '.join(where) if where else ''} "
+        "GROUP BY org_id, nm_id",
+        conn,
+        params=params,
+    )
+    df = add_ratios(df)
+
+    cur = conn.cursor()
+    columns = ["org_id", "nm_id", "date_from", "date_to"] + COMPONENTS + RATIOS
+    cur.execute(f"DELETE FROM {PERIOD_TABLE}")
+    cur.executemany(
+        f"INSERT INTO {PERIOD_TABLE} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})",
+        _records(df[columns]),
+    )
+    conn.commit()
+    return len(df)
@@ -1,5 +1,7 @@
 import sqlite3
 import sys
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import MagicMock
@@ -32,8 +34,7 @@ def test_main_runs_without_nameerror(monkeypatch):
         raising=False,
     )
     conn = sqlite3.connect(":memory:")
-    conn.execute(
-        """
+    conn.execute("""
         CREATE TABLE AdvCampaignsDetailsFlat (
             org_id TEXT,
             advertId TEXT,
@@ -43,18 +44,178 @@ def test_main_runs_without_nameerror(monkeypatch):
             endTime TEXT,
             changeTime TEXT
         )
-        """
-    )
+        """)
     monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: conn)
 
     fake_get = MagicMock(
         return_value=SimpleNamespace(status_code=200, json=lambda: {"adverts": []}, text="")
     )
     fake_post = MagicMock(return_value=SimpleNamespace(status_code=200, json=lambda: [], text=""))
-    monkeypatch.setattr("requests.get", fake_get)
-    monkeypatch.setattr("requests.post", fake_post)
+    monkeypatch.setattr("requests.Session.get", fake_get)
+    monkeypatch.setattr("requests.Session.post", fake_post)
 
     try:
         adv_fullstats_import_flat.main()
     except NameError as err:
         pytest.fail(f"main raised NameError: {err}")
+
+
+def test_main_processes_organizations_concurrently(tmp_path, monkeypatch):
+    db = tmp_path / "finmodel.db"
+    today = pd.Timestamp.now().strftime("%Y-%m-%d")
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "CREATE TABLE AdvCampaignsDetailsFlat (org_id TEXT, advertId TEXT, status TEXT,"
+            " type TEXT, startTime TEXT, endTime TEXT, changeTime TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO AdvCampaignsDetailsFlat VALUES (?, ?, '9', '9', ?, ?, ?)",
+            [("1", "11", today, today, today), ("2", "22", today, today, today)],
+        )
+    df = pd.DataFrame(
+        [
+            {"id": "1", "Организация": "A", "Token_WB": "T1"},
+            {"id": "2", "Организация": "B", "Token_WB": "T2"},
+        ]
+    )
+    adverts = {"T1": 11, "T2": 22}
+    monkeypatch.setattr(adv_fullstats_import_flat, "get_db_path", lambda: db)
+    monkeypatch.setattr(adv_fullstats_import_flat, "load_organizations", lambda sheet=None: df)
+    monkeypatch.setenv("ORG_WORKERS", "2")
+
+    # both organizations must reach fullstats at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    monkeypatch.setattr(adv_fullstats_import_flat, "acquire", lambda token, url: barrier.wait())
+
+    def fake_get(self, url, headers=None, timeout=None):
+        advert = adverts[headers["Authorization"]]
+        payload = {"adverts": [{"advert_list": [{"advertId": advert}]}]}
+        return SimpleNamespace(status_code=200, json=lambda: payload, text="")
+
+    def fake_post(self, url, headers=None, json=None, timeout=None):
+        payload = [{"advertId": json[0]["id"], "days": [{"date": today, "views": 1}]}]
+        return SimpleNamespace(status_code=200, json=lambda: payload, text="")
+
+    monkeypatch.setattr("requests.Session.get", fake_get)
+    monkeypatch.setattr("requests.Session.post", fake_post)
+
+    adv_fullstats_import_flat.main()
+
+    with sqlite3.connect(db) as conn:
+        rows = conn.execute(
+            "SELECT org_id, advertId, views FROM AdvCampaignsFullStats ORDER BY org_id"
+        ).fetchall()
+    assert rows == [("1", "11", "1"), ("2", "22", "1")]
+
+
+def test_rejected_campaigns_are_bisected_once_and_cached(tmp_path, monkeypatch):
+    db = tmp_path / "finmodel.db"
+    today = pd.Timestamp.now().strftime("%Y-%m-%d")
+    ids = list(range(1, 9))
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "CREATE TABLE AdvCampaignsDetailsFlat (org_id TEXT, advertId TEXT, status TEXT,"
+            " type TEXT, startTime TEXT, endTime TEXT, changeTime TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO AdvCampaignsDetailsFlat VALUES ('1', ?, '9', '9', ?, ?, ?)",
+            [(str(cid), today, today, today) for cid in ids],
+        )
+    df = pd.DataFrame([{"id": "1", "Организация": "A", "Token_WB": "T1"}])
+    monkeypatch.setattr(adv_fullstats_import_flat, "get_db_path", lambda: db)
+    monkeypatch.setattr(adv_fullstats_import_flat, "load_organizations", lambda sheet=None: df)
+    monkeypatch.setattr(adv_fullstats_import_flat, "acquire", lambda token, url: 0.0)
+
+    def fake_get(self, url, headers=None, timeout=None):
+        payload = {"adverts": [{"advert_list": [{"advertId": cid} for cid in ids]}]}
+        return SimpleNamespace(status_code=200, json=lambda: payload, text="")
+
+    posts = []
+
+    def fake_post(self, url, headers=None, json=None, timeout=None):
+        sent = [item["id"] for item in json]
+        posts.append(sent)
+        if 5 in sent:
+            return SimpleNamespace(status_code=400, json=lambda: {}, text="bad id")
+        payload = [{"advertId": cid, "days": [{"date": today}]} for cid in sent]
+        return SimpleNamespace(status_code=200, json=lambda: payload, text="")
+
+    monkeypatch.setattr("requests.Session.get", fake_get)
+    monkeypatch.setattr("requests.Session.post", fake_post)
+
+    adv_fullstats_import_flat.main()
+
+    # [1..8] fails, [1..4] succeeds, so [5..8] is split without being posted
+    assert posts == [ids, [1, 2, 3, 4], [5, 6], [5], [6], [7, 8]]
+    with sqlite3.connect(db) as conn:
+        loaded = conn.execute("SELECT DISTINCT advertId FROM AdvCampaignsFullStats").fetchall()
+        rejected = conn.execute("SELECT advertId FROM AdvFullStatsRejected").fetchall()
+    assert sorted(int(r[0]) for r in loaded) == [1, 2, 3, 4, 6, 7, 8]
+    assert rejected == [("5",)]
+
+    posts.clear()
+    adv_fullstats_import_flat.main()
+
+    assert posts == [[1, 2, 3, 4, 6, 7, 8]]
+
+    def rejected_days_ago(days):
+        # same local-time format the script writes
+        stamp = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        with sqlite3.connect(db) as conn:
+            conn.execute("UPDATE AdvFullStatsRejected SET RejectedAt = ?", (stamp,))
+
+    # the next day's window differs, the rejection still applies until it expires
+    rejected_days_ago(2)
+    posts.clear()
+    adv_fullstats_import_flat.main()
+
+    assert posts == [[1, 2, 3, 4, 6, 7, 8]]
+
+    rejected_days_ago(4)
+    posts.clear()
+    adv_fullstats_import_flat.main()
+
+    assert posts[0] == ids
+
+
+def test_fullstats_5xx_is_retried_through_the_limiter(tmp_path, monkeypatch):
+    db = tmp_path / "finmodel.db"
+    today = pd.Timestamp.now().strftime("%Y-%m-%d")
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "CREATE TABLE AdvCampaignsDetailsFlat (org_id TEXT, advertId TEXT, status TEXT,"
+            " type TEXT, startTime TEXT, endTime TEXT, changeTime TEXT)"
+        )
+        conn.execute(
+            "INSERT INTO AdvCampaignsDetailsFlat VALUES ('1', '11', '9', '9', ?, ?, ?)",
+            (today, today, today),
+        )
+    df = pd.DataFrame([{"id": "1", "Организация": "A", "Token_WB": "T1"}])
+    monkeypatch.setattr(adv_fullstats_import_flat, "get_db_path", lambda: db)
+    monkeypatch.setattr(adv_fullstats_import_flat, "load_organizations", lambda sheet=None: df)
+    acquired = []
+    monkeypatch.setattr(
+        adv_fullstats_import_flat, "acquire", lambda token, url: acquired.append(url) or 0.0
+    )
+
+    def fake_get(self, url, headers=None, timeout=None):
+        payload = {"adverts": [{"advert_list": [{"advertId": 11}]}]}
+        return SimpleNamespace(status_code=200, json=lambda: payload, text="")
+
+    statuses = [502, 200]
+
+    def fake_post(self, url, headers=None, json=None, timeout=None):
+        status = statuses.pop(0)
+        payload = [{"advertId": 11, "days": [{"date": today, "views": 1}]}]
+        return SimpleNamespace(status_code=status, json=lambda: payload, text="")
+
+    monkeypatch.setattr("requests.Session.get", fake_get)
+    monkeypatch.setattr("requests.Session.post", fake_post)
+
+    adv_fullstats_import_flat.main()
+
+    assert statuses == []
+    # both POSTs went through the limiter
+    assert [url for url in acquired if url.endswith("/fullstats")] == [acquired[-1]] * 2
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT views FROM AdvCampaignsFullStats").fetchall() == [("1",)]
@@ -0,0 +1,112 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.scripts import build_marts
+from finmodel.scripts.finotchet_import import WB_FIELDS, field_type
+
+
+def make_finotchet(conn):
+    fields = ", ".join(f"{f} {field_type(f)}" for f in WB_FIELDS)
+    conn.execute(
+        f"CREATE TABLE FinOtchet (org_id INTEGER, Организация TEXT, {fields}, "
+        "PRIMARY KEY (org_id, rrd_id))"
+    )
+
+
+def add_rows(conn, rows):
+    for row in rows:
+        cols = ", ".join(row)
+        conn.execute(
+            f"INSERT OR REPLACE INTO FinOtchet ({cols}) VALUES ({', '.join('?' * len(row))})",
+            list(row.values()),
+        )
+    conn.commit()
+
+
+def sale(rrd_id, doc="Продажа", **extra):
+    row = {
+        "org_id": 1,
+        "rrd_id": rrd_id,
+        "nm_id": 10,
+        "sa_name": "art",
+        "rr_dt": "2024-03-01",
+        "doc_type_name": doc,
+        "quantity": 1,
+        "retail_amount": 1000.0,
+        "ppvz_for_pay": 800.0,
+        "ppvz_vw": 150.0,
+        "ppvz_vw_nds": 30.0,
+        "acquiring_fee": 20.0,
+        "delivery_rub": 0.0,
+    }
+    row.update(extra)
+    return row
+
+
+def pnl(conn):
+    return conn.execute(
+        "SELECT nm_id, day, sales_qty, returns_qty, revenue, commission, acquiring, logistics,"
+        " storage, payout, rows_aggregated FROM PnLDaily ORDER BY nm_id, day"
+    ).fetchall()
+
+
+def test_pnl_daily_is_built_incrementally(tmp_path):
+    conn = sqlite3.connect(tmp_path / "finmodel.db")
+    make_finotchet(conn)
+    add_rows(
+        conn,
+        [
+            sale(1),
+            sale(2),
+            sale(3, doc="Возврат"),
+            sale(4, doc="Логистика", quantity=0, retail_amount=0, ppvz_for_pay=0, delivery_rub=50),
+            sale(5, doc="", nm_id=None, sa_name=None, quantity=0, storage_fee=30.0),
+        ],
+    )
+
+    assert build_marts.build_pnl_daily(conn) == 5
+    assert pnl(conn) == [
+        (0, "2024-03-01", 0, 0, 0.0, 0.0, 0.0, 0.0, 30.0, -30.0, 1),
+        (10, "2024-03-01", 2, 1, 1000.0, 180.0, 20.0, 50.0, 0.0, 750.0, 4),
+    ]
+
+    # nothing new: the mart is untouched
+    assert build_marts.build_pnl_daily(conn) == 0
+
+    # re-imported old row is not counted twice, the new one is added
+    add_rows(conn, [sale(2), sale(6, rr_dt="2024-03-02T10:00:00")])
+    assert build_marts.build_pnl_daily(conn) == 1
+    incremental = pnl(conn)
+    assert incremental[-1] == (10, "2024-03-02", 1, 0, 1000.0, 180.0, 20.0, 0.0, 0.0, 800.0, 1)
+
+    assert build_marts.build_pnl_daily(conn, full=True) == 6
+    assert pnl(conn) == incremental
+    conn.close()
+
+
+def test_text_rrd_ids_are_compared_as_numbers(tmp_path):
+    conn = sqlite3.connect(tmp_path / "finmodel.db")
+    # FinOtchet created before the typed schema keeps every column as TEXT
+    conn.execute(
+        f"CREATE TABLE FinOtchet (org_id TEXT, {', '.join(f'{f} TEXT' for f in WB_FIELDS)})"
+    )
+    add_rows(conn, [sale("9"), sale("10")])
+
+    assert build_marts.build_pnl_daily(conn) == 2
+    add_rows(conn, [sale("11")])
+    assert build_marts.build_pnl_daily(conn) == 1
+    assert pnl(conn)[0][2] == 3
+    conn.close()
+
+
+def test_main_fails_without_finotchet(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_marts, "get_db_path", lambda: tmp_path / "finmodel.db")
+
+    with pytest.raises(SystemExit):
+        build_marts.main([])
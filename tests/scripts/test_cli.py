@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+SRC = Path(__file__).resolve().parents[2] / "src"
+# Ensure src is importable
+sys.path.append(str(SRC))
+
+from finmodel import cli
+
+
+def test_help_lists_scripts_without_importing_them():
+    code = (
+        "import sys\n"
+        "from typer.testing import CliRunner\n"
+        "from finmodel.cli import app\n"
+        "result = CliRunner().invoke(app, ['--help'])\n"
+        "assert result.exit_code == 0, result.output\n"
+        "assert 'saleswb_import_flat' in result.output\n"
+        "heavy = {'pandas', 'requests', 'finmodel.scripts.saleswb_import_flat'}\n"
+        "print(sorted(heavy & set(sys.modules)))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(SRC)},
+        check=True,
+    )
+    assert proc.stdout.strip() == "[]"
+
+
+def test_script_command_runs_module(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cli, "_run_module", lambda name, args: calls.append((name, args)))
+    result = CliRunner().invoke(cli.app, ["saleswb_import_flat", "--full-reload"])
+    assert result.exit_code == 0, result.output
+    assert calls == [("saleswb_import_flat", ["--full-reload"])]
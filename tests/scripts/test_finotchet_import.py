@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 from pathlib import Path
@@ -21,7 +22,7 @@ def test_finotchet_respects_sheet_env(monkeypatch, caplog):
     monkeypatch.setattr(finotchet_import, "load_organizations", load_org)
     monkeypatch.setattr(finotchet_import, "load_period", load_period)
     monkeypatch.setattr(finotchet_import, "parse_date", lambda x: pd.Timestamp(x))
-    monkeypatch.setattr(finotchet_import.sqlite3, "connect", MagicMock())
+    monkeypatch.setattr(finotchet_import, "connect", MagicMock())
 
     with caplog.at_level("INFO"):
         with pytest.raises(SystemExit):
@@ -47,9 +48,9 @@ def test_finotchet_inserts_rows_and_stops_on_empty_response():
             return_value=("2021-01-01", "2021-01-31"),
         ) as load_period,
         patch("finmodel.scripts.finotchet_import.WB_FIELDS", ["rrd_id"]),
-        patch("finmodel.scripts.finotchet_import.requests.Session.get") as mock_get,
-        patch("finmodel.scripts.finotchet_import.sqlite3.connect") as mock_connect,
-        patch("finmodel.scripts.finotchet_import.time.sleep"),
+        patch("requests.Session.get") as mock_get,
+        patch("finmodel.scripts.finotchet_import.connect") as mock_connect,
+        patch("finmodel.utils.ratelimit.time.sleep"),
     ):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
@@ -59,7 +60,11 @@ def test_finotchet_inserts_rows_and_stops_on_empty_response():
         def make_resp(data):
             resp = MagicMock()
             resp.status_code = 200
-            resp.json.return_value = data
+            body = json.dumps(data).encode()
+            chunk = 65536
+            resp.iter_content.return_value = [
+                body[i : i + chunk] for i in range(0, len(body), chunk)
+            ]
             return resp
 
         page_size = 100_000
@@ -73,13 +78,26 @@ def test_finotchet_inserts_rows_and_stops_on_empty_response():
         load_orgs.assert_called_once_with(sheet="OrgSheet")
         load_period.assert_called_once_with(sheet="SettingsSheet")
 
-        assert mock_cursor.executemany.call_count == 2
+        inserted = 0
         for c in mock_cursor.executemany.call_args_list:
             assert c.args[0].startswith("INSERT OR REPLACE INTO FinOtchet ")
             assert c.args[1]
+            inserted += len(c.args[1])
+        assert inserted == len(page1) + len(page2)
 
         assert mock_get.call_count == 3
         assert any(
             c.args[0] == "SELECT COUNT(*) FROM FinOtchet"
             for c in mock_cursor.execute.call_args_list
         )
+
+
+def test_convert_value_types_and_nulls():
+    convert = finotchet_import.convert_value
+    assert convert("rrd_id", 123) == 123
+    assert convert("ppvz_for_pay", "10.5") == 10.5
+    assert convert("is_legal_entity", True) == 1
+    assert convert("sale_dt", "2024-01-01T00:00:00") == "2024-01-01T00:00:00"
+    assert convert("sa_name", "ABC") == "abc"
+    assert convert("storage_fee", "") is None
+    assert convert("kiz", None) is None
@@ -1,13 +1,17 @@
+import json
+import sqlite3
 import sys
 from pathlib import Path
 from unittest.mock import MagicMock
 
 import pandas as pd
+import requests
 
 # Ensure src is importable
 sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
 
 from finmodel.scripts import katalog
+from finmodel.utils.import_state import ensure_import_state, load_cursor
 
 
 def test_katalog_handles_missing_columns(monkeypatch, caplog):
@@ -18,7 +22,7 @@ def test_katalog_handles_missing_columns(monkeypatch, caplog):
     monkeypatch.setenv("ORG_SHEET", "CustomOrg")
     monkeypatch.setenv("SETTINGS_SHEET", "CustomSettings")
     with caplog.at_level("INFO"):
-        katalog.main()
+        katalog.main([])
     load_org.assert_called_once_with(sheet="CustomOrg")
     assert "Using organizations sheet: CustomOrg" in caplog.text
     assert "Using settings sheet CustomSettings" in caplog.text
@@ -33,8 +37,90 @@ def test_katalog_handles_empty_dataframe(monkeypatch, caplog):
     monkeypatch.setenv("ORG_SHEET", "SheetX")
     monkeypatch.setenv("SETTINGS_SHEET", "SheetY")
     with caplog.at_level("INFO"):
-        katalog.main()
+        katalog.main([])
     load_org.assert_called_once_with(sheet="SheetX")
     assert "Using organizations sheet: SheetX" in caplog.text
     assert "Using settings sheet SheetY" in caplog.text
     assert "не содержит организаций" in caplog.text
+
+
+def test_fetch_cards_resumes_and_saves_cursor(monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE katalog (org_id, Организация, nmID, imtID, nmUUID, subjectID, subjectName,"
+        " brand, vendorCode, techSize, sku, chrtID, createdAt, updatedAt)"
+    )
+    ensure_import_state(conn)
+    card = {
+        "nmID": 7,
+        "vendorCode": "ABC",
+        "updatedAt": "2024-05-02T10:00:00Z",
+        "sizes": [{"techSize": "M", "chrtID": 70, "skus": ["sku7"]}],
+    }
+    payloads = []
+
+    def fake_post(self, url, json=None, headers=None, timeout=None):
+        payloads.append(json)
+        return MagicMock(status_code=200, json=lambda: {"cards": [card]})
+
+    monkeypatch.setattr(katalog, "acquire", lambda *a: 0.0)
+    monkeypatch.setattr(requests.Session, "post", fake_post)
+
+    start = {"updatedAt": "2024-05-01T00:00:00Z", "nmID": 5}
+    loaded = katalog.fetch_cards(
+        cur, conn, 1, "Org", {}, "https://x/list", "active", start=start, checkpoint=True
+    )
+
+    assert loaded == 1
+    settings = payloads[0]["settings"]
+    assert settings["cursor"] == {"limit": 100, "updatedAt": start["updatedAt"], "nmID": 5}
+    assert settings["sort"] == {"ascending": True}
+    saved = json.loads(load_cursor(cur, katalog.SCRIPT, 1))
+    assert saved == {"updatedAt": "2024-05-02T10:00:00Z", "nmID": 7}
+    assert cur.execute("SELECT vendorCode, sku FROM katalog").fetchall() == [("abc", "sku7")]
+
+
+def test_incremental_run_keeps_unchanged_cards_and_full_drops_vanished(tmp_path, monkeypatch):
+    db = tmp_path / "finmodel.db"
+    df = pd.DataFrame([{"id": 1, "Организация": "Org", "Token_WB": "T"}])
+    monkeypatch.setattr(katalog, "load_organizations", lambda sheet=None: df)
+    monkeypatch.setattr(katalog, "get_db_path", lambda: db)
+    monkeypatch.setattr(katalog, "acquire", lambda *a: 0.0)
+
+    def card(nm, updated):
+        sizes = [{"techSize": "M", "chrtID": nm * 10, "skus": [f"sku{nm}"]}]
+        return {"nmID": nm, "vendorCode": f"V{nm}", "updatedAt": updated, "sizes": sizes}
+
+    responses = {}
+
+    def fake_post(self, url, json=None, headers=None, timeout=None):
+        cards = responses[url.rsplit("/", 1)[-1]]
+        return MagicMock(status_code=200, json=lambda: {"cards": cards})
+
+    monkeypatch.setattr(requests.Session, "post", fake_post)
+
+    # yesterday's snapshot holds cards 1 and 2
+    responses.update(list=[card(1, "2024-05-01"), card(2, "2024-05-01")], trash=[])
+    katalog.main([])
+    with sqlite3.connect(db) as conn:
+        conn.execute("UPDATE katalog SET snapshot_date = date('now', '-1 day')")
+
+    # only card 2 changed since the cursor
+    responses.update(list=[card(2, "2024-05-03")])
+    katalog.main([])
+
+    def snapshot(when):
+        with sqlite3.connect(db) as conn:
+            return conn.execute(
+                f"SELECT nmID, updatedAt FROM katalog WHERE snapshot_date = {when} ORDER BY nmID"
+            ).fetchall()
+
+    assert snapshot("date('now')") == [(1, "2024-05-01"), (2, "2024-05-03")]
+
+    # card 1 disappeared from WB: only a full reconcile removes it
+    responses.update(list=[card(2, "2024-05-03")])
+    katalog.main(["--full"])
+
+    assert snapshot("date('now')") == [(2, "2024-05-03")]
+    assert snapshot("date('now', '-1 day')") == [(1, "2024-05-01"), (2, "2024-05-01")]
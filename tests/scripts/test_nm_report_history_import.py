@@ -0,0 +1,169 @@
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.scripts import nm_report_history_import as script
+
+
+def test_week_aggregation_runs_organizations_concurrently(tmp_path, monkeypatch):
+    db = tmp_path / "finmodel.db"
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE katalog (org_id TEXT, nmID TEXT)")
+        conn.executemany("INSERT INTO katalog VALUES (?, ?)", [("1", "111"), ("2", "222")])
+    df = pd.DataFrame(
+        [
+            {"id": "1", "Организация": "A", "Token_WB": "T1"},
+            {"id": "2", "Организация": "B", "Token_WB": "T2"},
+        ]
+    )
+    monkeypatch.setattr(script, "get_db_path", lambda: db)
+    monkeypatch.setattr(script, "load_organizations", lambda sheet=None: df)
+    monkeypatch.setenv("ORG_WORKERS", "2")
+
+    # both organizations must be waiting for the API at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    monkeypatch.setattr(script, "acquire", lambda token, url: barrier.wait())
+
+    bodies = []
+
+    def fake_post(self, url, headers=None, json=None, timeout=None):
+        bodies.append(json)
+        data = [
+            {"nmID": nm, "history": [{"dt": "2024-01-01", "ordersCount": 1}]}
+            for nm in json["nmIDs"]
+        ]
+        return SimpleNamespace(status_code=200, json=lambda: {"data": data}, text="")
+
+    monkeypatch.setattr("requests.Session.post", fake_post)
+
+    script.main(["--aggregation", "week"])
+
+    assert {body["aggregationLevel"] for body in bodies} == {"week"}
+    with sqlite3.connect(db) as conn:
+        rows = conn.execute(
+            "SELECT org_id, nmID, ordersCount FROM WB_NMReportHistoryWeekly ORDER BY org_id"
+        ).fetchall()
+        daily = conn.execute(
+            "SELECT name FROM sqlite_master WHERE name = 'WB_NMReportHistory'"
+        ).fetchall()
+    assert rows == [("1", "111", "1"), ("2", "222", "1")]
+    assert daily == []
+
+
+HISTORY_COLUMNS = (
+    "org_id, Организация, nmID, imtName, vendorCode, dt, openCardCount, addToCartCount, "
+    "ordersCount, ordersSumRub, buyoutsCount, buyoutsSumRub, buyoutPercent, "
+    "addToCartConversion, cartToOrderConversion, LoadDate"
+)
+
+
+def run_with_history(db, monkeypatch, history, argv):
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE katalog (org_id TEXT, nmID TEXT)")
+        conn.executemany("INSERT INTO katalog VALUES ('1', ?)", [("111",), ("222",), ("333",)])
+        conn.execute(f"CREATE TABLE WB_NMReportHistory ({HISTORY_COLUMNS})")
+        conn.executemany(
+            "INSERT INTO WB_NMReportHistory (org_id, nmID, dt, openCardCount, ordersCount) "
+            "VALUES ('1', ?, ?, ?, ?)",
+            history,
+        )
+    df = pd.DataFrame([{"id": "1", "Организация": "A", "Token_WB": "T1"}])
+    monkeypatch.setattr(script, "get_db_path", lambda: db)
+    monkeypatch.setattr(script, "load_organizations", lambda sheet=None: df)
+    monkeypatch.setattr(script, "acquire", lambda token, url: 0.0)
+
+    requests_made = []
+
+    def fake_post(self, url, headers=None, json=None, timeout=None):
+        period = json["period"]
+        requests_made.append((period["begin"], period["end"], json["nmIDs"]))
+        return SimpleNamespace(status_code=200, json=lambda: {"data": []}, text="")
+
+    monkeypatch.setattr("requests.Session.post", fake_post)
+    script.main(argv)
+    return requests_made
+
+
+def test_requests_only_missing_days_of_active_nmids(tmp_path, monkeypatch):
+    def day(n):
+        return (datetime.now().date() - timedelta(days=n)).strftime("%Y-%m-%d")
+
+    history = [
+        ("111", day(2), "5", "0"),  # loaded two days ago, has views
+        ("222", day(3), "0", "0"),  # loaded, but no views or orders
+    ]
+
+    made = run_with_history(tmp_path / "a.db", monkeypatch, history, [])
+
+    # 333 was never loaded: whole window; 111 from its last loaded day; 222 skipped
+    assert sorted(made) == [(day(7), day(0), [333]), (day(2), day(0), [111])]
+
+    made = run_with_history(tmp_path / "b.db", monkeypatch, history, ["--force"])
+
+    assert (day(3), day(0), [222]) in made
+
+
+def test_plan_periods_groups_identical_gaps():
+    last = {1: "2024-01-05", 2: "2024-01-05", 3: "2023-12-01"}
+
+    groups = script.plan_periods([1, 2, 3, 4], last, "2024-01-01", "2024-01-08")
+
+    assert groups == {
+        ("2024-01-05", "2024-01-08"): [1, 2],
+        ("2024-01-01", "2024-01-08"): [3, 4],
+    }
+
+
+def test_activity_lookups_skip_malformed_nmids():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE WB_NMReportHistory ({HISTORY_COLUMNS})")
+    conn.executemany(
+        "INSERT INTO WB_NMReportHistory (org_id, nmID, dt, openCardCount, ordersCount) "
+        "VALUES ('1', ?, '2024-01-05', ?, '0')",
+        [("111", "0"), ("222.0", "0"), ("None", "3"), ("", "0")],
+    )
+    conn.execute("CREATE TABLE SalesWBFlat (org_id TEXT, nmId TEXT, date TEXT)")
+    conn.executemany(
+        "INSERT INTO SalesWBFlat VALUES ('1', ?, '2024-01-06')", [("222.0",), ("n/a",)]
+    )
+    cur = conn.cursor()
+
+    assert script.load_last_loaded(cur, "WB_NMReportHistory", "1") == {
+        111: "2024-01-05",
+        222: "2024-01-05",
+    }
+    last_loaded = script.load_last_loaded(cur, "WB_NMReportHistory", "1")
+    inactive = script.find_inactive_nmids(
+        cur, "WB_NMReportHistory", "1", [111, 222], "2024-01-01", last_loaded
+    )
+    assert inactive == {111}
+
+
+def test_views_keep_nmids_active_and_skipped_ones_are_rechecked():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE WB_NMReportHistory ({HISTORY_COLUMNS})")
+    conn.executemany(
+        "INSERT INTO WB_NMReportHistory (org_id, nmID, dt, openCardCount, ordersCount) "
+        "VALUES ('1', ?, ?, ?, '0')",
+        [
+            ("111", "2024-01-06", "4"),  # views, no orders
+            ("222", "2024-01-06", "0"),
+            ("333", "2023-12-20", "0"),  # skipped for weeks
+        ],
+    )
+    cur = conn.cursor()
+    last_loaded = script.load_last_loaded(cur, "WB_NMReportHistory", "1")
+
+    inactive = script.find_inactive_nmids(
+        cur, "WB_NMReportHistory", "1", [111, 222, 333], "2024-01-01", last_loaded, "2024-01-01"
+    )
+
+    assert inactive == {222}
@@ -20,7 +20,7 @@ def test_orderswb_respects_sheet_env(monkeypatch, caplog):
     monkeypatch.setattr(orderswb_import_flat, "load_organizations", load_org)
     monkeypatch.setattr(orderswb_import_flat, "load_period", load_period)
     monkeypatch.setattr(orderswb_import_flat, "parse_date", lambda x: pd.Timestamp(x))
-    monkeypatch.setattr(orderswb_import_flat.sqlite3, "connect", MagicMock())
+    monkeypatch.setattr(orderswb_import_flat, "connect", MagicMock())
 
     with caplog.at_level("INFO"):
         with pytest.raises(SystemExit):
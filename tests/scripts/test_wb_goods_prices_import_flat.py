@@ -12,6 +12,7 @@ import requests
 sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
 
 from finmodel.scripts import wb_goods_prices_import_flat as script
+from finmodel.utils import ratelimit
 
 
 def test_import_prices_inserts_rows(monkeypatch):
@@ -71,7 +72,7 @@ def test_import_prices_inserts_rows(monkeypatch):
 
     fake_pyodbc = SimpleNamespace(connect=lambda dsn, autocommit=True: FakeConn())
     monkeypatch.setitem(sys.modules, "pyodbc", fake_pyodbc)
-    monkeypatch.setattr(script.time, "sleep", lambda x: None)
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda x: None)
 
     inserted = script.import_prices(["123"], dsn="DSN=test", api_key="TOKEN", http=fake_session)
 
@@ -111,12 +112,18 @@ def test_main_uses_xls_tokens(tmp_path, monkeypatch):
 
     def fake_make_http(token):
         used_tokens.append(token)
-        return SimpleNamespace()
+        return SimpleNamespace(token=token)
+
+    goods = {"T1": "111", "T2": "222"}
 
     def fake_fetch_batch(http, nm_id=None, limit=1000, offset=0):
+        # katalog nmIDs are served by the paged list, not per-nm filters
+        assert nm_id is None
+        if offset:
+            return []
         return [
             {
-                "nmId": nm_id or str(offset),
+                "nmId": goods[http.token],
                 "sizeID": None,
                 "price": 1,
                 "discountedPrice": 1,
@@ -128,14 +135,13 @@ def test_main_uses_xls_tokens(tmp_path, monkeypatch):
     monkeypatch.setattr(script, "fetch_batch", fake_fetch_batch)
     monkeypatch.setattr(
         script,
-        "calc_metrics",
-        lambda r: {
-            **r,
-            "snapshot_date": "2024-01-01",
-            "updated_at_utc": "2024-01-01T00:00:00",
-        },
+        "calc_metrics_batch",
+        lambda rows: [
+            {**r, "snapshot_date": "2024-01-01", "updated_at_utc": "2024-01-01T00:00:00"}
+            for r in rows
+        ],
     )
-    monkeypatch.setattr(script.time, "sleep", lambda x: None)
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda x: None)
 
     script.main([])
 
@@ -145,11 +151,12 @@ def test_main_uses_xls_tokens(tmp_path, monkeypatch):
     assert rows == [(1, "111"), (2, "222")]
 
 
-def test_main_skips_nmids_on_http_error(monkeypatch, caplog):
+def test_main_skips_nmids_on_http_error(tmp_path, monkeypatch, caplog):
+    db = tmp_path / "finmodel.db"
     nmids = ["111", "222"]
     monkeypatch.setattr(script, "read_nmids_from_txt", lambda p: nmids)
     monkeypatch.setattr(script, "load_wb_tokens", lambda sheet=None, path=None: [(None, "T")])
-    monkeypatch.setattr(script, "get_db_path", lambda: "dummy")
+    monkeypatch.setattr(script, "get_db_path", lambda: db)
     monkeypatch.setattr(script, "make_http", lambda token: SimpleNamespace())
 
     def fake_fetch_batch(http, nm_id=None, limit=1000, offset=0):
@@ -168,23 +175,47 @@ def test_main_skips_nmids_on_http_error(monkeypatch, caplog):
     monkeypatch.setattr(script, "fetch_batch", fake_fetch_batch)
     monkeypatch.setattr(
         script,
-        "calc_metrics",
-        lambda r: {
-            **r,
-            "snapshot_date": "2024-01-01",
-            "updated_at_utc": "2024-01-01T00:00:00",
-        },
+        "calc_metrics_batch",
+        lambda rows: [
+            {**r, "snapshot_date": "2024-01-01", "updated_at_utc": "2024-01-01T00:00:00"}
+            for r in rows
+        ],
     )
-    monkeypatch.setattr(script.time, "sleep", lambda x: None)
-
-    collected = []
-    monkeypatch.setattr(script, "write_prices_to_db", lambda db_path, rows: collected.extend(rows))
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda x: None)
 
     with caplog.at_level(logging.WARNING):
-        script.main(["--txt", "dummy"])
+        script.main(["--txt", "nmids.txt"])
 
     assert any("HTTP error for nmID 111" in r.message for r in caplog.records)
-    assert collected and collected[0]["nmId"] == "222"
+    with sqlite3.connect(db) as conn:
+        rows = conn.execute("SELECT nmId FROM WBGoodsPricesFlat").fetchall()
+    assert rows == [("222",)]
+
+
+def test_calc_metrics_batch():
+    now = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    rows = [
+        {"nmId": "1", "price": 1000, "discountedPrice": 900, "discount": 5},
+        {"nmId": "2", "price": 0, "discountedPrice": 0, "discount": 0},
+        {"nmId": "3", "price": None, "discountedPrice": 500, "discount": None},
+        {"nmId": "4", "price": 200, "discountedPrice": 150},
+        {"nmId": "5", "price": "n/a", "discountedPrice": 100, "discount": 1},
+    ]
+
+    result = script.calc_metrics_batch(rows, now_utc=now)
+
+    assert result is rows
+    assert {r["updated_at_utc"] for r in result} == {"2024-05-01T12:30:00+00:00"}
+    assert {r["snapshot_date"] for r in result} == {"2024-05-01"}
+    metrics = [
+        (r["price_rub"], r["salePrice_rub"], r["discount_total_pct"], r["spp_pct_approx"])
+        for r in result
+    ]
+    assert metrics[0] == (1000.0, 900.0, pytest.approx(10.0), pytest.approx(5.0))
+    assert metrics[1] == (0.0, 0.0, None, None)
+    assert metrics[2] == (None, 500.0, None, None)
+    assert metrics[3] == (200.0, 150.0, pytest.approx(25.0), None)
+    assert metrics[4] == (None, 100.0, None, None)
 
 
 def test_write_prices_no_duplicates_same_day(tmp_path):
@@ -212,3 +243,102 @@ def test_write_prices_no_duplicates_same_day(tmp_path):
             (today,),
         ).fetchone()[0]
     assert count == 1
+
+
+def test_fetch_goods_pages_large_explicit_lists(monkeypatch):
+    requested = []
+
+    def fake_fetch_batch(http, nm_id=None, limit=1000, offset=0):
+        requested.append((nm_id, offset))
+        if offset >= 2 * limit:
+            return []
+        return [{"nmId": str(offset + i)} for i in range(limit)]
+
+    monkeypatch.setattr(script, "fetch_batch", fake_fetch_batch)
+    monkeypatch.setattr(script, "acquire", lambda *a: 0.0)
+    nmids = [str(n) for n in range(0, 2000, 50)] + ["999999"]
+
+    rows = script.fetch_goods(SimpleNamespace(), "T", nmids)
+
+    assert requested == [(None, 0), (None, 1000), (None, 2000)]
+    assert sorted(r["nmId"] for r in rows) == sorted(nmids[:-1])
+
+
+def test_fanout_sink_flushes_bounded_batches(tmp_path):
+    class ListSink(script.Sink):
+        def __init__(self):
+            super().__init__()
+            self.batches = []
+            self.closed = False
+
+        def write(self, rows):
+            self.batches.append(len(rows))
+
+        def close(self):
+            self.closed = True
+
+    db = tmp_path / "out.db"
+    target = ListSink()
+    rows = [{"nmId": str(n), "sizeID": "1", "snapshot_date": "2024-01-01"} for n in range(7)]
+    with script.FanoutSink(
+        [target, script.SQLiteSink(str(db), "WBGoodsPricesFlat")], buffer_rows=3
+    ) as out:
+        for i in range(0, len(rows), 2):
+            out.write(rows[i : i + 2])
+
+    assert target.batches == [4, 3]
+    assert target.closed and out.written == 7
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM WBGoodsPricesFlat").fetchone()[0] == 7
+
+
+def test_fanout_sink_does_not_rewrite_rows_after_sink_failure(tmp_path, monkeypatch):
+    class FailingSink(script.Sink):
+        def write(self, rows):
+            raise RuntimeError("boom")
+
+    class FakeOdbcConn:
+        def __init__(self):
+            self.calls = []
+
+        def cursor(self):
+            calls = self.calls
+
+            class Cursor:
+                fast_executemany = False
+
+                def execute(self, sql):
+                    calls.append(sql.split()[0])
+
+                def executemany(self, sql, batch):
+                    calls.append("INSERT")
+
+                def close(self):
+                    pass
+
+            return Cursor()
+
+        def commit(self):
+            self.calls.append("COMMIT")
+
+        def rollback(self):
+            self.calls.append("ROLLBACK")
+
+        def close(self):
+            pass
+
+    odbc_conn = FakeOdbcConn()
+    fake_pyodbc = SimpleNamespace(connect=lambda dsn, autocommit=True: odbc_conn)
+    monkeypatch.setitem(sys.modules, "pyodbc", fake_pyodbc)
+    csv_path = tmp_path / "out.csv"
+    rows = [{"nmId": str(n), "sizeID": "1", "snapshot_date": "2024-01-01"} for n in range(3)]
+
+    with pytest.raises(RuntimeError):
+        with script.FanoutSink(
+            [script.CsvSink(str(csv_path)), script.OdbcSink("DSN=test"), FailingSink()],
+            buffer_rows=2,
+        ) as out:
+            out.write(rows)
+
+    assert len(csv_path.read_text(encoding="utf-8").splitlines()) == 1 + 3
+    assert odbc_conn.calls == ["TRUNCATE", "INSERT", "ROLLBACK"]
@@ -0,0 +1,59 @@
+import asyncio
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.scripts import wb_spp_fetch as script
+
+
+class FakeResponse:
+    def __init__(self, products):
+        self._products = products
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"products": self._products}
+
+
+class FakeSession:
+    def __init__(self):
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        nms = [int(x) for x in parse_qs(urlsplit(url).query)["nm"][0].split(";")]
+        with self.lock:
+            self.requested.append(nms)
+        products = [
+            {"id": nm, "sizes": [{"price": {"basic": 1000, "product": 800}}]}
+            for nm in nms
+            if nm != 13  # simulate a card missing from the response
+        ]
+        return FakeResponse(products)
+
+
+def test_fetch_all_batches_and_inserts(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(script, "get_session", lambda: session)
+    monkeypatch.setattr(script, "acquire", lambda token, url: 0.0)
+
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.execute(script.CREATE_WB_SPP_SQL)
+
+    nm_ids = list(range(1, 26))
+    inserted = asyncio.run(script.fetch_all(nm_ids, cur, nm_per_request=10, concurrency=3))
+
+    assert inserted == 24
+    assert sorted(len(b) for b in session.requested) == [5, 10, 10]
+    rows = cur.execute("SELECT nmID, priceU, salePriceU, sale_pct FROM wb_spp").fetchall()
+    assert len(rows) == 24
+    assert (1, 1000, 800, 20) in rows
+    assert 13 not in {r[0] for r in rows}
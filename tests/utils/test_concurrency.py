@@ -0,0 +1,55 @@
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils.concurrency import SQLiteWriter, get_org_workers, run_per_org
+
+
+def test_get_org_workers_from_env(monkeypatch):
+    monkeypatch.setenv("ORG_WORKERS", "7")
+    assert get_org_workers() == 7
+
+
+def test_get_org_workers_invalid_falls_back(monkeypatch, caplog):
+    monkeypatch.setenv("ORG_WORKERS", "many")
+    assert get_org_workers(default=3) == 3
+    assert "ORG_WORKERS" in caplog.text
+
+
+def test_run_per_org_single_org_runs_inline():
+    df = pd.DataFrame([{"id": 1, "Организация": "A", "Token_WB": "t"}])
+    threads = []
+
+    def worker(row):
+        threads.append(threading.current_thread())
+        return row["id"]
+
+    assert run_per_org(df, worker, max_workers=4) == [1]
+    assert threads == [threading.main_thread()]
+
+
+def test_run_per_org_keeps_order_and_serializes_writes(tmp_path):
+    df = pd.DataFrame(
+        [{"id": i, "Организация": f"Org{i}", "Token_WB": f"t{i}"} for i in range(1, 6)]
+    )
+    conn = sqlite3.connect(tmp_path / "t.db", check_same_thread=False)
+    conn.execute("CREATE TABLE t (org_id INTEGER, n INTEGER)")
+    writer = SQLiteWriter(conn)
+
+    def worker(row):
+        for n in range(50):
+            with writer.cursor() as cur:
+                cur.execute("INSERT INTO t VALUES (?, ?)", (row["id"], n))
+                conn.commit()
+        return row["id"]
+
+    assert run_per_org(df, worker, max_workers=3) == [1, 2, 3, 4, 5]
+    with writer.cursor() as cur:
+        assert cur.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 250
+    writer.close()
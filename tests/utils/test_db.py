@@ -0,0 +1,71 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils.db import bulk_load, connect
+
+
+def count(path):
+    with sqlite3.connect(path) as reader:
+        return reader.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+
+def test_connect_applies_pragmas(tmp_path):
+    conn = connect(tmp_path / "t.db")
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+    conn.close()
+
+
+def test_bulk_load_defers_commits_until_exit(tmp_path):
+    db = tmp_path / "t.db"
+    conn = connect(db)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+
+    with bulk_load(conn, enabled=True):
+        for i in range(3):
+            conn.execute("INSERT INTO t VALUES (?)", (i,))
+            conn.commit()
+        assert count(db) == 0
+    assert count(db) == 3
+    conn.close()
+
+
+def test_bulk_load_rolls_back_on_error(tmp_path):
+    db = tmp_path / "t.db"
+    conn = connect(db)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+
+    with pytest.raises(RuntimeError):
+        with bulk_load(conn, enabled=True):
+            conn.execute("INSERT INTO t VALUES (1)")
+            conn.commit()
+            raise RuntimeError("boom")
+    assert count(db) == 0
+
+    conn.execute("INSERT INTO t VALUES (2)")
+    conn.commit()
+    assert count(db) == 1
+    conn.close()
+
+
+def test_bulk_load_disabled_by_default_commits_pages(tmp_path, monkeypatch):
+    monkeypatch.delenv("SQLITE_BULK_LOAD", raising=False)
+    db = tmp_path / "t.db"
+    conn = connect(db)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+
+    with bulk_load(conn):
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.commit()
+        assert count(db) == 1
+    conn.close()
@@ -0,0 +1,52 @@
+import logging
+import sys
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils import http
+
+
+def test_make_http_sets_auth_and_compression():
+    s = http.make_http("TOKEN")
+    assert s.headers["Authorization"] == "TOKEN"
+    assert "gzip" in s.headers["Accept-Encoding"]
+
+
+def test_make_http_pools_per_host():
+    s = http.make_http()
+    card = s.get_adapter("https://card.wb.ru/cards/v4/detail")
+    other = s.get_adapter("https://example.com/")
+    assert card._pool_maxsize == http.POOL_SIZES["card.wb.ru"]
+    assert other._pool_maxsize == http.DEFAULT_POOL_SIZE
+
+
+def test_retry_policy_options():
+    s = http.make_http(retry_post=True, retry_429=False)
+    retry = s.get_adapter("https://content-api.wildberries.ru/").max_retries
+    assert "POST" in retry.allowed_methods
+    assert 429 not in retry.status_forcelist
+
+    retry = http.make_http().get_adapter("https://example.com/").max_retries
+    assert "POST" not in retry.allowed_methods
+    assert 429 in retry.status_forcelist
+
+
+def test_get_session_is_shared():
+    assert http.get_session() is http.get_session()
+    assert http.get_session() is not http.get_session(retry_post=True)
+
+
+def test_log_timing_hook(caplog):
+    resp = SimpleNamespace(
+        request=SimpleNamespace(method="GET"),
+        url="https://host/api/v1/x?y=1",
+        status_code=200,
+        elapsed=timedelta(seconds=12),
+    )
+    with caplog.at_level(logging.INFO, logger=http.logger.name):
+        http.log_timing(resp)
+    assert "GET /api/v1/x -> 200 in 12.00 s" in caplog.text
@@ -0,0 +1,50 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils.import_state import (
+    ensure_import_state,
+    load_cursor,
+    reset_cursor,
+    save_cursor,
+)
+
+
+def test_save_and_load_cursor_accumulates_rows():
+    conn = sqlite3.connect(":memory:")
+    ensure_import_state(conn)
+    cur = conn.cursor()
+
+    assert load_cursor(cur, "sales", 1) is None
+    save_cursor(cur, "sales", 1, "2024-01-01T10:00:00", 100)
+    save_cursor(cur, "sales", 1, "2024-01-02T10:00:00", 50)
+    save_cursor(cur, "orders", 1, 42, 7)
+
+    assert load_cursor(cur, "sales", 1) == "2024-01-02T10:00:00"
+    assert load_cursor(cur, "sales", "1") == "2024-01-02T10:00:00"
+    assert load_cursor(cur, "orders", 1) == "42"
+    row = cur.execute(
+        "SELECT rows_loaded, last_success FROM ImportState WHERE script = 'sales'"
+    ).fetchone()
+    assert row[0] == 150
+    assert row[1] is not None
+
+
+def test_reset_cursor_per_org_and_per_script():
+    conn = sqlite3.connect(":memory:")
+    ensure_import_state(conn)
+    cur = conn.cursor()
+    for org in (1, 2):
+        save_cursor(cur, "sales", org, "c", 1)
+    save_cursor(cur, "orders", 1, "c", 1)
+
+    reset_cursor(cur, "sales", 1)
+    assert load_cursor(cur, "sales", 1) is None
+    assert load_cursor(cur, "sales", 2) == "c"
+
+    reset_cursor(cur, "sales")
+    assert load_cursor(cur, "sales", 2) is None
+    assert load_cursor(cur, "orders", 1) == "c"
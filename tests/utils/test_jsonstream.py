@@ -0,0 +1,49 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils.jsonstream import batched, iter_array_text, iter_json_array
+
+
+def split(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_iter_array_text_across_chunk_boundaries(size):
+    data = [{"a": 1, "b": "x,]}"}, 12345, 1.5e3, None, [1, 2], "строка"]
+    text = " \n" + json.dumps(data, ensure_ascii=False) + "\n"
+    assert list(iter_array_text(split(text, size))) == data
+
+
+def test_iter_array_text_empty_and_null():
+    assert list(iter_array_text(["[", " ]"])) == []
+    assert list(iter_array_text(["nu", "ll"])) == []
+    assert list(iter_array_text([""])) == []
+
+
+def test_iter_array_text_rejects_non_array_and_truncated():
+    with pytest.raises(ValueError):
+        list(iter_array_text(['{"a": 1}']))
+    with pytest.raises(ValueError):
+        list(iter_array_text(['[{"a": 1}, {"b"']))
+
+
+def test_iter_json_array_decodes_split_utf8():
+    body = json.dumps([{"name": "Орг"}], ensure_ascii=False).encode()
+
+    class Resp:
+        def iter_content(self, chunk_size):
+            return [body[i : i + 1] for i in range(len(body))]
+
+    assert list(iter_json_array(Resp())) == [{"name": "Орг"}]
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 3)) == []
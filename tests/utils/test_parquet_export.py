@@ -0,0 +1,143 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils import parquet_export as pe
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, df, columns, path):
+        self.calls.append((path, df))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE FinOtchet (org_id INTEGER, rrd_id INTEGER, rr_dt TEXT, ppvz_for_pay REAL,"
+        " PRIMARY KEY (org_id, rrd_id))"
+    )
+    conn.executemany(
+        "INSERT INTO FinOtchet VALUES (?, ?, ?, ?)",
+        [
+            (1, 1, "2024-03-01", 10.0),
+            (1, 2, "2024-04-02", "11.5"),
+            (2, 3, "2024-03-05", 12.0),
+            (2, 4, None, 1.0),
+        ],
+    )
+    yield conn
+    conn.close()
+
+
+def test_only_changed_partitions_are_rewritten(conn, tmp_path):
+    writer = RecordingWriter()
+
+    assert pe.export_table(conn, "FinOtchet", tmp_path, writer=writer) == (4, 0)
+    paths = sorted(str(p.relative_to(tmp_path)) for p, _ in writer.calls)
+    assert paths == [
+        "FinOtchet/org_id=1/month=2024-03/part-0.parquet",
+        "FinOtchet/org_id=1/month=2024-04/part-0.parquet",
+        "FinOtchet/org_id=2/month=2024-03/part-0.parquet",
+        f"FinOtchet/org_id=2/month={pe.DEFAULT_PARTITION}/part-0.parquet",
+    ]
+    april = next(df for p, df in writer.calls if "2024-04" in str(p))
+    # columns follow the declared types, whatever SQLite stored
+    assert april["ppvz_for_pay"].tolist() == [11.5]
+    assert str(april["rrd_id"].dtype) == "Int64"
+
+    writer.calls.clear()
+    assert pe.export_table(conn, "FinOtchet", tmp_path, writer=writer) == (0, 0)
+
+    conn.execute("INSERT INTO FinOtchet VALUES (1, 5, '2024-04-20', 3.0)")
+    conn.execute("DELETE FROM FinOtchet WHERE org_id = 2 AND rr_dt IS NULL")
+    assert pe.export_table(conn, "FinOtchet", tmp_path, writer=writer) == (1, 1)
+    assert [len(df) for _, df in writer.calls] == [2]
+    removed = tmp_path / "FinOtchet" / "org_id=2" / f"month={pe.DEFAULT_PARTITION}"
+    assert not (removed / "part-0.parquet").exists()
+    assert (tmp_path / "FinOtchet" / "org_id=2" / "month=2024-03" / "part-0.parquet").exists()
+
+
+def test_corrected_rows_with_same_rrd_id_are_reexported(conn, tmp_path):
+    writer = RecordingWriter()
+    pe.export_table(conn, "FinOtchet", tmp_path, writer=writer)
+    writer.calls.clear()
+
+    conn.execute("INSERT OR REPLACE INTO FinOtchet VALUES (1, 2, '2024-04-02', 99.0)")
+
+    assert pe.export_table(conn, "FinOtchet", tmp_path, writer=writer) == (1, 0)
+    assert writer.calls[0][1]["ppvz_for_pay"].tolist() == [99.0]
+
+
+def test_finotchet_signature_uses_rrd_id_without_hashing_rows(conn, monkeypatch):
+    layout = pe.table_layout(conn, "FinOtchet")
+
+    def no_full_read(*args, **kwargs):
+        raise AssertionError("FinOtchet must not be read row by row")
+
+    monkeypatch.setattr(pe.pd, "read_sql_query", no_full_read)
+    signatures = pe.partition_signatures(conn, layout)
+
+    assert layout.marker_column == "rrd_id"
+    assert signatures[("1", "2024-04")] == ("1:2:11.50", 1)
+
+
+def test_non_integral_values_in_integer_columns_are_rounded(conn):
+    conn.execute("INSERT INTO FinOtchet VALUES (1, 1.5, '2024-05-01', 1.0)")
+    layout = pe.table_layout(conn, "FinOtchet")
+
+    df = pe.read_partition(conn, layout, ("1", "2024-05"))
+
+    assert str(df["rrd_id"].dtype) == "Int64"
+    assert df["rrd_id"].tolist() == [2]
+
+
+def test_partition_is_read_through_the_org_index(conn):
+    layout = pe.table_layout(conn, "FinOtchet")
+    where, params = pe._partition_filter(layout, ("1", "2024-04"))
+
+    plan = conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT * FROM FinOtchet WHERE {where}", params
+    ).fetchall()
+
+    assert "USING INDEX" in plan[0][-1]
+    assert pe.read_partition(conn, layout, ("1", "2024-04"))["rrd_id"].tolist() == [2]
+    assert pe.read_partition(conn, layout, ("2", None))["rrd_id"].tolist() == [4]
+
+
+def test_tables_without_marker_are_fingerprinted(tmp_path, monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE PnLDaily (org_id INTEGER, day TEXT, revenue REAL)")
+    conn.executemany(
+        "INSERT INTO PnLDaily VALUES (1, ?, ?)", [("2024-03-01", 10.0), ("2024-03-02", None)]
+    )
+    writer = RecordingWriter()
+
+    assert pe.export_table(conn, "PnLDaily", tmp_path, writer=writer) == (1, 0)
+    # the fingerprint does not depend on how the rows are chunked
+    monkeypatch.setattr(pe, "HASH_CHUNK_ROWS", 1)
+    assert pe.export_table(conn, "PnLDaily", tmp_path, writer=writer) == (0, 0)
+
+    conn.execute("UPDATE PnLDaily SET revenue = 20.0")
+    assert pe.export_table(conn, "PnLDaily", tmp_path, writer=writer) == (1, 0)
+
+
+def test_write_parquet_keeps_declared_types(conn, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    pe.export_table(conn, "FinOtchet", tmp_path)
+
+    table = pq.read_table(tmp_path / "FinOtchet" / "org_id=1" / "month=2024-04" / "part-0.parquet")
+    assert str(table.schema.field("rrd_id").type) == "int64"
+    assert str(table.schema.field("ppvz_for_pay").type) == "double"
+    assert table.column("ppvz_for_pay").to_pylist() == [11.5]
@@ -0,0 +1,99 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils.db import bulk_load_enabled
+from finmodel.utils.pipeline import FAILED, OK, SKIPPED, parse_steps, run_pipeline
+
+
+def test_parse_steps_accepts_lists_and_mappings():
+    steps = parse_steps(
+        {
+            "katalog": [],
+            "wb_spp_fetch": {"after": ["katalog"], "args": "--concurrency 4"},
+        }
+    )
+    assert steps["wb_spp_fetch"].after == ("katalog",)
+    assert steps["wb_spp_fetch"].args == ("--concurrency", "4")
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        {"katalog": ["missing"]},
+        {"no_such_script": []},
+        {"katalog": ["wb_spp_fetch"], "wb_spp_fetch": ["katalog"]},
+    ],
+)
+def test_parse_steps_rejects_invalid_graphs(raw):
+    with pytest.raises(ValueError):
+        parse_steps(raw)
+
+
+def test_run_pipeline_respects_dependencies_and_runs_in_parallel():
+    steps = parse_steps(
+        {
+            "katalog": [],
+            "saleswb_import_flat": [],
+            "wb_goods_prices_import_flat": ["katalog"],
+            "wb_spp_fetch": ["katalog"],
+        }
+    )
+    order = []
+    both_started = threading.Barrier(2, timeout=5)
+
+    def runner(name, args):
+        if name in ("katalog", "saleswb_import_flat"):
+            both_started.wait()  # independent steps overlap
+        order.append(name)
+
+    status = run_pipeline(steps, workers=2, runner=runner)
+
+    assert set(status.values()) == {OK}
+    assert order.index("katalog") < order.index("wb_goods_prices_import_flat")
+    assert order.index("katalog") < order.index("wb_spp_fetch")
+
+
+def test_failed_step_skips_dependents():
+    steps = parse_steps(
+        {
+            "adv_campaigns_details_import_flat": [],
+            "adv_fullstats_import_flat": ["adv_campaigns_details_import_flat"],
+            "saleswb_import_flat": [],
+        }
+    )
+    ran = []
+
+    def runner(name, args):
+        ran.append(name)
+        if name == "adv_campaigns_details_import_flat":
+            raise SystemExit(1)
+
+    status = run_pipeline(steps, workers=2, runner=runner)
+
+    assert status == {
+        "adv_campaigns_details_import_flat": FAILED,
+        "adv_fullstats_import_flat": SKIPPED,
+        "saleswb_import_flat": OK,
+    }
+    assert "adv_fullstats_import_flat" not in ran
+
+
+@pytest.mark.parametrize("workers, expected", [(1, True), (2, False)])
+def test_bulk_load_is_off_while_steps_run_in_parallel(monkeypatch, workers, expected):
+    monkeypatch.setenv("SQLITE_BULK_LOAD", "1")
+    steps = parse_steps({"katalog": []})
+    seen = []
+
+    status = run_pipeline(
+        steps, workers=workers, runner=lambda name, args: seen.append(bulk_load_enabled())
+    )
+
+    assert status == {"katalog": OK}
+    assert seen == [expected]
+    assert bulk_load_enabled()
@@ -0,0 +1,95 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils import ratelimit
+from finmodel.utils.ratelimit import RateLimit, RateLimiter, retry_delay
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.sleeps.append(sec)
+        self.now += sec
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(ratelimit.time, "sleep", fake.sleep)
+    return fake
+
+
+URL = "https://api.example.com/v1/items?x=1"
+
+
+def test_burst_then_interval(clock):
+    limiter = RateLimiter({"api.example.com/v1/items": RateLimit(2, burst=3)})
+    waits = [limiter.acquire("t", URL) for _ in range(5)]
+    assert waits == [0.0, 0.0, 0.0, 2.0, 2.0]
+    assert clock.sleeps == [2.0, 2.0]
+
+
+def test_buckets_are_per_token(clock):
+    limiter = RateLimiter({"api.example.com/v1/items": RateLimit(60)})
+    assert limiter.acquire("a", URL) == 0.0
+    assert limiter.acquire("b", URL) == 0.0
+    assert limiter.acquire("a", URL) == 60.0
+
+
+def test_unregistered_url_is_not_limited(clock):
+    limiter = RateLimiter({"api.example.com/v1/items": RateLimit(60)})
+    for _ in range(3):
+        assert limiter.acquire("t", "https://other.example.com/") == 0.0
+    assert clock.sleeps == []
+
+
+def test_backoff_delays_next_request(clock):
+    limiter = RateLimiter({"api.example.com/v1/items": RateLimit(1, burst=5)})
+    limiter.acquire("t", URL)
+    limiter.backoff("t", URL, 30)
+    assert limiter.acquire("t", URL) == pytest.approx(30.0)
+
+
+def test_match_prefers_most_specific_pattern():
+    limiter = RateLimiter(
+        {
+            "host/api/tasks": RateLimit(60),
+            "host/api/tasks/*/status": RateLimit(5),
+            "host/api/*": RateLimit(1),
+        }
+    )
+    assert limiter.match("https://host/api/tasks/42/status") == "host/api/tasks/*/status"
+    assert limiter.match("https://host/api/tasks/") == "host/api/tasks"
+    assert limiter.match("https://host/other") is None
+
+
+def test_retry_delay_reads_headers():
+    resp = SimpleNamespace(headers={"X-Ratelimit-Retry": "12"})
+    assert retry_delay(resp, 60) == 12.0
+    resp = SimpleNamespace(headers={"Retry-After": "bogus"})
+    assert retry_delay(resp, 60) == 60
+
+
+def test_try_acquire_does_not_block(clock):
+    limiter = RateLimiter({"api.example.com/v1/items": RateLimit(5, burst=2)})
+    assert limiter.try_acquire("t", URL) == 0.0
+    assert limiter.try_acquire("t", URL) == 0.0
+    assert limiter.try_acquire("t", URL) == pytest.approx(5.0)
+    clock.now += 2
+    assert limiter.try_acquire("t", URL) == pytest.approx(3.0)
+    clock.now += 3
+    assert limiter.try_acquire("t", URL) == 0.0
+    assert clock.sleeps == []
@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils import ratelimit, report_tasks
+from finmodel.utils.ratelimit import RateLimit, RateLimiter
+from finmodel.utils.report_tasks import ReportJob, ReportTaskScheduler
+
+CREATE = "https://api.example.com/tasks"
+STATUS = "https://api.example.com/tasks/{task_id}/status"
+DOWNLOAD = "https://api.example.com/tasks/{task_id}/download"
+
+LIMITS = {
+    "api.example.com/tasks": RateLimit(60, 5),
+    "api.example.com/tasks/*/status": RateLimit(5, 5),
+    "api.example.com/tasks/*/download": RateLimit(60),
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.now += sec
+
+
+def response(status_code=200, payload=None):
+    return SimpleNamespace(status_code=status_code, json=lambda: payload, text="", headers={})
+
+
+class FakeApi:
+    """Tasks become ready two polls after creation."""
+
+    def __init__(self, clock, create_status=200):
+        self.clock = clock
+        self.create_status = create_status
+        self.calls = []
+        self.polls = {}
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        token = headers["Authorization"]
+        self.calls.append((self.clock.now, token, url))
+        if url == CREATE:
+            if self.create_status != 200:
+                return response(self.create_status)
+            task_id = f"{token}-{params['dateFrom']}"
+            return response(payload={"data": {"taskId": task_id}})
+        task_id = url.split("/")[-2]
+        if url.endswith("/status"):
+            self.polls[task_id] = self.polls.get(task_id, 0) + 1
+            status = "done" if self.polls[task_id] >= 2 else "processing"
+            return response(payload={"data": {"status": status}})
+        return response(payload=[{"task": task_id}])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    for module in (ratelimit, report_tasks):
+        monkeypatch.setattr(module.time, "monotonic", fake.monotonic)
+        monkeypatch.setattr(module.time, "sleep", fake.sleep)
+    return fake
+
+
+def run(api, jobs):
+    scheduler = ReportTaskScheduler(api, CREATE, STATUS, DOWNLOAD, limiter=RateLimiter(LIMITS))
+    reports = []
+    scheduler.run(jobs, lambda job, payload: reports.append((job.context, payload)))
+    return reports
+
+
+def test_tasks_are_created_before_earlier_ones_finish(clock):
+    api = FakeApi(clock)
+    jobs = [ReportJob(token, {"dateFrom": d}, (token, d)) for token in "ab" for d in "123"]
+
+    reports = run(api, jobs)
+
+    assert sorted(ctx for ctx, _ in reports) == sorted(job.context for job in jobs)
+    creates = [now for now, _, url in api.calls if url == CREATE]
+    first_download = min(now for now, _, url in api.calls if url.endswith("/download"))
+    # all six tasks fit into the create burst of both tokens
+    assert len(creates) == 6
+    assert max(creates) < first_download
+    # downloads are limited to one per minute per token, not per organization
+    assert clock.now < 3 * 60
+
+
+def test_unauthorized_token_drops_its_jobs(clock):
+    api = FakeApi(clock, create_status=401)
+    jobs = [ReportJob("a", {"dateFrom": d}) for d in "123"]
+
+    assert run(api, jobs) == []
+    assert len(api.calls) == 1
@@ -1,4 +1,5 @@
 import datetime
+import os
 import sys
 from pathlib import Path
 
@@ -128,3 +129,70 @@ def test_load_config_path_change(tmp_path, monkeypatch):
     monkeypatch.setattr(settings, "_config_path", None)
     assert settings.load_config(cfg1)["settings"]["foo"] == 1
     assert settings.load_config(cfg2)["settings"]["foo"] == 2
+
+
+@pytest.fixture
+def settings_workbook(tmp_path):
+    orgs = pd.DataFrame({"id": [1], "Организация": ["Org"], "Token_WB": ["tok"]})
+    params = pd.DataFrame(
+        {"Параметр": ["ПериодНачало", "ПериодКонец"], "Значение": ["2024-01-01", "2024-01-31"]}
+    )
+    xls = tmp_path / "settings.xlsx"
+    with pd.ExcelWriter(xls) as writer:
+        orgs.to_excel(writer, sheet_name="НастройкиОрганизаций", index=False)
+        params.to_excel(writer, sheet_name="Настройки", index=False)
+    return xls
+
+
+def test_workbook_is_parsed_once(settings_workbook, monkeypatch):
+    calls = []
+    excel_file = pd.ExcelFile
+    monkeypatch.setattr(pd, "ExcelFile", lambda *a, **kw: calls.append(a) or excel_file(*a, **kw))
+    monkeypatch.setattr(settings, "_workbooks", {})
+
+    assert len(load_organizations(settings_workbook)) == 1
+    assert load_period(settings_workbook) == ("2024-01-01", "2024-01-31")
+    assert load_global_settings(settings_workbook)["периодконец"] == "2024-01-31"
+    assert len(calls) == 1
+
+    stat = settings_workbook.stat()
+    os.utime(settings_workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    load_period(settings_workbook)
+    assert len(calls) == 2
+
+
+def test_workbook_sidecar_is_reused(settings_workbook, monkeypatch):
+    monkeypatch.setenv("SETTINGS_CACHE", "1")
+    monkeypatch.setattr(settings, "_workbooks", {})
+    load_period(settings_workbook)
+    assert (settings_workbook.parent / ".settings.xlsx.cache.pkl").exists()
+
+    settings.clear_workbook_cache()
+    monkeypatch.setattr(pd, "ExcelFile", None)
+    assert load_period(settings_workbook) == ("2024-01-01", "2024-01-31")
+
+
+def test_find_setting_rereads_config_only_when_changed(tmp_path, monkeypatch):
+    cfg = tmp_path / "cfg.yml"
+    cfg.write_text("settings:\n  ORG_SHEET: A\n", encoding="utf-8")
+    monkeypatch.setenv("FINMODEL_CONFIG", str(cfg))
+    monkeypatch.delenv("ORG_SHEET", raising=False)
+    monkeypatch.setattr(settings, "_config", None)
+    monkeypatch.setattr(settings, "_config_path", None)
+    loads = []
+    safe_load = settings.yaml.safe_load
+    monkeypatch.setattr(settings.yaml, "safe_load", lambda fh: loads.append(1) or safe_load(fh))
+
+    assert settings.find_setting("ORG_SHEET") == "A"
+    assert settings.get_settings().org_sheet == "A"
+    assert len(loads) == 1
+
+    cfg.write_text("settings:\n  ORG_SHEET: B\n  SQLITE_BULK_LOAD: 'yes'\n", encoding="utf-8")
+    stat = cfg.stat()
+    os.utime(cfg, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    current = settings.get_settings()
+    assert current.org_sheet == "B" and current.sqlite_bulk_load is True
+    assert len(loads) == 2
+
+    settings.refresh_config()
+    assert len(loads) == 3
@@ -0,0 +1,102 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure src is importable
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from finmodel.utils import unit_economics as ue
+
+SCHEMA = """
+CREATE TABLE SalesWBFlat (org_id INTEGER, date TEXT, lastChangeDate TEXT, nmId TEXT,
+    saleID TEXT, subject TEXT, warehouseType TEXT, priceWithDisc TEXT, forPay TEXT);
+CREATE TABLE FinOtchet (org_id INTEGER, rrd_id INTEGER, nm_id INTEGER, rr_dt TEXT,
+    delivery_rub REAL, rebill_logistic_cost REAL, penalty REAL);
+CREATE TABLE PaidStorageFlat (org_id TEXT, date TEXT, nmId TEXT, warehousePrice TEXT,
+    LoadDate TEXT);
+CREATE TABLE AdvCampaignsFullStats (org_id TEXT, date TEXT, nmId TEXT, sum TEXT, LoadDate TEXT);
+CREATE TABLE WBTariffsCommission (subjectName TEXT, paidStorageKgvp TEXT,
+    kgvpMarketplace TEXT);
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        "INSERT INTO SalesWBFlat VALUES (1, ?, ?, ?, ?, ?, 'Склад WB', ?, ?)",
+        [
+            ("2024-03-01T09:00:00", "2024-03-01T10:00:00", "10", "S1", "Футболки", "1000", "850"),
+            ("2024-03-01T11:00:00", "2024-03-01T12:00:00", "10", "S2", "Футболки", "1000", "850"),
+            ("2024-03-01T12:00:00", "2024-03-01T13:00:00", "10", "R1", "Футболки", "1000", "850"),
+            ("2024-03-02T09:00:00", "2024-03-02T10:00:00", "20", "S3", "Носки", "500", "400"),
+        ],
+    )
+    conn.execute("INSERT INTO WBTariffsCommission VALUES ('Футболки', '20', '25')")
+    conn.execute("INSERT INTO FinOtchet VALUES (1, 1, 10, '2024-03-01', 100, 0, NULL)")
+    conn.execute("INSERT INTO PaidStorageFlat VALUES ('1', '2024-03-01', '10', '10', 'L1')")
+    conn.executemany(
+        "INSERT INTO AdvCampaignsFullStats VALUES ('1', '2024-03-01', ?, ?, 'L1')",
+        [("10", "50"), ("", "999")],  # the campaign row repeats product spend
+    )
+    yield conn
+    conn.close()
+
+
+def daily(conn):
+    return conn.execute(
+        "SELECT nm_id, day, sales_qty, returns_qty, revenue, commission, logistics, storage,"
+        " ad_cost, margin FROM UnitEconomicsDaily ORDER BY nm_id, day"
+    ).fetchall()
+
+
+def test_daily_components_and_period_ratios(conn):
+    assert ue.update_daily(conn) == 2
+
+    assert daily(conn) == [
+        (10, "2024-03-01", 2, 1, 1000.0, 200.0, 100.0, 10.0, 50.0, 640.0),
+        # no tariff for the subject: commission is what WB kept
+        (20, "2024-03-02", 1, 0, 500.0, 100.0, 0.0, 0.0, 0.0, 400.0),
+    ]
+
+    assert ue.build_period(conn, "2024-03-01", "2024-03-01") == 1
+    row = conn.execute(
+        "SELECT nm_id, margin_pct, ad_share, storage_per_unit, roi FROM UnitEconomics"
+    ).fetchone()
+    assert row[:4] == (10, 64.0, 5.0, 10.0)
+    assert row[4] == pytest.approx(640 / 360 * 100)
+
+
+def test_only_changed_days_are_recomputed(conn):
+    ue.update_daily(conn)
+    conn.execute("UPDATE UnitEconomicsDaily SET margin = -1 WHERE day = '2024-03-01'")
+    conn.commit()
+
+    assert ue.update_daily(conn) == 0
+
+    conn.execute("INSERT INTO AdvCampaignsFullStats VALUES ('1', '2024-03-02', '20', '40', 'L2')")
+    assert ue.update_daily(conn) == 1
+
+    margins = dict(conn.execute("SELECT day, margin FROM UnitEconomicsDaily").fetchall())
+    assert margins == {"2024-03-01": -1, "2024-03-02": 360.0}
+
+    assert ue.update_daily(conn, full=True) == 2
+    margins = dict(conn.execute("SELECT day, margin FROM UnitEconomicsDaily").fetchall())
+    assert margins == {"2024-03-01": 640.0, "2024-03-02": 360.0}
+
+
+def test_missing_sources_read_as_empty():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE PaidStorageFlat (org_id TEXT, date TEXT, nmId TEXT,"
+        " warehousePrice TEXT, LoadDate TEXT)"
+    )
+    conn.execute("INSERT INTO PaidStorageFlat VALUES ('1', '2024-03-01', '10', '7', 'L1')")
+
+    assert ue.update_daily(conn) == 1
+    assert ue.build_period(conn) == 1
+    row = conn.execute("SELECT storage, margin, margin_pct FROM UnitEconomics").fetchone()
+    assert row == (7.0, -7.0, None)